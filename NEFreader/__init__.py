@@ -1,6 +1,52 @@
+"""
+Submodules and the names below are imported on first use, so that `import NEFreader` is quick for
+  small command line tools.  Python before 3.7 has no module __getattr__, so there they are
+  imported straight away.
+"""
 from __future__ import print_function, absolute_import, division, unicode_literals
 __author__ = 'TJ Ragan'
 
-from .parser import Lexer, Parser
-from .nef import Nef
-from .validator import Validator
+import importlib
+import sys
+
+_LAZY_NAMES = {'Lexer': 'parser',
+               'Parser': 'parser',
+               'ParseHandler': 'parser',
+               'Nef': 'nef',
+               'Validator': 'validator',
+               'iter_loop': 'streaming',
+               'Archive': 'archive',
+               'DistanceRestraints': 'restraints',
+               'DihedralRestraints': 'restraints',
+               'RdcRestraints': 'restraints',
+               'PeakMatcher': 'peaks',
+               'ShiftStatistics': 'shifts',
+               'merge': 'combine',
+               'diff': 'compare'}
+
+__all__ = sorted(_LAZY_NAMES)
+
+
+def __getattr__(name):
+    module_name = _LAZY_NAMES.get(name)
+    if module_name is None:
+        try:
+            return importlib.import_module('.' + name, __name__)
+        except ImportError as e:
+            # Only a missing submodule means there's no such attribute; a submodule that can't
+            #   import one of its own dependencies should say so
+            if getattr(e, 'name', None) != '{}.{}'.format(__name__, name):
+                raise
+            raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module('.' + module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
+
+
+if sys.version_info < (3, 7):
+    for _name in _LAZY_NAMES:
+        globals()[_name] = __getattr__(_name)
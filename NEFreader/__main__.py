@@ -0,0 +1,8 @@
+from __future__ import unicode_literals, print_function, absolute_import, division
+__author__ = 'TJ Ragan'
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
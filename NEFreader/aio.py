@@ -0,0 +1,98 @@
+"""
+Reading and writing NEF on asyncio streams.
+
+    nef = await aload(reader)       # or Nef.aload(reader)
+    await awrite(nef, writer)       # or nef.awrite(writer)
+
+Input is lexed and parsed a chunk at a time as it arrives, and output is formatted a saveframe or a
+  run of loop rows at a time, with control going back to the event loop between chunks, so a large
+  project doesn't hold up the other tasks of a server.  The lexing and parsing themselves still run
+  on the event loop thread.
+
+Needs Python 3.6 or later.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+import asyncio
+import codecs
+import inspect
+
+from .parser import Lexer, Parser
+from .saveframe import Saveframe
+from .writer import nefTextChunks
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def _chunks(stream, chunk_size):
+    if hasattr(stream, 'read'):
+        while True:
+            chunk = await stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        async for chunk in stream:
+            yield chunk
+
+
+async def aload(stream, strict=True, compact=False, chunk_size=CHUNK_SIZE, encoding='utf-8'):
+    """
+    Parse NEF from an asyncio stream.
+
+    :param stream: asyncio.StreamReader, or any object with a `read(n)` coroutine, or an async
+                   iterable of chunks.  Chunks can be str, or bytes in `encoding`.
+    :param strict: bool
+    :param compact: bool    # Store saveframes as Saveframe rather than OrderedDict
+    :param chunk_size: int  # Largest read from a stream with a read method
+    :param encoding: str
+    :rtype: NEFreader.Nef
+    """
+    from .nef import Nef
+
+    nef = Nef.empty()
+    lexer = Lexer()
+    parser = Parser(nef, strict=strict, saveframe_factory=Saveframe if compact else None,
+                    digests=nef._digests)
+    parser.reset()
+    decoder = codecs.getincrementaldecoder(encoding)()
+
+    async for chunk in _chunks(stream, chunk_size):
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        parser.feed(lexer.feed(chunk))
+        await asyncio.sleep(0)
+
+    parser.feed(lexer.feed(decoder.decode(b'', final=True)))
+    parser.feed(lexer.close())
+    parser.close()
+    return nef
+
+
+async def awrite(nef, stream, encoding='utf-8', canonical=False, metadata=None,
+                 recompute=False):
+    """
+    Write a Nef to an asyncio stream, updating its metadata as Nef.write does.
+
+    :param nef: NEFreader.Nef
+    :param stream: asyncio.StreamWriter, or any object with a write method, which may be a
+                   coroutine function.  Its drain coroutine, if any, is awaited after each chunk.
+    :param encoding: str or None    # None to write str rather than bytes
+    :param canonical: bool  # As for Nef.write
+    :param metadata: mapping    # As for Nef.write
+    :param recompute: bool  # As for Nef.write
+    """
+    nef._update_metadata(metadata, recompute)
+    drain = getattr(stream, 'drain', None)
+    for chunk in nefTextChunks(nef, canonical=canonical):
+        if encoding is not None:
+            chunk = chunk.encode(encoding)
+        result = stream.write(chunk)
+        if inspect.isawaitable(result):
+            await result
+        if drain is not None:
+            await drain()
+        else:
+            await asyncio.sleep(0)
@@ -0,0 +1,154 @@
+"""
+Reading the NEF files in a tar or zip archive without extracting them.
+
+    with Archive('campaign.tar.gz') as archive:
+        for name in archive:            # Member names ending in .nef
+            nef = archive[name]         # Parsed now, on first access
+            ...
+
+Members are parsed straight out of the archive, and only when they are first looked up.
+  Archive.prefetch parses several at once in a pool of worker processes.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+import io
+import tarfile
+import zipfile
+from collections import OrderedDict
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from .nef import Nef
+from .parser import Parser, iter_tokens, read_chunks
+from .saveframe import Saveframe
+
+NEF_EXTENSION = '.nef'
+
+
+def _open(filename):
+    """
+    :return: (kind, archive), kind being 'zip' or 'tar'
+    :raise ValueError: if filename is neither
+    """
+    if zipfile.is_zipfile(filename):
+        return 'zip', zipfile.ZipFile(filename)
+    if tarfile.is_tarfile(filename):
+        return 'tar', tarfile.open(filename, 'r:*')
+    raise ValueError('{} is not a tar or zip archive.'.format(filename))
+
+
+def _member_names(kind, archive):
+    if kind == 'zip':
+        names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    else:
+        names = [info.name for info in archive.getmembers() if info.isfile()]
+    return [name for name in names if name.lower().endswith(NEF_EXTENSION)]
+
+
+def _parse_member(kind, archive, name, strict=True, compact=False, encoding='utf-8'):
+    if kind == 'zip':
+        raw = archive.open(name)
+    else:
+        raw = archive.extractfile(name)
+    nef = Nef.empty(name)
+    parser = Parser(nef, strict=strict, saveframe_factory=Saveframe if compact else None,
+                    digests=nef._digests)
+    with io.TextIOWrapper(raw, encoding=encoding) as f:
+        parser.parse(iter_tokens(read_chunks(f)))
+    return nef
+
+
+def _parse_in_worker(filename, name, strict, compact, encoding):
+    kind, archive = _open(filename)
+    try:
+        return name, _parse_member(kind, archive, name, strict, compact, encoding)
+    finally:
+        archive.close()
+
+
+class Archive(Mapping):
+    """
+    The .nef members of a tar (optionally compressed) or zip archive, as a read-only mapping of
+      member name to Nef.  Each member is parsed when it is first looked up and then kept.
+
+    :param filename: str
+    :param strict: bool
+    :param compact: bool    # Store saveframes as Saveframe rather than OrderedDict
+    :param encoding: str
+    :raise ValueError: if filename is neither a tar nor a zip archive
+    """
+
+    def __init__(self, filename, strict=True, compact=False, encoding='utf-8'):
+        self.filename = filename
+        self.strict = strict
+        self.compact = compact
+        self.encoding = encoding
+        self._kind, self._archive = _open(filename)
+        self.names = _member_names(self._kind, self._archive)
+        self._parsed = OrderedDict()
+
+
+    def __getitem__(self, name):
+        if name not in self._parsed:
+            if name not in self.names:
+                raise KeyError(name)
+            self._parsed[name] = _parse_member(self._kind, self._archive, name, self.strict,
+                                               self.compact, self.encoding)
+        return self._parsed[name]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.names
+
+
+    def is_parsed(self, name):
+        """
+        Whether member `name` has been parsed yet.
+        """
+        return name in self._parsed
+
+
+    def prefetch(self, names=None, workers=None):
+        """
+        Parse members in a pool of worker processes, each of which opens the archive itself.
+
+        :param names: iterable of str   # Default every member not yet parsed
+        :param workers: int     # Number of processes.  Default the number of CPUs
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        if names is None:
+            names = self.names
+        names = [name for name in names if name not in self._parsed]
+        for name in names:
+            if name not in self.names:
+                raise KeyError(name)
+        if not names:
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_parse_in_worker, self.filename, name, self.strict,
+                                       self.compact, self.encoding)
+                       for name in names]
+            for future in futures:
+                name, nef = future.result()
+                self._parsed[name] = nef
+
+
+    def close(self):
+        self._archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,476 @@
+"""
+Compact binary serialization of a parsed NEF.
+
+The text format has to go through the lexer and parser on every load, which is the dominant cost
+  when the same project is read repeatedly.  This module stores the already parsed structure
+  instead:
+
+  - every string (saveframe names, data names and data values) is stored once in a string table
+    and referenced by index, so repeated loop values are interned on load,
+  - loops are stored column by column; columns holding only canonical integers or fixed-point
+    decimals are stored as raw int64/float64 arrays and formatted back to the identical text on
+    load, everything else is an array of string table indices.
+
+Loops whose rows do not all share the same columns are stored row by row.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+from array import array
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import re
+import struct
+import sys
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'NEFB'
+FORMAT_VERSION = 1
+
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+_INT_RE = re.compile(r'^(0|-?[1-9][0-9]*)$')
+_FIXED_POINT_RE = re.compile(r'^-?[0-9]+\.([0-9]+)$')
+_INT64_MAX = 2**63 - 1
+
+_U8 = struct.Struct('<B')
+_U32 = struct.Struct('<I')
+_I32 = struct.Struct('<i')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+
+_HEADER = struct.Struct('<4sHH')
+_FLAG_LITTLE_ENDIAN_ARRAYS = 1
+
+# Entry, value and column type tags
+_ITEM = b'i'
+_LOOP = b'l'
+_COLUMNAR = b'c'
+_ROWWISE = b'r'
+_STRING = b's'
+_INTEGER = b'i'
+_FLOAT = b'f'
+_NONE = b'n'
+
+
+class _StringTable(object):
+
+    def __init__(self):
+        self.strings = []
+        self._index = {}
+
+    def add(self, s):
+        try:
+            return self._index[s]
+        except KeyError:
+            i = self._index[s] = len(self.strings)
+            self.strings.append(s)
+            return i
+
+
+def _array_bytes(a):
+    if not _LITTLE_ENDIAN:
+        a = array(a.typecode, a)
+        a.byteswap()
+    try:
+        return a.tobytes()
+    except AttributeError:
+        return a.tostring()
+
+
+def _array_from_bytes(typecode, data):
+    a = array(typecode)
+    try:
+        a.frombytes(data)
+    except AttributeError:
+        a.fromstring(data)
+    if not _LITTLE_ENDIAN:
+        a.byteswap()
+    return a
+
+
+def _fixed_point_decimals(column):
+    """
+    Number of decimals if every value is a fixed-point decimal with the same number of decimals
+      that survives a float round trip, otherwise None.
+
+    :type column: list
+    """
+    decimals = None
+    for v in column:
+        if not isinstance(v, str):
+            return None
+        match = _FIXED_POINT_RE.match(v)
+        if match is None:
+            return None
+        d = len(match.group(1))
+        if decimals is None:
+            decimals = d
+        elif d != decimals:
+            return None
+        if '%.*f' % (d, float(v)) != v:
+            return None
+    return decimals
+
+
+def _is_integer_column(column):
+    for v in column:
+        if not isinstance(v, str) or _INT_RE.match(v) is None:
+            return False
+        if abs(int(v)) > _INT64_MAX:
+            return False
+    return True
+
+
+class _Encoder(object):
+
+    def __init__(self):
+        self.strings = _StringTable()
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def string(self, s):
+        self.write(_U32.pack(self.strings.add(s)))
+
+    def value(self, v):
+        if v is None:
+            self.write(_NONE)
+        elif isinstance(v, int):
+            self.write(_INTEGER)
+            self.write(_I64.pack(v))
+        elif isinstance(v, float):
+            self.write(_FLOAT)
+            self.write(_F64.pack(v))
+        else:
+            self.write(_STRING)
+            self.string(v)
+
+    def saveframe(self, name, saveframe):
+        self.string(name)
+        self.write(_U32.pack(len(saveframe)))
+        for key, value in saveframe.items():
+            if isinstance(value, list):
+                self.write(_LOOP)
+                self.string(key)
+                self.loop(value)
+            else:
+                self.write(_ITEM)
+                self.string(key)
+                self.value(value)
+
+    def loop(self, loop):
+        columns = tuple(loop[0].keys()) if len(loop) > 0 else ()
+        if all(tuple(row.keys()) == columns for row in loop):
+            self._columnar_loop(loop, columns)
+        else:
+            self._rowwise_loop(loop)
+
+    def _columnar_loop(self, loop, columns):
+        self.write(_COLUMNAR)
+        self.write(_U32.pack(len(loop)))
+        self.write(_U32.pack(len(columns)))
+        for column_name in columns:
+            self.string(column_name)
+            column = [row[column_name] for row in loop]
+            if _is_integer_column(column):
+                self.write(_INTEGER)
+                self.write(_array_bytes(array('q', [int(v) for v in column])))
+                continue
+            decimals = _fixed_point_decimals(column)
+            if decimals is not None:
+                self.write(_FLOAT)
+                self.write(_U8.pack(decimals))
+                self.write(_array_bytes(array('d', [float(v) for v in column])))
+            elif all(isinstance(v, str) for v in column):
+                self.write(_STRING)
+                add = self.strings.add
+                self.write(_array_bytes(array('I', [add(v) for v in column])))
+            else:
+                self.write(_NONE)
+                for v in column:
+                    self.value(v)
+
+    def _rowwise_loop(self, loop):
+        self.write(_ROWWISE)
+        self.write(_U32.pack(len(loop)))
+        for row in loop:
+            self.write(_U32.pack(len(row)))
+            for k, v in row.items():
+                self.string(k)
+                self.value(v)
+
+
+def nefToBinary(nef):
+    """
+    Serialize a parsed NEF (a Nef or an OrderedDict of saveframes) to bytes.
+
+    :type nef: Nef or OrderedDict
+    :rtype: bytes
+    """
+    encoder = _Encoder()
+
+    datablock = getattr(nef, 'datablock', None)
+    encoder.write(_I32.pack(-1 if datablock is None else encoder.strings.add(datablock)))
+    encoder.write(_U32.pack(len(nef)))
+    for name, saveframe in nef.items():
+        encoder.saveframe(name, saveframe)
+
+    header = [_HEADER.pack(MAGIC, FORMAT_VERSION, _FLAG_LITTLE_ENDIAN_ARRAYS),
+              _U32.pack(len(encoder.strings.strings))]
+    for s in encoder.strings.strings:
+        encoded = s.encode('utf-8')
+        header.append(_U32.pack(len(encoded)))
+        header.append(encoded)
+
+    return b''.join(header + encoder.chunks)
+
+
+class _Decoder(object):
+
+    def __init__(self, data, saveframe_factory=None):
+        self.data = data
+        self.offset = 0
+        self.strings = []
+        self.saveframe_factory = saveframe_factory
+
+    def unpack(self, fmt):
+        value = fmt.unpack_from(self.data, self.offset)[0]
+        self.offset += fmt.size
+        return value
+
+    def tag(self):
+        t = self.data[self.offset:self.offset+1]
+        self.offset += 1
+        return t
+
+    def raw(self, n):
+        chunk = self.data[self.offset:self.offset+n]
+        self.offset += n
+        return chunk
+
+    def string(self):
+        return self.strings[self.unpack(_U32)]
+
+    def value(self):
+        t = self.tag()
+        if t == _STRING:
+            return self.string()
+        elif t == _INTEGER:
+            return self.unpack(_I64)
+        elif t == _FLOAT:
+            return self.unpack(_F64)
+        elif t == _NONE:
+            return None
+        raise ValueError('Corrupt NEF binary: unknown value tag {!r}.'.format(t))
+
+    def string_table(self):
+        count = self.unpack(_U32)
+        strings = self.strings = []
+        for _ in range(count):
+            length = self.unpack(_U32)
+            strings.append(self.raw(length).decode('utf-8'))
+
+    def saveframe(self, name):
+        if self.saveframe_factory is None:
+            saveframe = OrderedDict()
+        else:
+            saveframe = self.saveframe_factory(name)
+        entries = self.unpack(_U32)
+        for _ in range(entries):
+            t = self.tag()
+            key = self.string()
+            if t == _ITEM:
+                saveframe[key] = self.value()
+            elif t == _LOOP:
+                saveframe[key] = self.loop()
+            else:
+                raise ValueError('Corrupt NEF binary: unknown entry tag {!r}.'.format(t))
+        return saveframe
+
+    def loop(self):
+        t = self.tag()
+        if t == _COLUMNAR:
+            return self._columnar_loop()
+        elif t == _ROWWISE:
+            return self._rowwise_loop()
+        raise ValueError('Corrupt NEF binary: unknown loop layout {!r}.'.format(t))
+
+    def _columnar_loop(self):
+        row_count = self.unpack(_U32)
+        column_count = self.unpack(_U32)
+        names = []
+        columns = []
+        for _ in range(column_count):
+            names.append(self.string())
+            t = self.tag()
+            if t == _INTEGER:
+                values = _array_from_bytes('q', self.raw(8 * row_count))
+                columns.append([str(v) for v in values])
+            elif t == _FLOAT:
+                decimals = self.unpack(_U8)
+                values = _array_from_bytes('d', self.raw(8 * row_count))
+                columns.append(['%.*f' % (decimals, v) for v in values])
+            elif t == _STRING:
+                indices = _array_from_bytes('I', self.raw(4 * row_count))
+                strings = self.strings
+                columns.append([strings[i] for i in indices])
+            elif t == _NONE:
+                columns.append([self.value() for _ in range(row_count)])
+            else:
+                raise ValueError('Corrupt NEF binary: unknown column type {!r}.'.format(t))
+        names = tuple(names)
+        return [OrderedDict(zip(names, row)) for row in zip(*columns)] if names else []
+
+    def _rowwise_loop(self):
+        loop = []
+        for _ in range(self.unpack(_U32)):
+            row = OrderedDict()
+            for _ in range(self.unpack(_U32)):
+                key = self.string()
+                row[key] = self.value()
+            loop.append(row)
+        return loop
+
+
+def nefFromBinary(data, target=None, saveframe_factory=None):
+    """
+    Populate `target` from bytes produced by nefToBinary.
+
+    :type data: bytes
+    :type target: OrderedDict or Nef
+    :type saveframe_factory: callable   # As for Parser
+    :return: OrderedDict or Nef
+    """
+    if target is None:
+        target = OrderedDict()
+
+    decoder = _Decoder(data, saveframe_factory=saveframe_factory)
+    magic, version, flags = _HEADER.unpack_from(data, 0)
+    decoder.offset = _HEADER.size
+    if magic != MAGIC:
+        raise ValueError('Not a NEF binary file.')
+    if version != FORMAT_VERSION:
+        raise ValueError('Unsupported NEF binary format version {}.'.format(version))
+
+    decoder.string_table()
+    datablock = decoder.unpack(_I32)
+    if datablock >= 0:
+        target.datablock = decoder.strings[datablock]
+
+    for _ in range(decoder.unpack(_U32)):
+        name = decoder.string()
+        target[name] = decoder.saveframe(name)
+
+    return target
+
+
+def save(nef, filename):
+    """
+    Write nef to filename in the binary format.  The file is replaced atomically.
+
+    :type nef: Nef or OrderedDict
+    :type filename: str
+    """
+    data = nefToBinary(nef)
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        if hasattr(os, 'replace'):
+            os.replace(tmp_name, filename)
+        else:
+            os.rename(tmp_name, filename)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+def load(filename, target=None, saveframe_factory=None):
+    """
+    Read a binary NEF file from disk.
+
+    :type filename: str
+    :type target: OrderedDict or Nef
+    :type saveframe_factory: callable   # As for Parser
+    :return: OrderedDict or Nef
+    """
+    with open(filename, 'rb') as f:
+        return nefFromBinary(f.read(), target=target, saveframe_factory=saveframe_factory)
+
+
+### Cache ###
+
+def default_cache_dir():
+    """
+    The cache directory, taken from the NEFREADER_CACHE_DIR environment variable or defaulting to
+      ~/.cache/NEFreader
+
+    :rtype: str
+    """
+    directory = os.environ.get('NEFREADER_CACHE_DIR')
+    if directory is None:
+        directory = os.path.join(os.path.expanduser('~'), '.cache', 'NEFreader')
+    return directory
+
+
+def cache_path(filename, cache_dir=None, strict=True):
+    """
+    Path of the cache entry for a NEF text file.
+
+    The key is built from the absolute source path, its modification time and size, the parsing
+      strictness and the binary format version, so any change to the source makes a new entry.
+
+    :type filename: str
+    :type cache_dir: str or None
+    :type strict: bool
+    :rtype: str
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    stat = os.stat(filename)
+    mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+    key = '|'.join((os.path.abspath(filename), str(mtime), str(stat.st_size),
+                    str(bool(strict)), str(FORMAT_VERSION)))
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, digest + '.nefb')
+
+
+def load_cached(filename, target, cache_dir=None, strict=True, saveframe_factory=None):
+    """
+    Populate target from the cache entry for filename.
+
+    :return: True if the cache entry existed and was loaded
+    """
+    path = cache_path(filename, cache_dir=cache_dir, strict=strict)
+    if not os.path.exists(path):
+        return False
+    try:
+        load(path, target=target, saveframe_factory=saveframe_factory)
+    except (ValueError, struct.error, IOError, OSError) as e:
+        logger.warning('Ignoring unreadable NEF cache entry {}: {}'.format(path, e))
+        return False
+    return True
+
+
+def store_cached(filename, nef, cache_dir=None, strict=True):
+    """
+    Write the cache entry for filename.  Failures are logged rather than raised, as the cache is
+      only an optimization.
+    """
+    try:
+        path = cache_path(filename, cache_dir=cache_dir, strict=strict)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        save(nef, path)
+    except (IOError, OSError) as e:
+        logger.warning('Could not write NEF cache entry for {}: {}'.format(filename, e))
@@ -0,0 +1,210 @@
+"""
+The `nef` command line tool.
+
+    nef info project.nef                            saveframes, categories and loop sizes
+    nef validate project.nef ...                    exit status 1 if any file is invalid
+    nef extract project.nef SAVEFRAME LOOP          one loop as TSV (or --format csv)
+    nef convert project.nef project.nef.gz          re-write, compressed or binary (.nefb)
+    nef convert --canonical in.nef out.nef          re-write in canonical form
+    nef diff old.nef new.nef                        exit status 1 if the projects differ
+    nef stats project.nef                           where the time goes reading and validating
+
+Each subcommand does as little as it can: info scans the file without parsing it, extract
+  streams the one loop, and only validate, convert, diff and stats parse whole files.  Also runs
+  as `python -m NEFreader`.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+import argparse
+import errno
+import sys
+
+BINARY_EXTENSION = '.nefb'
+
+
+def _is_binary(filename):
+    from . import binary
+    with open(filename, 'rb') as f:
+        return f.read(len(binary.MAGIC)) == binary.MAGIC
+
+
+def _load(filename, compact=True, stats=None):
+    from .nef import Nef
+    if stats is None and _is_binary(filename):
+        return Nef.load_binary(filename)
+    return Nef.from_file(filename, compact=compact, stats=stats)
+
+
+def info(args, out):
+    from .streaming import index_file
+
+    datablock, saveframes = index_file(args.file)
+    if args.json:
+        import json
+        summary = {'datablock': datablock,
+                   'saveframes': [{'name': sf.name,
+                                   'category': sf.category,
+                                   'loops': [{'name': name, 'columns': list(loop.columns),
+                                              'rows': loop.rows}
+                                             for name, loop in sf.loops.items()]}
+                                  for sf in saveframes.values()]}
+        json.dump(summary, out, indent=2)
+        print(file=out)
+        return 0
+
+    print('datablock {}'.format(datablock), file=out)
+    for sf in saveframes.values():
+        print('{}  ({})'.format(sf.name, sf.category), file=out)
+        for name, loop in sf.loops.items():
+            print('    {:<40} {:>8} rows {:>4} columns'.format(name, loop.rows,
+                                                              len(loop.columns)), file=out)
+    return 0
+
+
+def validate(args, out):
+    from .validator import Validator
+
+    status = 0
+    validator = Validator()
+    for filename in args.files:
+        if validator.isValid(_load(filename)):
+            print('{}: valid'.format(filename), file=out)
+        else:
+            status = 1
+            print('{}: invalid'.format(filename), file=out)
+            for section, errors in validator.validation_errors.items():
+                if not errors:
+                    continue
+                if not isinstance(errors, list):
+                    errors = [errors]
+                for error in errors:
+                    print('    {}: {}'.format(section, error), file=out)
+    return status
+
+
+def extract(args, out):
+    import csv
+    from .streaming import iter_loop
+
+    delimiter = '\t' if args.format == 'tsv' else ','
+    output = out if args.output is None else open(args.output, 'w')
+    try:
+        writer = csv.writer(output, delimiter=delimiter, lineterminator='\n')
+        header = True
+        for batch in iter_loop(args.file, args.saveframe, args.loop):
+            if header:
+                writer.writerow(batch[0]._fields)
+                header = False
+            writer.writerows(batch)
+    finally:
+        if args.output is not None:
+            output.close()
+    return 0
+
+
+def convert(args, out):
+    nef = _load(args.input, compact=False)
+    if args.output.lower().endswith(BINARY_EXTENSION):
+        nef.save_binary(args.output)
+    else:
+        metadata = None if args.creation_date is None else {'creation_date': args.creation_date}
+        nef.save(args.output, canonical=args.canonical, metadata=metadata)
+    return 0
+
+
+def diff(args, out):
+    from .compare import diff
+
+    differences = diff(_load(args.old), _load(args.new), digests=True)
+    for line in differences.lines():
+        print(line, file=out)
+    return 1 if differences else 0
+
+
+def stats(args, out):
+    from .profiling import Stats
+    from .validator import Validator
+
+    s = Stats(trace_allocations=args.memory)
+    try:
+        nef = _load(args.file, stats=s)
+        Validator(nef).isValid(stats=s)
+    finally:
+        s.stop()
+    print(s.report(saveframes=args.saveframes), file=out)
+    return 0
+
+
+def _argument_parser():
+    parser = argparse.ArgumentParser(prog='nef',
+                                     description='Inspect, check and convert NEF files.')
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    subparsers.required = True
+
+    p = subparsers.add_parser('info', help='list saveframes, categories and loop sizes')
+    p.add_argument('file')
+    p.add_argument('--json', action='store_true', help='print the summary as JSON')
+    p.set_defaults(func=info)
+
+    p = subparsers.add_parser('validate', help='check files against the NEF specification')
+    p.add_argument('files', nargs='+', metavar='file')
+    p.set_defaults(func=validate)
+
+    p = subparsers.add_parser('extract', help='write one loop as TSV or CSV')
+    p.add_argument('file')
+    p.add_argument('saveframe')
+    p.add_argument('loop')
+    p.add_argument('--format', choices=('tsv', 'csv'), default='tsv')
+    p.add_argument('-o', '--output', help='output file (default standard output)')
+    p.set_defaults(func=extract)
+
+    p = subparsers.add_parser('convert',
+                              help='re-write a file, in the format given by the output '
+                                   'extension: .gz, .bz2 or .xz compressed, or {} binary'
+                                   .format(BINARY_EXTENSION))
+    p.add_argument('input')
+    p.add_argument('output')
+    p.add_argument('--canonical', action='store_true',
+                   help='write in canonical form: the same bytes for the same content')
+    p.add_argument('--creation-date', help='creation_date to write instead of the time now')
+    p.set_defaults(func=convert)
+
+    p = subparsers.add_parser('diff', help='list the saveframes, data items and loop rows that '
+                                           'differ between two files')
+    p.add_argument('old')
+    p.add_argument('new')
+    p.set_defaults(func=diff)
+
+    p = subparsers.add_parser('stats', help='time reading and validating a file')
+    p.add_argument('file')
+    p.add_argument('--memory', action='store_true', help='also trace memory allocations')
+    p.add_argument('--saveframes', type=int, default=10,
+                   help='number of slowest saveframes to list')
+    p.set_defaults(func=stats)
+    return parser
+
+
+def main(argv=None, out=None):
+    """
+    :param argv: list of str    # Default sys.argv[1:]
+    :param out: file-like   # Default sys.stdout
+    :return: int    # Exit status
+    """
+    if out is None:
+        out = sys.stdout
+    args = _argument_parser().parse_args(argv)
+    try:
+        return args.func(args, out)
+    except (IOError, OSError, KeyError, ValueError) as e:
+        if getattr(e, 'errno', None) == errno.EPIPE:
+            # Output piped to something like head, which has stopped reading
+            return 0
+        message = e.args[0] if isinstance(e, KeyError) and e.args else e
+        print('nef {}: {}'.format(args.command, message), file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+Loop columns as NumPy arrays.
+
+Parsed loops are lists of rows, which suits the parser and the writer but not numerical code.
+  These helpers turn the columns a calculation needs into arrays once, up front.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+import numpy as np
+
+NULL_VALUES = ('.', '?')
+
+
+def loop_columns(loop, names):
+    """
+    Columns of a loop, given either as its rows or already as columns.
+
+    :param loop: list of row mappings, as in a parsed Nef, or a mapping of column name to list of
+                 values, as from iter_loop(..., as_columns=True)
+    :param names: iterable of str
+    :return: dict of name to list   # None for a column the loop doesn't have
+    """
+    if hasattr(loop, 'keys'):
+        return dict((name, list(loop[name]) if name in loop else None) for name in names)
+    return dict((name, [row.get(name) for row in loop] if loop and name in loop[0] else None)
+                for name in names)
+
+
+def float_column(values, length, default=np.nan):
+    """
+    A column of NEF values as a float array, with nulls as default.
+
+    :param values: list of str, or None for a column the loop doesn't have
+    :param length: int  # Number of rows, for a missing column
+    :rtype: numpy.ndarray
+    """
+    if values is None:
+        return np.full(length, default)
+    nulls = null_column(values, length)
+    values = np.array(values, dtype=object)
+    values[nulls] = default
+    return values.astype(float)
+
+
+def null_column(values, length):
+    """
+    Which values of a column are null.  Every row is, for a column the loop doesn't have.
+
+    :param values: list of str, or None
+    :param length: int
+    :return: bool array
+    """
+    if values is None:
+        return np.ones(length, dtype=bool)
+    values = np.array(values, dtype=object)
+    return np.isin(values, NULL_VALUES) | np.equal(values, None)
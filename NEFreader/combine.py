@@ -0,0 +1,241 @@
+"""
+Merging several NEF projects into one.
+
+    merged = merge([Nef.from_file(f) for f in filenames])                  # Rename on conflict
+    merged = merge(nefs, policy='concatenate')      # Append same-named lists, renumbering ids
+
+The meta data and molecular system come from the first project.  Saveframes of the other
+  projects are added in order; what happens when one has the name of a saveframe already merged
+  depends on the policy:
+
+    'rename'        add it as name_2, name_3, ...
+    'concatenate'   append its loop rows to the existing saveframe.  ordinal columns are numbered
+                    on, and restraint_id and peak_id columns offset past the largest id already
+                    there.  Chemical shifts for atoms already in the list are left out.
+    'first'         keep the saveframe already merged
+    'last'          replace it
+    'error'         raise ValueError
+
+The nef_peak_restraint_link rows of all the projects are combined, with their spectrum and
+  restraint list names and their peak and restraint ids rewritten to follow the renaming and
+  renumbering, as are the chemical_shift_list references of spectra.  Links to a spectrum or
+  restraint list that was left out under the 'first' or 'last' policy are left out too.  Ids are
+  renumbered a column at a time with NumPy.  Merged saveframes share their unchanged loop rows with
+  the inputs, which are not modified.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+from collections import OrderedDict
+
+import numpy as np
+
+POLICIES = ('rename', 'concatenate', 'first', 'last', 'error')
+
+# Saveframes taken from the first project only
+SINGLETON_CATEGORIES = ('nef_nmr_meta_data', 'nef_molecular_system')
+
+LINK_CATEGORY = 'nef_peak_restraint_links'
+LINK_LOOP = 'nef_peak_restraint_link'
+
+# Loop columns of ids that are offset when loops are concatenated
+ID_COLUMNS = {'nef_distance_restraint': 'restraint_id',
+              'nef_dihedral_restraint': 'restraint_id',
+              'nef_rdc_restraint': 'restraint_id',
+              'nef_peak': 'peak_id'}
+
+# Loop columns identifying rows that are only kept once when loops are concatenated
+UNIQUE_COLUMNS = {'nef_chemical_shift': ('chain_code', 'sequence_code', 'atom_name')}
+
+# Saveframe items naming another saveframe
+REFERENCE_FIELDS = ('chemical_shift_list',)
+
+
+def _copy(saveframe, name=None):
+    copy = OrderedDict((key, list(value) if isinstance(value, list) else value)
+                       for key, value in saveframe.items())
+    if name is not None:
+        copy['sf_framecode'] = name
+    return copy
+
+
+def _free_name(merged, name):
+    n = 2
+    while '{}_{}'.format(name, n) in merged:
+        n += 1
+    return '{}_{}'.format(name, n)
+
+
+def _int_column(rows, column):
+    try:
+        return np.array([row[column] for row in rows], dtype=np.int64)
+    except ValueError:
+        raise ValueError('Concatenating {} needs integer values.'.format(column))
+
+
+def _with_columns(rows, columns):
+    """
+    Copies of rows with new values in some columns.
+
+    :param columns: dict of column name to list of new values, one per row
+    """
+    names = list(columns)
+    new_rows = []
+    for i, row in enumerate(rows):
+        row = OrderedDict(row)
+        for name in names:
+            row[name] = columns[name][i]
+        new_rows.append(row)
+    return new_rows
+
+
+def _append_loop(loop_name, target, rows):
+    """
+    Append rows to the target loop, renumbering them to follow on.
+
+    :return: int    # Offset added to the id column, 0 if there is none
+    """
+    key_columns = UNIQUE_COLUMNS.get(loop_name)
+    if key_columns is not None:
+        existing = set(tuple(row.get(c) for c in key_columns) for row in target)
+        rows = [row for row in rows if tuple(row.get(c) for c in key_columns) not in existing]
+    if not rows:
+        return 0
+
+    columns = {}
+    offset = 0
+    id_column = ID_COLUMNS.get(loop_name)
+    if id_column is not None and id_column in rows[0]:
+        if target:
+            offset = int(_int_column(target, id_column).max())
+        columns[id_column] = (_int_column(rows, id_column) + offset).astype(str).tolist()
+    if 'ordinal' in rows[0]:
+        start = len(target) + 1
+        columns['ordinal'] = np.arange(start, start + len(rows)).astype(str).tolist()
+    target.extend(_with_columns(rows, columns) if columns else rows)
+    return offset
+
+
+def _append(target, saveframe):
+    """
+    Append the loops of saveframe to those of target.
+
+    :return: dict of id column to offset
+    """
+    offsets = {}
+    for key, value in saveframe.items():
+        if not isinstance(value, list):
+            continue
+        if key not in target:
+            target[key] = list(value)
+            continue
+        offset = _append_loop(key, target[key], value)
+        if offset:
+            offsets[ID_COLUMNS[key]] = offset
+    return offsets
+
+
+def _link_rows(source, rows, names, offsets, dropped):
+    """
+    Link rows of one source project, with references rewritten.
+
+    :param dropped: set of (source, saveframe name) left out of the merge
+    """
+    rows = [row for row in rows if (source, row['nmr_spectrum_id']) not in dropped and
+            (source, row['restraint_list_id']) not in dropped]
+    if not rows:
+        return []
+    spectra = [names.get((source, row['nmr_spectrum_id']), row['nmr_spectrum_id'])
+               for row in rows]
+    lists = [names.get((source, row['restraint_list_id']), row['restraint_list_id'])
+             for row in rows]
+    peak_offsets = np.array([offsets.get((source, row['nmr_spectrum_id']), {}).get('peak_id', 0)
+                             for row in rows], dtype=np.int64)
+    restraint_offsets = np.array([offsets.get((source, row['restraint_list_id']), {})
+                                  .get('restraint_id', 0) for row in rows], dtype=np.int64)
+    columns = {'nmr_spectrum_id': spectra, 'restraint_list_id': lists}
+    if peak_offsets.any():
+        columns['peak_id'] = (_int_column(rows, 'peak_id') + peak_offsets).astype(str).tolist()
+    if restraint_offsets.any():
+        columns['restraint_id'] = (_int_column(rows, 'restraint_id') +
+                                   restraint_offsets).astype(str).tolist()
+    return _with_columns(rows, columns)
+
+
+def merge(nefs, policy='rename'):
+    """
+    Merge NEF projects into a new Nef.  See the module documentation for the policies.
+
+    :param nefs: iterable of NEFreader.Nef
+    :param policy: str  # 'rename', 'concatenate', 'first', 'last' or 'error'
+    :rtype: NEFreader.Nef
+    :raise ValueError: for an unknown policy, no projects, a name conflict under the 'error'
+                       policy, or non-integer ids to renumber
+    """
+    from .nef import Nef
+
+    if policy not in POLICIES:
+        raise ValueError('Unknown merge policy {}; use one of {}.'.format(policy,
+                                                                         ', '.join(POLICIES)))
+    nefs = list(nefs)
+    if not nefs:
+        raise ValueError('Nothing to merge.')
+
+    merged = Nef.empty()
+    merged.datablock = getattr(nefs[0], 'datablock', 'DEFAULT')
+    names = {}      # (source, saveframe name) to merged name
+    offsets = {}    # (source, saveframe name) to dict of id column to offset
+    sources = {}    # merged name to the source its references are resolved in
+    dropped = set()     # (source, saveframe name) left out
+    links = []
+    link_name = None
+
+    for source, nef in enumerate(nefs):
+        for name, saveframe in nef.items():
+            category = saveframe.get('sf_category')
+            if category == LINK_CATEGORY:
+                if link_name is None:
+                    link_name = name
+                links.append((source, saveframe))
+                continue
+            if name not in merged:
+                merged[name] = _copy(saveframe)
+                names[(source, name)] = name
+                sources[name] = source
+                continue
+
+            names[(source, name)] = name
+            if category in SINGLETON_CATEGORIES or policy == 'first':
+                dropped.add((source, name))
+                continue
+            if policy == 'error':
+                raise ValueError('Saveframe {} is in more than one project.'.format(name))
+            if policy == 'last':
+                dropped.add((sources[name], name))
+                merged[name] = _copy(saveframe)
+                sources[name] = source
+            elif policy == 'rename':
+                new_name = _free_name(merged, name)
+                merged[new_name] = _copy(saveframe, new_name)
+                names[(source, name)] = new_name
+                sources[new_name] = source
+            else:
+                offsets[(source, name)] = _append(merged[name], saveframe)
+
+    for name, saveframe in merged.items():
+        for field in REFERENCE_FIELDS:
+            if field in saveframe:
+                saveframe[field] = names.get((sources[name], saveframe[field]), saveframe[field])
+
+    if links:
+        link_saveframe = _copy(links[0][1])
+        link_saveframe[LINK_LOOP] = []
+        for source, saveframe in links:
+            link_saveframe[LINK_LOOP].extend(_link_rows(source, saveframe.get(LINK_LOOP, []),
+                                                        names, offsets, dropped))
+        if 'ordinal' in (link_saveframe[LINK_LOOP] or [{}])[0]:
+            link_saveframe[LINK_LOOP] = _with_columns(link_saveframe[LINK_LOOP], {
+                'ordinal': [str(i) for i in range(1, len(link_saveframe[LINK_LOOP]) + 1)]})
+        merged[link_name] = link_saveframe
+    return merged
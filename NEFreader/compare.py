@@ -0,0 +1,235 @@
+"""
+Structural differences between two versions of a NEF project.
+
+    differences = diff(Nef.from_file('old.nef'), Nef.from_file('new.nef'))
+    differences.added, differences.removed      # Saveframe names
+    differences.changed['nef_chemical_shift_list_1'].loops['nef_chemical_shift'].changed
+    print('\\n'.join(differences.lines()))
+
+Loop rows are matched up by key columns, such as restraint_id and the atoms of a restraint, or
+  peak_id, rather than by position, so a row inserted near the top of a loop shows as one added
+  row and not as every later row changed.  Rows are put in dicts by key, making a loop diff
+  O(rows) rather than a comparison of every old row with every new one.  Rows with the same key
+  are told apart by the order they come in.
+
+Saveframes that are equal as they stand are not gone through further; comparing them is much
+  quicker than matching up their rows.  For projects just read, diff(old, new, digests=True)
+  skips saveframes with the same content digest (see NEFreader.digest) instead, which costs
+  nothing as parsing records them, and also passes over saveframes that differ only in layout.
+  Those digests aren't updated when a saveframe is changed in place, so this is only for
+  projects that haven't been.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+from collections import namedtuple, OrderedDict
+from operator import itemgetter
+
+_ATOM = ('chain_code_{0}', 'sequence_code_{0}', 'atom_name_{0}')
+
+
+def _atoms(*numbers):
+    return tuple(column.format(n) for n in numbers for column in _ATOM)
+
+
+# Columns identifying the rows of each loop.  Loops not listed, or without all their key columns,
+#   are keyed by whole rows, so their rows are only ever added or removed.
+KEY_COLUMNS = {'nef_related_entries': ('database_name', 'database_accession_code'),
+               'nef_program_script': ('program_name', 'script_name'),
+               'nef_run_history': ('run_ordinal',),
+               'nef_sequence': ('chain_code', 'sequence_code'),
+               'nef_covalent_links': _atoms(1, 2),
+               'nef_chemical_shift': ('chain_code', 'sequence_code', 'atom_name'),
+               'nef_distance_restraint': ('restraint_id',) + _atoms(1, 2),
+               'nef_dihedral_restraint': ('restraint_id',) + _atoms(1, 2, 3, 4),
+               'nef_rdc_restraint': ('restraint_id',) + _atoms(1, 2),
+               'nef_spectrum_dimension': ('dimension_id',),
+               'nef_spectrum_dimension_transfer': ('dimension_1', 'dimension_2'),
+               'nef_peak': ('peak_id',),
+               'nef_peak_restraint_link': ('nmr_spectrum_id', 'peak_id', 'restraint_list_id',
+                                           'restraint_id')}
+
+# Columns that number rows, and so change whenever rows are added or removed before them
+IGNORED_COLUMNS = ('ordinal',)
+
+LoopDiff = namedtuple('LoopDiff', ('added', 'removed', 'changed'))
+LoopDiff.__doc__ = """
+Rows of a loop.  added and removed are lists of rows, changed a list of (old row, new row).
+"""
+
+
+def _getter(columns):
+    """
+    A function of a row returning a tuple of the values of columns, None for those it doesn't have.
+    """
+    getter = itemgetter(*columns) if columns else lambda row: ()
+    if len(columns) == 1:
+        single = getter
+        getter = lambda row: (single(row),)
+
+    def values(row):
+        try:
+            return getter(row)
+        except KeyError:
+            return tuple(row.get(c) for c in columns)
+    return values
+
+
+def _keyed(rows, key_columns):
+    """
+    :return: OrderedDict of key to row, where a key is the key column values and the number of
+             earlier rows with the same values
+    """
+    keyed = OrderedDict()
+    seen = {}
+    key = _getter(key_columns)
+    for row in rows:
+        values = key(row)
+        n = seen[values] = seen.get(values, -1) + 1
+        keyed[values, n] = row
+    return keyed
+
+
+def diff_loop(name, old, new, ignored=IGNORED_COLUMNS):
+    """
+    :param name: str    # Loop category, for its KEY_COLUMNS
+    :param old: list of row mappings
+    :param new: list of row mappings
+    :param ignored: iterable of str     # Columns not compared
+    :rtype: LoopDiff
+    """
+    columns = []
+    for rows in (old, new):
+        if rows:
+            columns.extend(c for c in rows[0] if c not in columns and c not in ignored)
+    key_columns = KEY_COLUMNS.get(name)
+    for rows in (old, new):
+        if key_columns is not None and rows and not all(c in rows[0] for c in key_columns):
+            key_columns = None
+    if key_columns is None:
+        key_columns = columns
+
+    old_keyed = _keyed(old, key_columns)
+    new_keyed = _keyed(new, key_columns)
+    added = [row for key, row in new_keyed.items() if key not in old_keyed]
+    removed = [row for key, row in old_keyed.items() if key not in new_keyed]
+    changed = []
+    values = _getter(columns)
+    for key, old_row in old_keyed.items():
+        new_row = new_keyed.get(key)
+        if new_row is not None and values(old_row) != values(new_row):
+            changed.append((old_row, new_row))
+    return LoopDiff(added, removed, changed)
+
+
+class SaveframeDiff(object):
+    """
+    Differences between two versions of a saveframe.
+
+    :ivar items: OrderedDict of data item name to (old value, new value)  # None where missing
+    :ivar loops: OrderedDict of loop name to LoopDiff, for the loops that differ.  A loop in only
+                 one version has all its rows added or removed.
+    """
+
+    def __init__(self, old, new, ignored=IGNORED_COLUMNS):
+        """
+        :param old: mapping
+        :param new: mapping
+        """
+        self.items = OrderedDict()
+        self.loops = OrderedDict()
+        keys = list(old) + [k for k in new if k not in old]
+        for key in keys:
+            old_value = old.get(key)
+            new_value = new.get(key)
+            if isinstance(old_value, list) or isinstance(new_value, list):
+                loop = diff_loop(key, old_value or [], new_value or [], ignored)
+                if any(loop):
+                    self.loops[key] = loop
+            elif old_value != new_value:
+                self.items[key] = (old_value, new_value)
+
+    def __bool__(self):
+        return bool(self.items or self.loops)
+    __nonzero__ = __bool__
+
+
+class NefDiff(object):
+    """
+    Differences between two versions of a NEF project.  False if there are none.
+
+    :ivar added: list of str    # Names of saveframes only in the new version
+    :ivar removed: list of str  # Names of saveframes only in the old version
+    :ivar changed: OrderedDict of saveframe name to SaveframeDiff
+    :ivar datablock: (old name, new name), or None if they are the same
+    """
+
+    def __init__(self, added, removed, changed, datablock=None):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.datablock = datablock
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed or self.datablock)
+    __nonzero__ = __bool__
+
+
+    def lines(self):
+        """
+        A readable summary, one line per difference.
+
+        :rtype: list of str
+        """
+        lines = []
+        if self.datablock is not None:
+            lines.append('datablock {} -> {}'.format(*self.datablock))
+        lines.extend('+ {}'.format(name) for name in self.added)
+        lines.extend('- {}'.format(name) for name in self.removed)
+        for name, saveframe in self.changed.items():
+            lines.append('~ {}'.format(name))
+            for key, (old, new) in saveframe.items.items():
+                lines.append('    {}: {} -> {}'.format(key, old, new))
+            for key, loop in saveframe.loops.items():
+                lines.append('    {}: {} added, {} removed, {} changed'
+                             .format(key, len(loop.added), len(loop.removed), len(loop.changed)))
+        return lines
+
+
+def _recorded_digest(nef, name):
+    return nef._saveframe_digests(name).digest
+
+
+def diff(old, new, ignored=IGNORED_COLUMNS, digests=False):
+    """
+    Compare two NEF projects.
+
+    :param old: NEFreader.Nef, or any mapping of saveframe name to saveframe
+    :param new: NEFreader.Nef
+    :param ignored: iterable of str     # Loop columns not compared, by default ordinal
+    :param digests: bool    # Skip saveframes with the same recorded digests.  Only for Nefs
+                            #   with no saveframes changed in place since they were read
+    :rtype: NefDiff
+    """
+    ignored = tuple(ignored)
+    digests = digests and hasattr(old, '_saveframe_digests') and hasattr(new, '_saveframe_digests')
+    added = [name for name in new if name not in old]
+    removed = [name for name in old if name not in new]
+    changed = OrderedDict()
+    for name, saveframe in old.items():
+        if name not in new:
+            continue
+        new_saveframe = new[name]
+        if saveframe is new_saveframe:
+            continue
+        if digests and _recorded_digest(old, name) == _recorded_digest(new, name):
+            continue
+        if saveframe == new_saveframe:
+            continue
+        differences = SaveframeDiff(saveframe, new_saveframe, ignored)
+        if differences:
+            changed[name] = differences
+
+    datablocks = (getattr(old, 'datablock', None), getattr(new, 'datablock', None))
+    return NefDiff(added, removed, changed, datablocks if datablocks[0] != datablocks[1] else None)
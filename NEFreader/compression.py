@@ -0,0 +1,84 @@
+"""
+Transparent gzip, bzip2 and xz compression for NEF files.
+
+Compressed files are read and written through the (de)compressor a piece at a time, so there is
+  never a complete decompressed copy on disk or in memory.  When reading, the compression is
+  recognised from the first bytes of the file, whatever its name; when writing, it is chosen from
+  the extension (.gz, .bz2 or .xz).
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+import io
+
+MAGIC_BYTES = (('gzip', b'\x1f\x8b'),
+               ('bz2', b'BZh'),
+               ('xz', b'\xfd7zXZ\x00'))
+
+EXTENSIONS = (('gzip', '.gz'),
+              ('bz2', '.bz2'),
+              ('xz', '.xz'))
+
+
+def compression_from_magic(filename):
+    """
+    :type filename: str
+    :return: 'gzip', 'bz2', 'xz' or None
+    """
+    with open(filename, 'rb') as f:
+        start = f.read(6)
+    for compression, magic in MAGIC_BYTES:
+        if start.startswith(magic):
+            return compression
+    return None
+
+
+def compression_from_extension(filename):
+    """
+    :type filename: str
+    :return: 'gzip', 'bz2', 'xz' or None
+    """
+    lower = filename.lower()
+    for compression, extension in EXTENSIONS:
+        if lower.endswith(extension):
+            return compression
+    return None
+
+
+def open_text(filename, mode='r', compression='auto'):
+    """
+    Open a possibly compressed NEF file as text.
+
+    :param filename: str
+    :param mode: str    # 'r' or 'w'
+    :param compression: str or None     # 'gzip', 'bz2', 'xz', None for an uncompressed file, or
+                                        #   'auto' to detect it from the magic bytes when reading
+                                        #   and the extension when writing
+    :raise ValueError: for an unknown compression, or xz without the lzma module
+    """
+    if mode not in ('r', 'w'):
+        raise ValueError('mode must be r or w, not {}'.format(mode))
+    if compression == 'auto':
+        if mode == 'r':
+            compression = compression_from_magic(filename)
+        else:
+            compression = compression_from_extension(filename)
+
+    if compression is None:
+        return io.open(filename, mode)
+    # The compression modules are only imported when needed, to keep import of NEFreader fast
+    text_mode = mode + 't'
+    if compression == 'gzip':
+        import gzip
+        return gzip.open(filename, text_mode)
+    if compression == 'bz2':
+        import bz2
+        return bz2.open(filename, text_mode)
+    if compression == 'xz':
+        try:
+            import lzma
+        except ImportError:
+            raise ValueError('xz compression needs the lzma module (Python 3.3+).')
+        return lzma.open(filename, text_mode)
+    raise ValueError('Unknown compression {}'.format(compression))
@@ -0,0 +1,251 @@
+"""
+Content digests of saveframes and loops.
+
+A digest is a BLAKE2b hash of a saveframe's data items and loop rows, so it is the same in every
+  process and on every machine, unlike hash().  It covers content, not layout or ordering: the
+  same data written with different whitespace, quoting or comments, or with its items, loops and
+  columns in another order, as canonical output (see NEFreader.writer) may put them, has the same
+  digest.  The order of loop rows does count.
+
+    nef = Nef.from_file('project.nef')
+    nef.saveframe_digest('nef_chemical_shift_list_1')       # Hex string, e.g. a cache key
+    nef.loop_digest('nef_chemical_shift_list_1', 'nef_chemical_shift')
+
+Each loop is hashed on its own, from its category, its column names in sorted order and its
+  rows, with their values in the same order.  A value missing from a row cut short counts as '.'.
+  A saveframe's digest is the hash of its data items and of the digests of its loops that have
+  rows, each in name order.  Saveframe names are not included, only the sf_framecode item.
+  Values that aren't text count as they are written (writer.canonicalText).
+
+Nef parsing computes the digests incrementally, from the parse events as the file is read
+  (DigestingBuilder), so getting them later costs nothing; saveframe_digest computes them from
+  the parsed data when they weren't recorded, and the two always agree.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+import hashlib
+from collections import namedtuple, OrderedDict
+from operator import itemgetter
+
+from .parser import TargetBuilder
+from .writer import canonicalText
+
+DIGEST_SIZE = 16    # Bytes
+ROWS_PER_UPDATE = 1000  # Loop rows hashed at a time while parsing
+
+_UNIT = '\x1f'      # Between values
+_RECORD = '\x1e'    # After each item, column list and row
+_NULL = '.'
+
+SaveframeDigest = namedtuple('SaveframeDigest', ('digest', 'loops'))
+SaveframeDigest.__doc__ = """
+digest is the saveframe's digest, loops an OrderedDict of loop category to loop digest, as bytes.
+"""
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+
+def _text(values):
+    try:
+        return _UNIT.join(values)
+    except TypeError:
+        return _UNIT.join(canonicalText(v) for v in values)
+
+
+def _sorted_getter(columns):
+    """
+    :return: (sorted columns, function of a sequence of values in column order returning them in
+             sorted column order, or None if they already are)
+    """
+    order = sorted(range(len(columns)), key=columns.__getitem__)
+    sorted_columns = [columns[i] for i in order]
+    if order == list(range(len(columns))):
+        return sorted_columns, None
+    return sorted_columns, itemgetter(*order)
+
+
+class _LoopHasher(object):
+    """
+    Hashes a loop a row at a time, passing rows on to BLAKE2 in batches.
+
+    :ivar rows: int     # Rows hashed so far
+    """
+    __slots__ = ('rows', '_hash', '_columns', '_width', '_reorder', '_pending')
+
+    def __init__(self, category, columns):
+        """
+        :type category: str
+        :type columns: list of str
+        """
+        self.rows = 0
+        self._hash = _new_hash()
+        self._hash.update((category + _RECORD).encode('utf-8'))
+        self._width = len(columns)
+        self._columns, self._reorder = _sorted_getter(columns)
+        self._pending = []
+
+    def row(self, values):
+        """
+        :param values: sequence, in the order of the columns the hasher was made with
+        """
+        if self.rows == 0:
+            self._pending.append(_text(self._columns))
+        if len(values) < self._width:
+            values = list(values) + [_NULL] * (self._width - len(values))
+        if self._reorder is not None:
+            values = self._reorder(values)
+        self._pending.append(_text(values))
+        self.rows += 1
+        if len(self._pending) >= ROWS_PER_UPDATE:
+            self._flush()
+
+    def _flush(self):
+        self._pending.append('')
+        self._hash.update(_RECORD.join(self._pending).encode('utf-8'))
+        self._pending = []
+
+    def digest(self):
+        if self._pending:
+            self._flush()
+        return self._hash.digest()
+
+
+class _SaveframeHasher(object):
+    __slots__ = ('_items', '_loops', '_empty')
+
+    def __init__(self):
+        self._items = []
+        self._loops = OrderedDict()
+        self._empty = set()
+
+    def item(self, name, value):
+        self._items.append((name, value))
+
+    def loop(self, category, digest, rows):
+        self._loops[category] = digest
+        if rows:
+            self._empty.discard(category)
+        else:
+            self._empty.add(category)
+
+    def digest(self):
+        """
+        :rtype: SaveframeDigest
+        """
+        h = _new_hash()
+        for name, value in sorted(self._items, key=itemgetter(0)):
+            h.update((_text((name, value)) + _RECORD).encode('utf-8'))
+        for category in sorted(self._loops):
+            if category not in self._empty:
+                h.update((category + _UNIT).encode('utf-8') + self._loops[category])
+        return SaveframeDigest(h.digest(), self._loops)
+
+
+def _loop_digest(category, loop):
+    """
+    :return: (digest, rows)
+    """
+    columns = sorted(loop[0]) if loop else []
+    hasher = _LoopHasher(category, columns)
+    if not columns:
+        getter = lambda row: []
+    elif len(columns) == 1:
+        getter = lambda row: [row[columns[0]]]
+    else:
+        getter = itemgetter(*columns)
+    for row in loop:
+        try:
+            values = getter(row)
+        except KeyError:
+            values = [row.get(c, _NULL) for c in columns]
+        hasher.row(values)
+    return hasher.digest(), len(loop)
+
+
+def loop_digest(category, loop):
+    """
+    :param category: str
+    :param loop: list of row mappings
+    :rtype: bytes
+    """
+    return _loop_digest(category, loop)[0]
+
+
+def saveframe_digest(saveframe):
+    """
+    Digests of a saveframe and its loops, computed from its contents.
+
+    :param saveframe: mapping
+    :rtype: SaveframeDigest
+    """
+    hasher = _SaveframeHasher()
+    for key, value in saveframe.items():
+        if isinstance(value, list):
+            hasher.loop(key, *_loop_digest(key, value))
+        else:
+            hasher.item(key, value)
+    return hasher.digest()
+
+
+def nef_digest(saveframe_digests, datablock=None):
+    """
+    A digest of a whole project, from the datablock name and the names and digests of its
+      saveframes, in name order.
+
+    :param saveframe_digests: iterable of (saveframe name, SaveframeDigest)
+    :param datablock: str
+    :rtype: bytes
+    """
+    h = _new_hash()
+    h.update('{}{}'.format(datablock, _RECORD).encode('utf-8'))
+    for name, digest in sorted(saveframe_digests, key=itemgetter(0)):
+        h.update((name + _UNIT).encode('utf-8') + digest.digest)
+    return h.digest()
+
+
+class DigestingBuilder(TargetBuilder):
+    """
+    TargetBuilder that also records the digests of each saveframe as it is parsed.
+    """
+    __slots__ = ('digests', '_saveframe_hasher', '_loop_hasher')
+
+    def __init__(self, target, saveframe_factory, digests):
+        """
+        :type digests: dict     # Filled with saveframe name to (saveframe, SaveframeDigest)
+        """
+        super(DigestingBuilder, self).__init__(target, saveframe_factory)
+        self.digests = digests
+        self._saveframe_hasher = None
+        self._loop_hasher = None
+
+    def start_saveframe(self, name):
+        super(DigestingBuilder, self).start_saveframe(name)
+        self._saveframe_hasher = _SaveframeHasher()
+
+    def item(self, name, value):
+        self._saveframe[name] = value
+        self._saveframe_hasher.item(name, value)
+
+    def start_loop(self, category, columns):
+        super(DigestingBuilder, self).start_loop(category, columns)
+        self._loop_hasher = _LoopHasher(category, columns)
+
+    def row(self, values):
+        self._rows.append(OrderedDict(zip(self._columns, values)))
+        self._loop_hasher.row(values)
+
+    def end_loop(self, category):
+        if self._saveframe_hasher is not None:
+            self._saveframe_hasher.loop(category, self._loop_hasher.digest(),
+                                        self._loop_hasher.rows)
+        self._loop_hasher = None
+        super(DigestingBuilder, self).end_loop(category)
+
+    def end_saveframe(self, name):
+        self.digests[name] = (self._saveframe, self._saveframe_hasher.digest())
+        self._saveframe_hasher = None
+        super(DigestingBuilder, self).end_saveframe(name)
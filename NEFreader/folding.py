@@ -0,0 +1,164 @@
+"""
+Spectral folding (aliasing) of peak positions.
+
+A signal outside the spectral window of a dimension appears folded back into it: shifted by a
+  whole number of spectral widths for circular folding, or reflected at the window edges for
+  mirror folding.  The nef_spectrum_dimension loop gives, per dimension, the spectral_width,
+  the value_first_point (the high ppm edge of the window), the folding ('circular', 'mirror' or
+  'none'), and whether the nef_peak positions are absolute_peak_positions or as seen in the
+  folded spectrum.
+
+    dimensions = SpectrumDimensions(spectrum)
+    seen = dimensions.fold(positions)                       # Where absolute positions appear
+    absolute = dimensions.unfold(seen, reference)           # The alias nearest reference
+
+Every function works on a whole (peaks, dimensions) array at once.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+import numpy as np
+
+from .columns import float_column, loop_columns
+
+DIMENSION_LOOP = 'nef_spectrum_dimension'
+PEAK_LOOP = 'nef_peak'
+
+CIRCULAR = 'circular'
+MIRROR = 'mirror'
+NONE = 'none'
+
+
+def fold(positions, first_point, width, folding):
+    """
+    Where positions appear in a spectral window from first_point - width up to first_point.
+
+    :param positions: array
+    :param first_point: float or array broadcasting against positions
+    :param width: float or array    # NaN for no folding
+    :param folding: str or array of str     # 'circular', 'mirror' or 'none'
+    :rtype: numpy.ndarray
+    """
+    positions = np.asarray(positions, dtype=float)
+    folding = np.asarray(folding)
+    with np.errstate(invalid='ignore'):
+        circular = np.mod(first_point - positions, width)
+        mirrored = np.mod(first_point - positions, 2 * width)
+        mirrored = np.where(mirrored > width, 2 * width - mirrored, mirrored)
+    folded = np.where(folding == CIRCULAR, first_point - circular,
+                      np.where(folding == MIRROR, first_point - mirrored, positions))
+    return np.where(np.isnan(width) | (width <= 0), positions, folded)
+
+
+def unfold(positions, first_point, width, folding, reference):
+    """
+    The image of each folded position that is nearest its reference position, for instance the
+      shift of the atom a peak is assigned to.  Positions with a NaN reference are unchanged.
+
+    :param positions: array     # As seen in the window
+    :param reference: array broadcasting against positions
+    :rtype: numpy.ndarray
+    """
+    positions = np.asarray(positions, dtype=float)
+    reference = np.asarray(reference, dtype=float)
+    folding = np.asarray(folding)
+    with np.errstate(invalid='ignore'):
+        period = np.where(folding == MIRROR, 2 * width, width)
+        nearest = positions + np.round((reference - positions) / period) * period
+        # Mirror folding also has the images reflected at the window edge
+        reflected = 2 * first_point - positions
+        reflected = reflected + np.round((reference - reflected) / period) * period
+        nearest = np.where((folding == MIRROR) &
+                           (np.abs(reflected - reference) < np.abs(nearest - reference)),
+                           reflected, nearest)
+    unfolded = np.where((folding == CIRCULAR) | (folding == MIRROR), nearest, positions)
+    return np.where(np.isnan(width) | (width <= 0) | np.isnan(reference), positions, unfolded)
+
+
+class SpectrumDimensions(object):
+    """
+    The folding parameters of each dimension of a spectrum, as arrays by dimension.
+
+    Dimensions without a spectral_width, or with folding 'none' or missing, are left unchanged by
+      fold and unfold.
+
+    :param spectrum: mapping with a nef_spectrum_dimension loop, as rows or columns
+    :ivar dimension_ids: list of str
+    :ivar axis_codes: list of str
+    :ivar width: array  # spectral_width, NaN where missing
+    :ivar first_point: array    # value_first_point, NaN where missing
+    :ivar folding: array of str
+    :ivar absolute: bool array  # Whether nef_peak positions are absolute rather than as seen
+    """
+
+    def __init__(self, spectrum):
+        columns = loop_columns(spectrum[DIMENSION_LOOP],
+                               ('dimension_id', 'axis_code', 'spectral_width',
+                                'value_first_point', 'folding', 'absolute_peak_positions'))
+        self.dimension_ids = columns['dimension_id'] or []
+        count = len(self.dimension_ids)
+        self.axis_codes = columns['axis_code'] or [None] * count
+        self.width = float_column(columns['spectral_width'], count)
+        self.first_point = float_column(columns['value_first_point'], count)
+        self.folding = np.array([str(f).lower() for f in columns['folding'] or [NONE] * count])
+        self.width[np.isnan(self.first_point)] = np.nan
+        # NEF's default is absolute positions
+        self.absolute = np.array([str(a).lower() != 'false'
+                                  for a in columns['absolute_peak_positions'] or [None] * count],
+                                 dtype=bool)
+
+    def __len__(self):
+        return len(self.dimension_ids)
+
+
+    @property
+    def folded(self):
+        """
+        Which dimensions fold, as a bool array.
+        """
+        return ~np.isnan(self.width) & np.isin(self.folding, (CIRCULAR, MIRROR))
+
+    def window(self, dimension):
+        """
+        :param dimension: int   # Index, from 0
+        :return: (first_point, width, folding) of one dimension, or None if it doesn't fold
+        """
+        if not self.folded[dimension]:
+            return None
+        return (float(self.first_point[dimension]), float(self.width[dimension]),
+                str(self.folding[dimension]))
+
+    def fold(self, positions):
+        """
+        Where absolute positions appear in the spectrum.
+
+        :param positions: array (peaks, dimensions)
+        """
+        return fold(positions, self.first_point, self.width, self.folding)
+
+    def unfold(self, positions, reference):
+        """
+        :param positions: array (peaks, dimensions)     # As seen in the spectrum
+        :param reference: array (peaks, dimensions)     # NaN where unknown
+        """
+        return unfold(positions, self.first_point, self.width, self.folding, reference)
+
+    def peak_positions(self, spectrum, reference=None):
+        """
+        The nef_peak positions of a spectrum, with those given as seen unfolded to the image
+          nearest reference, where there is one.
+
+        :param spectrum: mapping with a nef_peak loop, as rows or columns
+        :param reference: array (peaks, dimensions), or None to leave folded positions as they are
+        :return: array (peaks, dimensions)  # ppm, NaN where missing
+        """
+        names = ['peak_id'] + ['position_{}'.format(d) for d in self.dimension_ids]
+        columns = loop_columns(spectrum[PEAK_LOOP], names)
+        count = len(columns['peak_id'] or [])
+        positions = np.stack([float_column(columns['position_{}'.format(d)], count)
+                              for d in self.dimension_ids], axis=-1).reshape(count, -1)
+        if reference is None:
+            return positions
+        unfolded = self.unfold(positions, reference)
+        return np.where(self.absolute, positions, unfolded)
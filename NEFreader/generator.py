@@ -0,0 +1,390 @@
+"""
+Synthetic NEF project generator for scaling and benchmark runs.
+
+Saveframes are set up with the Nef convenience functions and loop columns are taken from the field
+  lists on Nef, but loop rows are produced lazily and written in batches, so the size of the output
+  is limited by the disk rather than by memory.  Only the molecular system and its chemical shifts,
+  which every other loop refers to, are held in memory.
+
+    from NEFreader import generator
+    generator.save('big.nef', residues=5000, spectra=200, peaks=20000)
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+import random
+import time
+
+from .nef import Nef, __nef_version__, __version__
+from . import writer
+from .compression import open_text
+
+ROW_BATCH_SIZE = 1000
+
+RESIDUE_TYPES = ('ALA', 'ARG', 'ASN', 'ASP', 'CYS', 'GLN', 'GLU', 'GLY', 'HIS', 'ILE',
+                 'LEU', 'LYS', 'MET', 'PHE', 'PRO', 'SER', 'THR', 'TRP', 'TYR', 'VAL')
+
+# Atom name: (mean shift, standard deviation) in ppm
+BACKBONE_SHIFTS = (('H', (8.25, 0.6)),
+                   ('N', (120.0, 4.0)),
+                   ('CA', (56.5, 4.0)),
+                   ('C', (176.0, 2.0)),
+                   ('HA', (4.4, 0.4)),
+                   ('CB', (38.0, 10.0)))
+GLY_SHIFTS = (('H', (8.3, 0.6)),
+              ('N', (109.5, 3.5)),
+              ('CA', (45.3, 1.3)),
+              ('C', (173.9, 1.8)),
+              ('HA2', (3.97, 0.4)),
+              ('HA3', (3.90, 0.4)))
+PRO_SHIFTS = (('N', (135.0, 5.0)),
+              ('CA', (63.3, 1.5)),
+              ('C', (176.7, 1.5)),
+              ('HA', (4.4, 0.3)),
+              ('CB', (31.8, 1.2)))
+
+# axis_code: (atom name prefix, spectrometer frequency at 600 MHz 1H, spectral width in ppm,
+#             value of first point in ppm)
+AXES = {'1H': ('H', '600.130', '14.000', '12.000'),
+        '15N': ('N', '60.818', '36.000', '138.000'),
+        '13C': ('C', '150.903', '80.000', '80.000')}
+AXIS_ORDER = ('1H', '15N', '13C')
+
+def _fmt(value):
+    return '{:.3f}'.format(value)
+
+
+class _MolecularSystem(object):
+    """
+    Sequence and assigned atoms with their chemical shifts
+    """
+
+    def __init__(self, rng, residues, chains):
+        self.sequence = []
+        self.atoms = []
+        self.atoms_by_prefix = {'H': [], 'N': [], 'C': []}
+        self.residues_by_chain = []
+
+        per_chain = [residues // chains + (1 if c < residues % chains else 0)
+                     for c in range(chains)]
+        for c, length in enumerate(per_chain):
+            chain_code = _chain_code(c)
+            chain_residues = []
+            for i in range(length):
+                residue_type = rng.choice(RESIDUE_TYPES)
+                if i == 0:
+                    linking = 'start'
+                elif i == length - 1:
+                    linking = 'end'
+                else:
+                    linking = 'middle'
+                residue = (chain_code, str(i + 1), residue_type)
+                self.sequence.append(residue + (linking, '.'))
+                chain_residues.append(residue)
+                for atom_name, (mean, sd) in _residue_shifts(residue_type):
+                    atom = residue + (atom_name, rng.gauss(mean, sd))
+                    self.atoms.append(atom)
+                    self.atoms_by_prefix[atom_name[0]].append(atom)
+            self.residues_by_chain.append(chain_residues)
+
+
+def _chain_code(i):
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    code = ''
+    i += 1
+    while i > 0:
+        i, r = divmod(i - 1, 26)
+        code = letters[r] + code
+    return code
+
+
+def _residue_shifts(residue_type):
+    if residue_type == 'GLY':
+        return GLY_SHIFTS
+    if residue_type == 'PRO':
+        return PRO_SHIFTS
+    return BACKBONE_SHIFTS
+
+
+def _write_loop(file_like, saveframe, loop_name, columns, rows):
+    """
+    Write a loop, formatting its rows in batches as they are produced.
+
+    :type rows: iterable of dict
+    """
+    file_like.write('\n')
+    file_like.write(writer._loopHeaderText(saveframe, loop_name))
+    file_like.write(writer._loopLabelsText(loop_name, columns))
+    file_like.write('\n')
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= ROW_BATCH_SIZE:
+            file_like.write(writer._loopRowsText(batch, columns, True))
+            batch = []
+    if batch:
+        file_like.write(writer._loopRowsText(batch, columns, True))
+    file_like.write(writer._loopFooterText(saveframe, loop_name))
+    file_like.write('\n')
+
+
+def _write_saveframe(file_like, nef, name, loops):
+    """
+    :type loops: list of (loop name, columns, row iterable)
+    """
+    saveframe = nef[name]
+    file_like.write(writer._saveframeHeaderText(nef, name))
+    file_like.write('\n')
+    file_like.write(writer._saveframeItemsText(nef, name))
+    for loop_name, columns, rows in loops:
+        _write_loop(file_like, saveframe, loop_name, columns, rows)
+    file_like.write(writer._saveframeFooterText(nef, name))
+    file_like.write('\n')
+
+
+def _sequence_rows(system):
+    for chain_code, sequence_code, residue_type, linking, variant in system.sequence:
+        yield {'chain_code': chain_code, 'sequence_code': sequence_code,
+               'residue_type': residue_type, 'linking': linking, 'residue_variant': variant}
+
+
+def _shift_rows(system, rng):
+    for chain_code, sequence_code, residue_type, atom_name, value in system.atoms:
+        yield {'chain_code': chain_code, 'sequence_code': sequence_code,
+               'residue_type': residue_type, 'atom_name': atom_name,
+               'value': _fmt(value + rng.gauss(0, 0.01)),
+               'value_uncertainty': '0.010'}
+
+
+def _atom_columns(row, atom, n):
+    row['chain_code_{}'.format(n)] = atom[0]
+    row['sequence_code_{}'.format(n)] = atom[1]
+    row['residue_type_{}'.format(n)] = atom[2]
+    row['atom_name_{}'.format(n)] = atom[3]
+
+
+def _distance_restraint_rows(system, rng, count):
+    protons = system.atoms_by_prefix['H']
+    ordinal = 0
+    for restraint_id in range(1, count + 1):
+        upper = rng.uniform(3.0, 6.0)
+        # Every tenth restraint is ambiguous between two atom pairs
+        for _ in range(2 if restraint_id % 10 == 0 else 1):
+            ordinal += 1
+            row = {'ordinal': str(ordinal), 'restraint_id': str(restraint_id)}
+            _atom_columns(row, rng.choice(protons), 1)
+            _atom_columns(row, rng.choice(protons), 2)
+            row['weight'] = '1.0'
+            row['target_value'] = _fmt(upper - 1.0)
+            row['lower_limit'] = '1.800'
+            row['upper_limit'] = _fmt(upper)
+            yield row
+
+
+def _dihedral_restraint_rows(system, rng, count):
+    angles = []
+    for chain_residues in system.residues_by_chain:
+        for i in range(1, len(chain_residues) - 1):
+            prev, this, next_ = chain_residues[i - 1], chain_residues[i], chain_residues[i + 1]
+            angles.append(('PHI', (prev, 'C'), (this, 'N'), (this, 'CA'), (this, 'C')))
+            angles.append(('PSI', (this, 'N'), (this, 'CA'), (this, 'C'), (next_, 'N')))
+    for i in range(count):
+        angle = angles[i % len(angles)]
+        target = rng.uniform(-180.0, 180.0)
+        row = {'ordinal': str(i + 1), 'restraint_id': str(i + 1),
+               'restraint_combination_id': '.'}
+        for n, (residue, atom_name) in enumerate(angle[1:], 1):
+            _atom_columns(row, residue + (atom_name,), n)
+        row['weight'] = '1.0'
+        row['target_value'] = _fmt(target)
+        row['lower_limit'] = _fmt(target - 20.0)
+        row['upper_limit'] = _fmt(target + 20.0)
+        row['name'] = angle[0]
+        yield row
+
+
+def _rdc_restraint_rows(system, rng, count):
+    amides = [atom for atom in system.atoms_by_prefix['H'] if atom[3] == 'H']
+    for i in range(count):
+        h = amides[i % len(amides)]
+        row = {'ordinal': str(i + 1), 'restraint_id': str(i + 1)}
+        _atom_columns(row, h[:3] + ('N',), 1)
+        _atom_columns(row, h, 2)
+        row['weight'] = '1.0'
+        row['target_value'] = _fmt(rng.uniform(-20.0, 20.0))
+        row['target_value_uncertainty'] = '1.000'
+        yield row
+
+
+def _spectrum_axes(dimensions):
+    return [AXIS_ORDER[i % len(AXIS_ORDER)] for i in range(dimensions)]
+
+
+def _dimension_rows(axes):
+    for i, axis_code in enumerate(axes):
+        _, frequency, width, first_point = AXES[axis_code]
+        yield {'dimension_id': str(i + 1), 'axis_unit': 'ppm', 'axis_code': axis_code,
+               'spectrometer_frequency': frequency, 'spectral_width': width,
+               'value_first_point': first_point, 'folding': 'circular',
+               'absolute_peak_positions': 'true',
+               'is_acquisition': 'true' if i == 0 else 'false'}
+
+
+def _transfer_rows(axes):
+    for i in range(1, len(axes)):
+        transfer_type = 'onebond' if axes[i] != '1H' else 'through-space'
+        yield {'dimension_1': '1', 'dimension_2': str(i + 1), 'transfer_type': transfer_type,
+               'is_indirect': 'false'}
+
+
+def _peak_columns(dimensions):
+    columns = list(Nef.PL_P_REQUIRED_FIELDS) + ['volume', 'height']
+    for i in range(1, dimensions + 1):
+        columns.append(Nef.PL_P_REQUIRED_FIELDS_PATTERN[0].format(i))
+        columns.append(Nef.PL_P_OPTIONAL_FIELDS_PATTERN[0].format(i))
+    for i in range(1, dimensions + 1):
+        columns.extend(f.format(i) for f in Nef.PL_P_REQUIRED_FIELDS_PATTERN[1:])
+    return columns
+
+
+def _peak_rows(system, rng, axes, count):
+    residues = [atom[:3] for atom in system.atoms if atom[3] == 'N']
+    shifts = dict(((atom[:4]), atom[4]) for atom in system.atoms)
+    for peak_id in range(1, count + 1):
+        row = {'ordinal': str(peak_id), 'peak_id': str(peak_id),
+               'volume': '{:.2E}'.format(rng.uniform(1e5, 1e8)),
+               'height': '{:.2E}'.format(rng.uniform(1e5, 1e8))}
+        residue = rng.choice(residues)
+        for n, axis_code in enumerate(axes, 1):
+            prefix = AXES[axis_code][0]
+            candidates = [name for name, _ in _residue_shifts(residue[2]) if name[0] == prefix]
+            if n > 2 and prefix == 'H':
+                # Through-space partner anywhere in the molecule
+                atom = rng.choice(system.atoms_by_prefix['H'])
+                assigned, value = atom[:4], atom[4]
+            elif candidates:
+                assigned = residue + (candidates[0],)
+                value = shifts[assigned]
+            else:
+                assigned, value = None, rng.uniform(0.0, 10.0)
+            row['position_{}'.format(n)] = _fmt(value + rng.gauss(0, 0.005))
+            row['position_uncertainty_{}'.format(n)] = '0.010'
+            if assigned is None:
+                _atom_columns(row, ('.', '.', '.', '.'), n)
+            else:
+                _atom_columns(row, assigned, n)
+        yield row
+
+
+def write(file_like, residues=100, chains=1, shift_lists=1, distance_restraint_lists=1,
+          distance_restraints=1000, dihedral_restraint_lists=1, dihedral_restraints=200,
+          rdc_restraint_lists=1, rdc_restraints=100, spectra=1, dimensions=3, peaks=1000,
+          seed=0, datablock='nef_synthetic_project', creation_date=None):
+    """
+    Write a synthetic NEF project to file_like.
+
+    Every list of a kind gets the same number of rows (restraints or peaks per list).  Peak lists
+      cycle their axes through 1H, 15N and 13C and refer to the first chemical shift list.
+
+    :type file_like: file
+    :param residues: int    # Total, divided over the chains
+    :param dimensions: int  # Per spectrum, at least 2
+    :param seed: int        # Output is reproducible for a given seed and creation_date
+    :param creation_date: str   # Default is the current time
+    """
+    if chains < 1 or residues // chains < 3:
+        raise ValueError('Need at least one chain and 3 residues per chain.')
+    if dimensions < 2:
+        raise ValueError('Spectra need at least 2 dimensions.')
+    if spectra > 0 and shift_lists < 1:
+        raise ValueError('Spectra need a chemical shift list.')
+    for name, count in (('distance_restraints', distance_restraints),
+                        ('dihedral_restraints', dihedral_restraints),
+                        ('rdc_restraints', rdc_restraints),
+                        ('peaks', peaks)):
+        if count < 1:
+            raise ValueError('{} must be at least 1, as loops cannot be empty.'.format(name))
+
+    rng = random.Random(seed)
+    system = _MolecularSystem(rng, residues, chains)
+
+    nef = Nef(initialize=False)
+    nef.datablock = datablock
+    file_like.write(writer._datablockText(nef))
+    file_like.write('\n')
+
+    name = 'nef_nmr_meta_data'
+    nef.add_saveframe(name, name, required_fields=Nef.MD_REQUIRED_FIELDS)
+    nef[name].update({'format_name': 'Nmr_Exchange_Format',
+                      'format_version': __nef_version__,
+                      'program_name': 'NEFreader',
+                      'program_version': __version__,
+                      'creation_date': (time.strftime('%Y-%m-%dT%H:%M:%S')
+                                        if creation_date is None else creation_date),
+                      'uuid': 'NEFreader-synthetic-{}'.format(seed)})
+    _write_saveframe(file_like, nef, name, [])
+
+    name = 'nef_molecular_system'
+    nef.add_saveframe(name, name, required_fields=Nef.MS_REQUIRED_FIELDS,
+                      required_loops=Nef.MS_REQUIRED_LOOPS)
+    _write_saveframe(file_like, nef, name,
+                     [('nef_sequence', Nef.MS_NS_REQUIRED_FIELDS, _sequence_rows(system))])
+
+    shift_list_names = []
+    for i in range(1, shift_lists + 1):
+        name = 'nef_chemical_shift_list_{}'.format(i)
+        shift_list_names.append(name)
+        nef.add_chemical_shift_list(name, 'ppm')
+        columns = Nef.CSL_CS_REQUIRED_FIELDS + Nef.CSL_CS_OPTIONAL_FIELDS
+        _write_saveframe(file_like, nef, name,
+                         [('nef_chemical_shift', columns, _shift_rows(system, rng))])
+
+    for i in range(1, distance_restraint_lists + 1):
+        name = 'nef_distance_restraint_list_{}'.format(i)
+        nef.add_distance_restraint_list(name, 'square-well-parabolic', restraint_origin='noe')
+        columns = Nef.DRL_DR_REQUIRED_FIELDS + ['target_value', 'lower_limit', 'upper_limit']
+        rows = _distance_restraint_rows(system, rng, distance_restraints)
+        _write_saveframe(file_like, nef, name, [('nef_distance_restraint', columns, rows)])
+
+    for i in range(1, dihedral_restraint_lists + 1):
+        name = 'nef_dihedral_restraint_list_{}'.format(i)
+        nef.add_dihedral_restraint_list(name, 'square-well-parabolic', restraint_origin='talos')
+        columns = Nef.DIHRL_DIHR_REQUIRED_FIELDS + ['target_value', 'lower_limit',
+                                                    'upper_limit', 'name']
+        rows = _dihedral_restraint_rows(system, rng, dihedral_restraints)
+        _write_saveframe(file_like, nef, name, [('nef_dihedral_restraint', columns, rows)])
+
+    for i in range(1, rdc_restraint_lists + 1):
+        name = 'nef_rdc_restraint_list_{}'.format(i)
+        nef.add_rdc_restraint_list(name, 'square-well-parabolic', restraint_origin='measured',
+                                   tensor_magnitude='11.000', tensor_rhombicity='0.067')
+        columns = Nef.RRL_RR_REQUIRED_FIELDS + ['target_value', 'target_value_uncertainty']
+        rows = _rdc_restraint_rows(system, rng, rdc_restraints)
+        _write_saveframe(file_like, nef, name, [('nef_rdc_restraint', columns, rows)])
+
+    for i in range(1, spectra + 1):
+        name = 'nef_nmr_spectrum_synthetic_{}'.format(i)
+        axes = _spectrum_axes(dimensions)
+        nef.add_peak_list(name, str(dimensions), shift_list_names[0],
+                          experiment_type='synthetic_{}D'.format(dimensions))
+        _write_saveframe(file_like, nef, name,
+                         [('nef_spectrum_dimension',
+                           Nef.PL_SD_REQUIRED_FIELDS + Nef.PL_SD_OPTIONAL_FIELDS,
+                           _dimension_rows(axes)),
+                          ('nef_spectrum_dimension_transfer',
+                           Nef.PL_SDT_REQUIRED_FIELDS + Nef.PL_SDT_OPTIONAL_FIELDS,
+                           _transfer_rows(axes)),
+                          ('nef_peak', _peak_columns(dimensions),
+                           _peak_rows(system, rng, axes, peaks))])
+
+
+def save(filename, **kwargs):
+    """
+    Write a synthetic NEF project to filename, compressed if it ends in .gz, .bz2 or .xz.  Keyword
+      arguments are as for write.
+
+    :type filename: str
+    """
+    with open_text(filename, 'w') as f:
+        write(f, **kwargs)
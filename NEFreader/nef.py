@@ -1,9 +1,13 @@
 __author__ = 'tjr22'
 
+import binascii
 from collections import OrderedDict
 
-from .parser import Lexer, Parser
-from .writer import nefToText
+from .parser import Lexer, Parser, iter_tokens, read_chunks
+from .saveframe import Saveframe
+from .writer import nefToText, nefTextChunks
+from . import compression
+from . import profiling
 
 MAJOR_VERSION = '0'
 MINOR_VERSION = '8'
@@ -217,6 +221,7 @@ class Nef(OrderedDict):
         super(Nef, self).__init__()
 
         self.input_filename = input_filename
+        self._digests = {}
 
         self.datablock = 'DEFAULT'
 
@@ -224,6 +229,15 @@ class Nef(OrderedDict):
             self.initialize()
 
 
+    def __reduce__(self):
+        # Unpickle without the default saveframes or datablock of a new Nef
+        return (self.__class__, (None, False), vars(self).copy(), None, iter(self.items()))
+
+    def __setstate__(self, state):
+        self.__dict__.clear()
+        self.__dict__.update(state)
+
+
     def initialize(self):
         self['nef_nmr_meta_data'] = OrderedDict()
         self['nef_nmr_meta_data'].update({k:'' for k in Nef.MD_REQUIRED_FIELDS})
@@ -244,49 +258,333 @@ class Nef(OrderedDict):
         self.add_chemical_shift_list('nef_chemical_shift_list_1', 'ppm')
 
     @staticmethod
-    def from_text(text, strict=True):
-        nef = Nef()
+    def empty(input_filename=None):
+        """
+        A Nef with no saveframes and no datablock, for a parser to fill.
+
+        Nef() builds the default saveframes, which a parser would only have to delete again; this
+          skips __init__ altogether.
+
+        :param input_filename: str
+        """
+        nef = Nef.__new__(Nef)
+        OrderedDict.__init__(nef)
+        nef.input_filename = input_filename
+        nef._digests = {}
+        return nef
 
-        tokenizer = Lexer()
-        parser = Parser(nef)
-        parser.strict = strict
 
-        del nef.datablock
-        del nef['nef_nmr_meta_data']
-        del nef['nef_molecular_system']
-        del nef['nef_chemical_shift_list_1']
+    @staticmethod
+    def from_tokens(tokens, strict=True, compact=False, stats=None):
+        """
+        Parse a stream of tokens, as made by Lexer.tokenize or parser.iter_tokens.
+
+        :param tokens: iterable[str]
+        :param strict: bool
+        :param compact: bool    # Store saveframes as Saveframe rather than OrderedDict
+        :param stats: NEFreader.profiling.Stats     # Records per-saveframe timings and loop rows
+        """
+        nef = Nef.empty()
+        parser = Parser(nef, strict=strict, saveframe_factory=Saveframe if compact else None,
+                        stats=stats, digests=nef._digests)
+        parser.parse(tokens)
+        return nef
 
-        parser.parse(tokenizer.tokenize(text))
 
+    @staticmethod
+    def from_stream(file_like, strict=True, compact=False):
+        """
+        Parse NEF from a text file-like object, such as a pipe or a decompressing stream, reading
+          and tokenizing it a piece at a time.
+
+        :param file_like: object with a read method
+        :param strict: bool
+        :param compact: bool    # Store saveframes as Saveframe rather than OrderedDict
+        """
+        return Nef.from_tokens(iter_tokens(read_chunks(file_like)), strict=strict,
+                               compact=compact)
+
+
+    @staticmethod
+    def from_text(text, strict=True, compact=False, stats=None):
+        """
+        Parse NEF text.
+
+        :param text: str
+        :param strict: bool
+        :param compact: bool    # Store saveframes as Saveframe rather than OrderedDict
+        :param stats: NEFreader.profiling.Stats     # Records tokenize and parse phases
+        """
+        if stats is None:
+            return Nef.from_tokens(Lexer().tokenize(text), strict=strict, compact=compact)
+
+        with stats.phase('tokenize', bytes=len(text)) as record:
+            tokens = Lexer().tokenize(text)
+            record.tokens = len(tokens)
+        with stats.phase('parse', tokens=len(tokens)) as record:
+            nef = Nef.from_tokens(tokens, strict=strict, compact=compact, stats=stats)
+            record.rows = sum(sf.rows for sf in stats.saveframes.values()
+                              if sf.rows is not None)
         return nef
 
 
     @staticmethod
-    def from_file(filename, strict=True):
-        with open(filename, 'r') as f:
-            nef = Nef.from_text(f.read(), strict=strict)
+    def from_files(filenames, strict=True, compact=False):
+        """
+        Read several NEF files, yielding a Nef for each in turn.
+
+        For batch loaders: every Nef starts empty, and one lexer and parser are shared by all the
+          files.  Files are read as by from_file without cache or stats.
+
+        :param filenames: iterable[str]
+        :param strict: bool
+        :param compact: bool    # Store saveframes as Saveframe rather than OrderedDict
+        """
+        lexer = Lexer()
+        parser = None
+        for filename in filenames:
+            nef = Nef.empty(filename)
+            if parser is None:
+                parser = Parser(nef, strict=strict,
+                                saveframe_factory=Saveframe if compact else None,
+                                digests=nef._digests)
+            else:
+                parser.target = nef
+                parser.digests = nef._digests
+            with compression.open_text(filename) as f:
+                parser.parse(iter_tokens(read_chunks(f), lexer))
+            yield nef
+
+
+    @staticmethod
+    def from_file(filename, strict=True, cache=False, compact=False, stats=None):
+        """
+        Read a NEF file from disk.  gzip, bzip2 and xz compressed files are decompressed as they
+          are read (see NEFreader.compression).  Without stats the file is tokenized and parsed a
+          piece at a time as it is read, rather than read whole first.
+
+        With `cache` set, the parsed result is also stored in the binary format (see
+          NEFreader.binary), keyed by the path, modification time and size of the file, and later
+          reads of the unchanged file load that instead of lexing and parsing the text again.
+
+        :param filename: str
+        :param strict: bool
+        :param cache: bool or str   # True for the default cache directory, or a directory path
+        :param compact: bool    # Store saveframes as Saveframe rather than OrderedDict
+        :param stats: NEFreader.profiling.Stats     # Records read, tokenize, parse and cache phases
+        """
+        if cache:
+            from . import binary
+            cache_dir = None if cache is True else cache
+            nef = Nef.empty(filename)
+            with profiling.phase(stats, 'cache load'):
+                found = binary.load_cached(filename, nef, cache_dir=cache_dir, strict=strict,
+                                           saveframe_factory=Saveframe if compact else None)
+            if found:
+                return nef
+
+        if stats is None:
+            with compression.open_text(filename) as f:
+                nef = Nef.from_stream(f, strict=strict, compact=compact)
+        else:
+            with stats.phase('read') as record:
+                with compression.open_text(filename) as f:
+                    text = f.read()
+                record.bytes = len(text)
+            nef = Nef.from_text(text, strict=strict, compact=compact, stats=stats)
+        nef.input_filename = filename
+
+        if cache:
+            with profiling.phase(stats, 'cache store'):
+                binary.store_cached(filename, nef, cache_dir=cache_dir, strict=strict)
         return nef
 
 
-    def write(self, file_like):
+    @staticmethod
+    def load_binary(filename):
+        """
+        Read a NEF previously written with save_binary.
+
+        :param filename: str
+        """
+        from . import binary
+        return binary.load(filename, target=Nef.empty(filename))
+
+
+    @staticmethod
+    def aload(stream, strict=True, compact=False):
+        """
+        Read NEF from an asyncio stream without blocking the event loop.  Use as
+          `nef = await Nef.aload(reader)`; see NEFreader.aio.aload.
+
+        :param stream: asyncio.StreamReader or async iterable of str or bytes chunks
+        :param strict: bool
+        :param compact: bool    # Store saveframes as Saveframe rather than OrderedDict
+        """
+        from . import aio
+        return aio.aload(stream, strict=strict, compact=compact)
+
+
+    def awrite(self, stream, canonical=False, metadata=None, recompute=False):
+        """
+        Write the NEF to an asyncio stream without blocking the event loop.  Use as
+          `await nef.awrite(writer)`; see NEFreader.aio.awrite.
+
+        :param stream: asyncio.StreamWriter, or anything with a write method
+        :param canonical: bool  # As for write
+        :param metadata: mapping    # As for write
+        :param recompute: bool  # As for write
+        """
+        from . import aio
+        return aio.awrite(self, stream, canonical=canonical, metadata=metadata,
+                          recompute=recompute)
+
+
+    def _saveframe_digests(self, name, recompute=False):
+        """
+        :rtype: NEFreader.digest.SaveframeDigest
+        """
+        from . import digest
+
+        saveframe = self[name]
+        digests = getattr(self, '_digests', None)
+        if digests is None:
+            digests = self._digests = {}
+        recorded = digests.get(name)
+        if recompute or recorded is None or recorded[0] is not saveframe:
+            recorded = digests[name] = (saveframe, digest.saveframe_digest(saveframe))
+        return recorded[1]
+
+    def saveframe_digest(self, name, recompute=False):
+        """
+        Deterministic hash of a saveframe's contents, as a hex string (see NEFreader.digest).
+
+        Parsing records the digest of each saveframe as it is read, and otherwise it is worked
+          out when first asked for.  A saveframe replaced in the Nef is hashed again, but after
+          changing a saveframe in place pass recompute to hash it again.
+
+        :param name: str    # Saveframe name
+        :param recompute: bool
+        :rtype: str
+        :raise KeyError: if there is no such saveframe
+        """
+        return binascii.hexlify(self._saveframe_digests(name, recompute).digest).decode('ascii')
+
+    def loop_digest(self, name, loop, recompute=False):
+        """
+        Deterministic hash of one loop of a saveframe, as a hex string.
+
+        :param name: str    # Saveframe name
+        :param loop: str    # Loop category
+        :param recompute: bool
+        :rtype: str
+        :raise KeyError: if there is no such saveframe or loop
+        """
+        loops = self._saveframe_digests(name, recompute).loops
+        return binascii.hexlify(loops[loop]).decode('ascii')
+
+    def content_digest(self, recompute=False, exclude=('nef_nmr_meta_data',)):
+        """
+        Deterministic hash of the datablock name and every saveframe, as a hex string.
+
+        :param recompute: bool
+        :param exclude: iterable of str     # Saveframes left out; by default the metadata, which
+                                            #   changes with every write
+        :rtype: str
+        """
+        from . import digest
+
+        exclude = set(exclude)
+        saveframes = [(name, self._saveframe_digests(name, recompute))
+                      for name in self if name not in exclude]
+        return binascii.hexlify(digest.nef_digest(saveframes, getattr(self, 'datablock', None))
+                                ).decode('ascii')
+
+
+    def _update_metadata(self, metadata=None, recompute=False):
+        """
+        Stamp the metadata saveframe for writing.
+
+        :param metadata: mapping of nef_nmr_meta_data item to value, set instead of what would be
+                         stamped, e.g. a fixed creation_date to make output reproducible
+        :param recompute: bool  # Hash every saveframe again for the uuid, not only replaced ones
+        """
         import time
-        import random
 
+        fixed = dict(metadata or {})
         self['nef_nmr_meta_data']['format_version'] = __nef_version__
         if self['nef_nmr_meta_data']['program_name'] == '':
             self['nef_nmr_meta_data']['program_name'] = 'NEFreader'
             self['nef_nmr_meta_data']['program_version'] = __version__
-        self['nef_nmr_meta_data']['creation_date'] = time.strftime('%Y-%m-%dT%H:%M:%s')
-        self['nef_nmr_meta_data']['uuid'] = '-'.join((self['nef_nmr_meta_data']['program_name'],
-                                                      self['nef_nmr_meta_data']['creation_date'],
-                                                      str(hash(self))[:7]
-                                                     ))
-        file_like.write(nefToText(self))
-
-
-    def save(self, filename):
-        with open(filename, 'w') as f:
-            self.write(f)
+        for name, value in fixed.items():
+            self['nef_nmr_meta_data'][name] = value
+        if 'creation_date' not in fixed:
+            self['nef_nmr_meta_data']['creation_date'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        if 'uuid' not in fixed:
+            self['nef_nmr_meta_data']['uuid'] = '-'.join((
+                self['nef_nmr_meta_data']['program_name'],
+                self['nef_nmr_meta_data']['creation_date'],
+                self.content_digest(recompute=recompute)[:16]))
+
+
+    def write(self, file_like, stats=None, canonical=False, metadata=None, recompute=False):
+        """
+        Write the NEF text to a file-like object.  Without stats it is written a saveframe or a
+          run of loop rows at a time (see writer.nefTextChunks) rather than formatted whole first.
+
+        Canonical output (see NEFreader.writer) is the same bytes for the same content.  The
+          metadata is still stamped with the time of writing unless metadata gives a fixed
+          creation_date; the uuid is then reproducible too, as it is made from the program name,
+          the creation_date and the content digest.
+
+        The content digest uses the saveframe digests recorded when the Nef was read, hashing
+          only saveframes added or replaced since.  After changing a saveframe in place, pass
+          recompute, or call saveframe_digest(name, recompute=True) first, for the uuid to
+          reflect the change.
+
+        :param stats: NEFreader.profiling.Stats     # Records format and write phases
+        :param canonical: bool  # Stable ordering, quoting and number formatting
+        :param metadata: mapping of nef_nmr_meta_data item to value, set instead of being stamped
+        :param recompute: bool  # Hash every saveframe again for the uuid
+        """
+        self._update_metadata(metadata, recompute)
+        if stats is None:
+            for chunk in nefTextChunks(self, canonical=canonical):
+                file_like.write(chunk)
+            return
+
+        with profiling.phase(stats, 'format') as record:
+            text = nefToText(self, stats=stats, canonical=canonical)
+            if record is not None:
+                record.bytes = len(text)
+        with profiling.phase(stats, 'write', bytes=len(text)):
+            file_like.write(text)
+
+
+    def save(self, filename, stats=None, canonical=False, metadata=None, recompute=False):
+        """
+        Files named *.gz, *.bz2 or *.xz are compressed as they are written.
+
+        :param filename: str
+        :param stats: NEFreader.profiling.Stats     # Records format and write phases
+        :param canonical: bool  # As for write
+        :param metadata: mapping    # As for write
+        :param recompute: bool  # As for write
+        """
+        with compression.open_text(filename, 'w') as f:
+            self.write(f, stats=stats, canonical=canonical, metadata=metadata,
+                       recompute=recompute)
+
+
+    def save_binary(self, filename):
+        """
+        Write the NEF in the compact binary format (see NEFreader.binary).  Unlike save, the
+          metadata saveframe is stored exactly as it is.
+
+        :param filename: str
+        """
+        from . import binary
+        binary.save(self, filename)
 
 
     ### Convenience Functions ###
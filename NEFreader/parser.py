@@ -3,34 +3,86 @@ __author__ = 'TJ Ragan'
 __version__ = '0.1'
 
 from collections import OrderedDict
-import logging
 
-logger = logging.getLogger(__name__)
+from .compression import open_text
+
+
+class _Logger(object):
+    """
+    This module's logger, looked up on first use: importing logging costs more than the rest of
+      the parser put together, and most parses never warn.
+    """
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        import logging
+        return getattr(logging.getLogger(__name__), name)
+
+logger = _Logger()
+
+CHUNK_SIZE = 64 * 1024     # Characters read at a time by read_chunks
 
 
 class Lexer(object):
+    __slots__ = ('chars', 'tokens', '_state', '_newline', '_token', '_quote_char')
 
     def __init__(self, chars=None):
         """
         :type chars: iterable
         """
         self.chars = chars
-        self.tokens = []
-        self._state = None
-        self._newline = True
-        self._token = None
+        self._quote_char = None
+        self.reset()
 
 
     def tokenize(self, chars=None):
         if chars is None:
             chars = self.chars
 
+        self.reset()
+        self._process(chars)
+        self._finish_token()
+
+        return self.tokens
+
+
+    def reset(self):
+        """
+        Forget any partial input, ready to start a new text with feed or tokenize.
+        """
         self._state = 'start'
         self._newline = True
 
         self.tokens = []
         self._token = []
 
+
+    def feed(self, chars):
+        """
+        Tokenize the next part of a text.  The text can be split anywhere, including inside a
+          token; a partial token is kept until the rest of it arrives.
+
+        :type chars: str
+        :return: list of the tokens completed by these chars
+        """
+        self._process(chars)
+        tokens, self.tokens = self.tokens, []
+        return tokens
+
+
+    def close(self):
+        """
+        Finish the text given to feed.
+
+        :return: list of the remaining tokens
+        """
+        self._finish_token()
+        tokens = self.tokens
+        self.reset()
+        return tokens
+
+
+    def _process(self, chars):
         for c in chars:
 
             ### Newline whitespace
@@ -61,14 +113,12 @@ class Lexer(object):
             ### Actual characters
             else:
                 self._actual_character(c)
-        self._finish_token()
 
-        return self.tokens
 
     def _quote(self, c):
-        if self._state is 'start':
+        if self._state == 'start':
             self._start_quote(c)
-        elif self._state is 'quoted':
+        elif self._state == 'quoted':
             self._continue_quote(c)
 
     def _newline_char(self):
@@ -169,22 +219,175 @@ class Lexer(object):
 
 
 
+def read_chunks(file_like, size=None):
+    """
+    Read a file-like object, such as a pipe, socket file or decompressing stream, in pieces.
+
+    :param size: int    # Characters per read.  Default CHUNK_SIZE
+    :rtype: iterator[str]
+    """
+    if size is None:
+        size = CHUNK_SIZE
+    while True:
+        chunk = file_like.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_tokens(chunks, lexer=None):
+    """
+    Tokenize an iterable of pieces of text, such as the lines of a file or the results of
+      read_chunks, yielding each token as soon as it is complete.
+
+    The text can be split anywhere, even inside a token or a semicolon delimited value; the tokens
+      are the same as from tokenizing the whole text at once.
+
+    :type chunks: iterable[str]
+    :type lexer: Lexer
+    :rtype: iterator[str]
+    """
+    if lexer is None:
+        lexer = Lexer()
+    lexer.reset()
+    for chunk in chunks:
+        for t in lexer.feed(chunk):
+            yield t
+    for t in lexer.close():
+        yield t
+
+
+def _new_saveframe(name):
+    return OrderedDict()
+
+
+class ParseHandler(object):
+    """
+    Receives the events of a parse.
+
+    Pass a subclass to Parser(handler=...) to process a file as it is parsed instead of having
+      the parser build a target.  Events arrive in file order:
+
+        datablock(name)
+        start_saveframe(name)
+            item(name, value)                   # For each saveframe data item
+            start_loop(category, columns)
+                row(values)                     # For each loop row, values in column order
+            end_loop(category)
+        end_saveframe(name)
+
+    Names are without their category prefix, as in the parsed target.  A row cut short by the end
+      of its loop is passed with fewer values than there are columns.  All the events do nothing
+      here.
+    """
+    __slots__ = ()
+
+    def datablock(self, name):
+        pass
+
+    def start_saveframe(self, name):
+        pass
+
+    def item(self, name, value):
+        pass
+
+    def start_loop(self, category, columns):
+        pass
+
+    def row(self, values):
+        pass
+
+    def end_loop(self, category):
+        pass
+
+    def end_saveframe(self, name):
+        pass
+
+
+class TargetBuilder(ParseHandler):
+    """
+    The handler Parser uses when it isn't given one: builds the target mapping, with each loop a
+      list of OrderedDict rows.
+    """
+    __slots__ = ('target', 'saveframe_factory', '_saveframe', '_columns', '_rows')
+
+    def __init__(self, target, saveframe_factory=_new_saveframe):
+        """
+        :type target: OrderedDict or Nef
+        :type saveframe_factory: callable
+        """
+        self.target = target
+        self.saveframe_factory = saveframe_factory
+        self._saveframe = None
+        self._columns = None
+        self._rows = None
+
+    def datablock(self, name):
+        self.target.datablock = name
+
+    def start_saveframe(self, name):
+        self._saveframe = self.target[name] = self.saveframe_factory(name)
+
+    def item(self, name, value):
+        self._saveframe[name] = value
+
+    def start_loop(self, category, columns):
+        self._columns = columns
+        self._rows = []
+
+    def row(self, values):
+        self._rows.append(OrderedDict(zip(self._columns, values)))
+
+    def end_loop(self, category):
+        self._saveframe[category] = self._rows
+        self._rows = None
+
+    def end_saveframe(self, name):
+        self._saveframe = None
 
 
 class Parser(object):
+    __slots__ = ('tokens', 'strict', 'intern_values', 'saveframe_factory', 'stats', 'handler',
+                 'digests', 'target', 'no_target', 'input_filename', '_handler', '_interned', '_state',
+                 '_token_number', '_loop_key', '_datablock', '_saveframe_name', '_saveframe_category', '_data_name',
+                 '_loop_name', '_loop_columns', '_loop_rows', '_loop_row', '_loop_column_number')
 
-    def __init__(self, target=None, tokens=None, strict=True):
+    def __init__(self, target=None, tokens=None, strict=True, intern_values=True,
+                 saveframe_factory=None, stats=None, handler=None, digests=None):
         """
         :type target: OrderedDict or Nef
         :type tokens: iterable[str]
         :type strict: bool
+        :type intern_values: bool   # Share one string object between equal loop values
+        :type saveframe_factory: callable   # Called with the saveframe name to create each
+                                            #   saveframe, e.g. Saveframe.  Default OrderedDict.
+        :type stats: NEFreader.profiling.Stats  # Records per-saveframe timings and loop rows
+        :type handler: ParseHandler     # Receives the parse events instead of a target being
+                                        #   built.  target and saveframe_factory are then unused.
+        :type digests: dict     # Filled with saveframe name to (saveframe, SaveframeDigest) as
+                                #   the target is built; see NEFreader.digest
         """
         self.tokens = tokens
         self.strict = strict
+        self.intern_values = intern_values
+        self.saveframe_factory = _new_saveframe if saveframe_factory is None else saveframe_factory
+        self.stats = stats
+        self.handler = handler
+        self.digests = digests
+        self.input_filename = None
+        self._handler = None
+        self._interned = None
+        self._state = None
+        self._token_number = 0
         self._loop_key = None
+        self._datablock = None
         self._saveframe_name = None
+        self._saveframe_category = None
         self._data_name = None
-        if target is None:
+        if handler is not None:
+            self.target = None
+            self.no_target = False
+        elif target is None:
             self.target = OrderedDict()
             self.no_target = True
         else:
@@ -202,7 +405,10 @@ class Parser(object):
         tokenizer = Lexer()
 
         self.strict = strict
-        self.parse(tokenizer.tokenize(file_like))
+        if hasattr(file_like, 'read'):
+            self.parse(iter_tokens(read_chunks(file_like), tokenizer))
+        else:
+            self.parse(tokenizer.tokenize(file_like))
 
         return self.target
 
@@ -211,6 +417,10 @@ class Parser(object):
         """
         Open a file on disk and use it to populate the NEF object.
 
+        The file is tokenized a piece at a time, so with a handler memory use doesn't grow with
+          the size of the file.  gzip, bzip2 and xz compressed files are decompressed as they are
+          read.
+
         :param filename: str
         :param strict: bool
         """
@@ -220,8 +430,8 @@ class Parser(object):
         else:
             self.input_filename = filename
 
-        with open(filename, 'r') as f:
-            self.read(f.read(), strict=strict)
+        with open_text(filename) as f:
+            self.read(f, strict=strict)
         return self.target
 
 
@@ -235,11 +445,56 @@ class Parser(object):
         if tokens is None:
             tokens = self.tokens
 
+        self.reset()
+        self.feed(tokens)
+        return self.close()
+
+
+    def reset(self):
+        """
+        Prepare to parse a new token stream with feed.
+        """
+        if self.handler is None:
+            if self.digests is None:
+                self._handler = TargetBuilder(self.target, self.saveframe_factory)
+            else:
+                from .digest import DigestingBuilder
+                self._handler = DigestingBuilder(self.target, self.saveframe_factory,
+                                                 self.digests)
+            self._datablock = getattr(self.target, 'datablock', None)
+        else:
+            self._handler = self.handler
+            self._datablock = None
+        self._token_number = 0
         self._loop_key = None
         self._saveframe_name = None
+        self._saveframe_category = None
         self._data_name = None
+        self._interned = {} if self.intern_values else None
+
+
+    def close(self):
+        """
+        Finish a token stream given to feed.
+
+        :return: the target, if it was created by the parser
+        """
+        self._interned = None
+        self._handler = None
+
+        if self.no_target:
+            return self.target
 
-        for i, t in enumerate(tokens):
+
+    def feed(self, tokens):
+        """
+        Parse the next part of a token stream.  Call reset first and close at the end; the parse
+          state, including token numbers, carries over between calls.
+
+        :type tokens: iterable[str]
+        """
+        i = self._token_number - 1
+        for i, t in enumerate(tokens, self._token_number):
             ### Newlines
             if t == '\n':
                 pass
@@ -255,7 +510,7 @@ class Parser(object):
             ### Required datablock declaration
             elif t.lower().startswith('data_'):
                 self._datablock_token(t)
-            elif not hasattr(self.target, 'datablock'):
+            elif self._datablock is None:
                 self._noncomment_token_outside_data_block(i)
 
             ### Globals (Are we using these?)
@@ -280,8 +535,7 @@ class Parser(object):
             else:
                 self._data_value_token(i, t)
 
-        if self.no_target:
-            return self.target
+        self._token_number = i + 1
 
 
 
@@ -306,8 +560,9 @@ class Parser(object):
         :type t: str    # Token
         :raise Exception:
         """
-        if not hasattr(self.target, 'datablock'):
-            self.target.datablock = t[5:]
+        if self._datablock is None:
+            self._datablock = t[5:]
+            self._handler.datablock(self._datablock)
             self._state = 'start'
         else:
             raise Exception('Multiple datablocks not allowed.')
@@ -325,7 +580,8 @@ class Parser(object):
             raise Exception('Token {}: NEF format requires all non-comments exist in a datablock.'
                             .format(i))
         else:
-            self.target.datablock = 'data_nef_default'
+            self._datablock = 'data_nef_default'
+            self._handler.datablock(self._datablock)
 
 
     def _global_statement(self, t):
@@ -429,22 +685,28 @@ class Parser(object):
           previous data name, and inside a loop they are associated with a loop column.  The first
           data name encountered in a loop marks the end of the column declarations for that loop.
 
+        Loop columns such as chain_code, residue_type or atom_name hold a handful of distinct values
+          repeated on every row, so with intern_values set equal loop values share a single string.
+
         :type i: int    # Token number
         :type t: str    # Token
         """
         if self._state == 'in loop columns specification':
             self._state = 'in loop data'
-            self._loop_column_number = 0
+            self._handler.start_loop(self._loop_name, self._loop_columns)
 
         if self._state == 'in saveframe':
             self._add_to_saveframe(i, t)
         elif self._state == 'in loop data':
-            if self._loop_column_number >= len(self._loop_columns):
-                self._loop_column_number = 0
-                self._loop_data.append(self._loop_row)
-                self._loop_row = OrderedDict()
-            self._loop_row[self._loop_columns[self._loop_column_number]] = t
+            if self._interned is not None:
+                t = self._interned.setdefault(t, t)
+            self._loop_row.append(t)
             self._loop_column_number += 1
+            if self._loop_column_number == len(self._loop_columns):
+                self._handler.row(self._loop_row)
+                self._loop_rows += 1
+                self._loop_row = []
+                self._loop_column_number = 0
 
     def _add_to_saveframe(self, i, t):
         """
@@ -456,9 +718,12 @@ class Parser(object):
         :type i: int    # Token number
         :type t: str    # Token
         """
-        if 'sf_category' in self.target[self._saveframe_name]:
+        if self._saveframe_category is not None:
             self._check_saveframe_category(i)
-        self.target[self._saveframe_name][self._data_name.split('.')[1]] = t
+        name = self._data_name.split('.')[1]
+        if name == 'sf_category':
+            self._saveframe_category = t
+        self._handler.item(name, t)
 
     def _check_saveframe_category(self, i):
         """
@@ -469,7 +734,7 @@ class Parser(object):
         :type i: int    # Token number
         :raise Exception:
         """
-        if self._data_name.split('.')[0] != self.target[self._saveframe_name]['sf_category']:
+        if self._data_name.split('.')[0] != self._saveframe_category:
             error_message = 'Token {}: Mismatch data name type {} in saveframe {}' \
                 .format(i, self._data_name, self._saveframe_name)
             if self.strict:
@@ -500,7 +765,10 @@ class Parser(object):
                 raise Exception('Token {}: Nested saveframes are not allowed.'.format(i))
         self._state = 'in saveframe'
         self._saveframe_name = t[5:]
-        self.target[self._saveframe_name] = OrderedDict()
+        self._saveframe_category = None
+        self._handler.start_saveframe(self._saveframe_name)
+        if self.stats is not None:
+            self.stats.start_saveframe(self._saveframe_name, i)
 
 
     def _start_loop(self):
@@ -512,8 +780,9 @@ class Parser(object):
         self._state = 'in loop columns specification'
         self._loop_name = None
         self._loop_columns = []
-        self._loop_data = []
-        self._loop_row = OrderedDict()
+        self._loop_rows = 0
+        self._loop_row = []
+        self._loop_column_number = 0
 
 
     def _finish_loop(self, i):
@@ -527,7 +796,9 @@ class Parser(object):
         :raise Exception:
         """
 
-        if self._loop_column_number != len(self._loop_columns):
+        if self._state == 'in loop columns specification':
+            self._handler.start_loop(self._loop_name, self._loop_columns)
+        if self._loop_column_number != 0:
             error_message = 'Token {}: Number of data values is not a multiple of number of'
             error_message += ' column names in loop {}'
             error_message = error_message.format(i, self._loop_name)
@@ -535,8 +806,11 @@ class Parser(object):
                 raise Exception(error_message)
             else:
                 logger.warning(error_message)
-        self._loop_data.append(self._loop_row)
-        self.target[self._saveframe_name][self._loop_name] = self._loop_data
+            self._handler.row(self._loop_row)
+            self._loop_rows += 1
+        self._handler.end_loop(self._loop_name)
+        if self.stats is not None:
+            self.stats.loop_rows(self._saveframe_name, self._loop_name, self._loop_rows)
 
         if self._saveframe_name is None:
             self._state = 'start'
@@ -545,7 +819,8 @@ class Parser(object):
 
         self._loop_name = None
         self._loop_columns = []
-        del self._loop_column_number
+        self._loop_row = []
+        self._loop_column_number = 0
 
 
     def _loop_column_name_token(self, i):
@@ -576,7 +851,11 @@ class Parser(object):
         """
         if self._state.startswith('in loop'):
             self._finish_loop(i)
+        self._handler.end_saveframe(self._saveframe_name)
+        if self.stats is not None:
+            self.stats.end_saveframe(self._saveframe_name, i)
         self._saveframe_name = None
+        self._saveframe_category = None
         self._state = 'start'
 
     def _unnamed_saveframe(i):
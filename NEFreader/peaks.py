@@ -0,0 +1,248 @@
+"""
+Proposing assignments for peaks from a chemical shift list.
+
+    matcher = PeakMatcher.from_nef(nef, 'nef_nmr_spectrum_cnoesy1')
+    matches = matcher.match()                   # The peaks with no assignment yet
+    matches.assignments(0)                      # Candidate atoms along each dimension
+
+The shifts of each kind of nucleus are sorted once.  The candidates for every peak along a
+  dimension are then found together, by binary searches for the ends of each peak's tolerance
+  window, so matching costs O((peaks + shifts) log shifts) plus the number of candidates found,
+  rather than peaks x shifts comparisons.
+
+Along dimensions whose peak positions are given as seen in a folded spectrum, the shifts are
+  folded into the spectral window the same way before matching, so aliased peaks find their atoms.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+from collections import namedtuple
+
+import numpy as np
+
+from .columns import float_column, loop_columns, null_column
+from .folding import SpectrumDimensions, fold
+
+SHIFT_LOOP = 'nef_chemical_shift'
+PEAK_LOOP = 'nef_peak'
+
+# Match tolerances in ppm by axis_code
+DEFAULT_TOLERANCES = {'1H': 0.04,
+                      '13C': 0.4,
+                      '15N': 0.4}
+DEFAULT_TOLERANCE = 0.4
+
+Candidates = namedtuple('Candidates', ('peaks', 'shifts', 'deviations'))
+
+
+def element(axis_code):
+    """
+    '13C' -> 'C'
+    """
+    return axis_code.lstrip('0123456789')
+
+
+def _windows(sorted_values, positions, tolerance):
+    """
+    Candidates within tolerance of each position, as parallel arrays of position index and index
+      into sorted_values.  NaN positions have none.
+    """
+    positions = np.where(np.isnan(positions), np.inf, positions)
+    starts = np.searchsorted(sorted_values, positions - tolerance, side='left')
+    ends = np.searchsorted(sorted_values, positions + tolerance, side='right')
+    counts = np.maximum(ends - starts, 0)
+    total = int(counts.sum())
+    position_index = np.repeat(np.arange(len(positions)), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return position_index, np.repeat(starts, counts) + offsets
+
+
+class ShiftIndex(object):
+    """
+    The shifts of a chemical shift list, sorted by value for each element.
+
+    :param shift_list: mapping with a nef_chemical_shift loop, as rows or columns
+    :ivar atoms: list of (chain_code, sequence_code, residue_type, atom_name)
+    :ivar values: array
+    """
+
+    def __init__(self, shift_list):
+        columns = loop_columns(shift_list[SHIFT_LOOP], ('chain_code', 'sequence_code',
+                                                        'residue_type', 'atom_name', 'value'))
+        self.atoms = list(zip(columns['chain_code'] or [], columns['sequence_code'] or [],
+                              columns['residue_type'] or [], columns['atom_name'] or []))
+        self.values = float_column(columns['value'], len(self.atoms))
+        self._sorted = {}
+
+    def __len__(self):
+        return len(self.atoms)
+
+
+    def sorted(self, element, window=None):
+        """
+        :param window: (first_point, width, folding), to fold the values into a spectral window
+        :return: (sorted values, their indices into atoms and values) for the atoms of an element
+        """
+        key = (element, window)
+        try:
+            return self._sorted[key]
+        except KeyError:
+            pass
+        indices = np.array([i for i, atom in enumerate(self.atoms)
+                            if atom[3].startswith(element)], dtype=np.intp)
+        indices = indices[~np.isnan(self.values[indices])]
+        values = self.values[indices]
+        if window is not None:
+            values = fold(values, *window)
+        order = np.argsort(values, kind='stable')
+        self._sorted[key] = (values[order], indices[order])
+        return self._sorted[key]
+
+    def candidates(self, element, positions, tolerance, window=None):
+        """
+        Shifts of an element within tolerance of each position, sorted by peak and then by
+          distance from the peak.
+
+        :param positions: array (peaks,)    # NaN for none
+        :param window: (first_point, width, folding), to compare positions and shifts folded into
+                       a spectral window
+        :rtype: Candidates
+        """
+        values, indices = self.sorted(element, window)
+        if window is not None:
+            positions = fold(positions, *window)
+        peaks, found = _windows(values, positions, tolerance)
+        shifts = indices[found]
+        deviations = values[found] - positions[peaks]
+        order = np.lexsort((np.abs(deviations), peaks))
+        return Candidates(peaks[order], shifts[order], deviations[order])
+
+
+class PeakMatches(object):
+    """
+    Candidate assignments for a set of peaks, along each dimension of their spectrum.
+
+    :ivar shifts: ShiftIndex
+    :ivar rows: int array   # Row of each matched peak in the nef_peak loop
+    :ivar peak_ids: list of str
+    :ivar candidates: list of Candidates, one per dimension.  Candidates.peaks index the matched
+                      peaks, i.e. rows and peak_ids
+    """
+
+    def __init__(self, shifts, rows, peak_ids, candidates):
+        self.shifts = shifts
+        self.rows = rows
+        self.peak_ids = peak_ids
+        self.candidates = candidates
+
+    def __len__(self):
+        return len(self.rows)
+
+
+    def best(self):
+        """
+        The closest shift for each peak along each dimension.
+
+        :return: int array (peaks, dimensions)  # Index into shifts, -1 where there is none
+        """
+        best = np.full((len(self), len(self.candidates)), -1, dtype=np.intp)
+        for dimension, candidates in enumerate(self.candidates):
+            peaks, first = np.unique(candidates.peaks, return_index=True)
+            best[peaks, dimension] = candidates.shifts[first]
+        return best
+
+    def assignments(self, peak):
+        """
+        Candidate atoms for one peak, closest first.
+
+        :param peak: int    # Index into rows
+        :return: list, per dimension, of list of (chain_code, sequence_code, residue_type,
+                 atom_name, deviation)
+        """
+        assignments = []
+        for candidates in self.candidates:
+            start, end = np.searchsorted(candidates.peaks, [peak, peak + 1])
+            assignments.append([self.shifts.atoms[shift] + (float(deviation),)
+                                for shift, deviation in zip(candidates.shifts[start:end],
+                                                            candidates.deviations[start:end])])
+        return assignments
+
+
+class PeakMatcher(object):
+    """
+    Matches the peaks of a spectrum against a chemical shift list.
+
+    :param spectrum: mapping with nef_spectrum_dimension and nef_peak loops, as rows or columns
+    :param shift_list: mapping with a nef_chemical_shift loop, or a ShiftIndex
+    :param tolerances: mapping of axis_code to ppm, or list of ppm by dimension.  Axis codes not
+                       given default to DEFAULT_TOLERANCES, or DEFAULT_TOLERANCE
+    :ivar dimensions: SpectrumDimensions
+    :ivar axis_codes: list of str   # By dimension
+    :ivar tolerances: list of float     # By dimension
+    :raise KeyError: if the spectrum is missing either loop
+    :raise ValueError: if a list of tolerances doesn't have one for each dimension
+    """
+
+    def __init__(self, spectrum, shift_list, tolerances=None):
+        self.spectrum = spectrum
+        self.shifts = shift_list if isinstance(shift_list, ShiftIndex) else ShiftIndex(shift_list)
+        self.dimensions = SpectrumDimensions(spectrum)
+        self.dimension_ids = self.dimensions.dimension_ids
+        self.axis_codes = self.dimensions.axis_codes
+
+        if tolerances is None:
+            tolerances = {}
+        if hasattr(tolerances, 'get'):
+            defaults = DEFAULT_TOLERANCES
+            self.tolerances = [tolerances.get(code, defaults.get(code, DEFAULT_TOLERANCE))
+                               for code in self.axis_codes]
+        else:
+            self.tolerances = list(tolerances)
+            if len(self.tolerances) != len(self.axis_codes):
+                raise ValueError('{} tolerances for {} dimensions.'.format(len(self.tolerances),
+                                                                          len(self.axis_codes)))
+
+    @staticmethod
+    def from_nef(nef, spectrum, tolerances=None):
+        """
+        Matcher for a spectrum of a Nef against the shift list it refers to.
+
+        :param nef: NEFreader.Nef
+        :param spectrum: str    # Saveframe name
+        :raise KeyError: if there is no such spectrum, or its shift list isn't in the Nef
+        """
+        saveframe = nef[spectrum]
+        name = saveframe['chemical_shift_list']
+        if name not in nef:
+            framecodes = [k for k, v in nef.items() if v.get('sf_framecode') == name]
+            if not framecodes:
+                raise KeyError('No chemical shift list {} for {}.'.format(name, spectrum))
+            name = framecodes[0]
+        return PeakMatcher(saveframe, nef[name], tolerances)
+
+
+    def match(self, unassigned_only=True):
+        """
+        :param unassigned_only: bool    # Only match peaks with no atom_name along any dimension
+        :rtype: PeakMatches
+        """
+        names = ['peak_id'] + ['atom_name_{}'.format(d) for d in self.dimension_ids]
+        columns = loop_columns(self.spectrum[PEAK_LOOP], names)
+        peak_ids = columns['peak_id'] or []
+        positions = self.dimensions.peak_positions(self.spectrum)
+        rows = np.arange(len(peak_ids))
+        if unassigned_only:
+            unassigned = np.ones(len(peak_ids), dtype=bool)
+            for d in self.dimension_ids:
+                unassigned &= null_column(columns['atom_name_{}'.format(d)], len(peak_ids))
+            rows = rows[unassigned]
+            positions = positions[unassigned]
+
+        candidates = []
+        for dimension, (code, tolerance) in enumerate(zip(self.axis_codes, self.tolerances)):
+            window = (None if self.dimensions.absolute[dimension]
+                      else self.dimensions.window(dimension))
+            candidates.append(self.shifts.candidates(element(code), positions[:, dimension],
+                                                     tolerance, window))
+        return PeakMatches(self.shifts, rows, [peak_ids[row] for row in rows], candidates)
@@ -0,0 +1,215 @@
+"""
+Opt-in instrumentation for loading, writing and validating NEF.
+
+Pass a Stats object to Nef.from_file, Nef.from_text, Nef.save or Validator.isValid to find out
+  where the time went:
+
+    stats = Stats()
+    nef = Nef.from_file('big.nef', stats=stats)
+    print(stats.report())
+
+Phases (read, tokenize, parse, format, write, and one per validation step) record wall time and,
+  where they apply, bytes, tokens and loop rows.  Saveframes record wall time, tokens and rows
+  per loop.  With trace_allocations set, each phase and saveframe also records the memory allocated
+  (net and peak) as seen by tracemalloc, which slows everything down considerably.
+
+Nothing is recorded unless a Stats object is passed; the parser only checks for one at saveframe and
+  loop boundaries.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from timeit import default_timer
+
+
+def _import_tracemalloc():
+    # Only imported when allocations are traced; it pulls in pickle, linecache and more
+    try:
+        import tracemalloc
+    except ImportError:
+        return None
+    return tracemalloc
+
+
+class Record(object):
+    """
+    Measurements for one phase or saveframe.  Counts that don't apply are None.
+    """
+    __slots__ = ('name', 'seconds', 'bytes', 'tokens', 'rows', 'loops', 'allocated',
+                 'peak_allocated', '_start', '_start_memory', '_peak_memory')
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = None
+        self.bytes = None
+        self.tokens = None
+        self.rows = None
+        self.loops = None
+        self.allocated = None
+        self.peak_allocated = None
+        self._start = None
+        self._start_memory = None
+        self._peak_memory = None
+
+    def as_dict(self):
+        d = OrderedDict()
+        for key in ('seconds', 'bytes', 'tokens', 'rows', 'loops', 'allocated', 'peak_allocated'):
+            value = getattr(self, key)
+            if value is not None:
+                d[key] = value
+        return d
+
+    def __repr__(self):
+        return 'Record({!r}, {})'.format(self.name, dict(self.as_dict()))
+
+
+class Stats(object):
+    """
+    Collects Records for phases and saveframes.
+
+    :param trace_allocations: bool  # Also record allocations, using tracemalloc
+    :param callback: callable   # Called as callback(kind, record), kind being 'phase' or
+                                #   'saveframe', whenever a record is finished
+    """
+
+    def __init__(self, trace_allocations=False, callback=None):
+        self._tracemalloc = _import_tracemalloc() if trace_allocations else None
+        if trace_allocations and self._tracemalloc is None:
+            raise ValueError('Allocation tracing needs tracemalloc (Python 3.4+).')
+        self.trace_allocations = trace_allocations
+        self.callback = callback
+        self.phases = OrderedDict()
+        self.saveframes = OrderedDict()
+        self._started_tracing = False
+        self._open = []     # Records started and not yet finished, while tracing allocations
+
+
+    def _start(self, record):
+        tracemalloc = self._tracemalloc
+        if self.trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            if hasattr(tracemalloc, 'reset_peak'):
+                # Keep the peak so far of the records already open, as resetting loses it
+                for open_record in self._open:
+                    open_record._peak_memory = max(open_record._peak_memory, peak)
+                tracemalloc.reset_peak()
+            record._start_memory = record._peak_memory = current
+            self._open.append(record)
+        record._start = default_timer()
+
+    def _finish(self, kind, record):
+        record.seconds = default_timer() - record._start
+        tracemalloc = self._tracemalloc
+        if self.trace_allocations and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            record.allocated = current - record._start_memory
+            record.peak_allocated = max(peak, record._peak_memory) - record._start_memory
+        if record in self._open:
+            self._open.remove(record)
+        if self.callback is not None:
+            self.callback(kind, record)
+
+
+    @contextmanager
+    def phase(self, name, bytes=None, tokens=None, rows=None):
+        """
+        Time the enclosed block as phase `name`.  Counts can be given here or set on the yielded
+          Record.  A phase run more than once is recorded under its last run.
+        """
+        record = Record(name)
+        record.bytes = bytes
+        record.tokens = tokens
+        record.rows = rows
+        self.phases[name] = record
+        self._start(record)
+        try:
+            yield record
+        finally:
+            self._finish('phase', record)
+
+
+    def start_saveframe(self, name, token_number=None):
+        record = Record(name)
+        record.tokens = token_number
+        record.loops = OrderedDict()
+        self.saveframes[name] = record
+        self._start(record)
+
+    def loop_rows(self, saveframe_name, loop_name, rows):
+        record = self.saveframes.get(saveframe_name)
+        if record is not None:
+            record.loops[loop_name] = rows
+
+    def end_saveframe(self, name, token_number=None):
+        record = self.saveframes.get(name)
+        if record is None or record.seconds is not None:
+            return
+        if token_number is not None and record.tokens is not None:
+            record.tokens = token_number - record.tokens
+        else:
+            record.tokens = None
+        record.rows = sum(record.loops.values())
+        self._finish('saveframe', record)
+
+
+    def stop(self):
+        """
+        Stop tracemalloc if this object started it.
+        """
+        if self._started_tracing and self._tracemalloc.is_tracing():
+            self._tracemalloc.stop()
+        self._started_tracing = False
+
+
+    def as_dict(self):
+        return OrderedDict((('phases', OrderedDict((k, v.as_dict())
+                                                   for k, v in self.phases.items())),
+                            ('saveframes', OrderedDict((k, v.as_dict())
+                                                       for k, v in self.saveframes.items()))))
+
+
+    def report(self, saveframes=10):
+        """
+        Text summary of the phases and the slowest saveframes.
+
+        :param saveframes: int  # Number of saveframes to list
+        """
+        lines = ['{:<36} {:>10} {:>12} {:>10} {:>10} {:>12}'.format(
+                 'phase', 'seconds', 'bytes', 'tokens', 'rows', 'allocated')]
+        for record in self.phases.values():
+            lines.append(_report_line(record))
+        if self.saveframes and saveframes:
+            lines.append('')
+            lines.append('{:<36} {:>10} {:>12} {:>10} {:>10} {:>12}'.format(
+                         'saveframe', 'seconds', '', 'tokens', 'rows', 'allocated'))
+            slowest = sorted((r for r in self.saveframes.values() if r.seconds is not None),
+                             key=lambda r: r.seconds, reverse=True)
+            for record in slowest[:saveframes]:
+                lines.append(_report_line(record))
+        return '\n'.join(lines)
+
+
+def _report_line(record):
+    def fmt(value):
+        return '' if value is None else value
+    return '{:<36} {:>10.4f} {:>12} {:>10} {:>10} {:>12}'.format(
+           record.name[:36], record.seconds or 0.0, fmt(record.bytes), fmt(record.tokens),
+           fmt(record.rows), fmt(record.allocated))
+
+
+@contextmanager
+def phase(stats, name, **counts):
+    """
+    stats.phase(name, **counts) when stats is set, otherwise a no-op yielding None.
+    """
+    if stats is None:
+        yield None
+    else:
+        with stats.phase(name, **counts) as record:
+            yield record
@@ -0,0 +1,680 @@
+"""
+Evaluating restraint lists against coordinates with NumPy.
+
+    atoms = [('A', '1', 'N'), ('A', '1', 'H'), ...]     # One per atom of the coordinate array
+    restraints = DistanceRestraints(nef['nef_distance_restraint_list_noe'], atoms)
+    report = restraints.evaluate(coordinates)           # coordinates: (models, atoms, 3)
+    report.model_rms, report.restraint_max
+
+A restraint list is compiled once into arrays of atom indices, after which evaluating it against
+  an ensemble is a handful of array operations however many restraints and models there are.
+
+Atom names may use the NEF wildcards: % for any digits and * for anything, so HB% is all of HB1,
+  HB2 and HB3.  A trailing x or y, as in HBx or HGx%, marks a non-stereospecific assignment, and is
+  evaluated as matching either atom.  All the atom pairs of all the rows with the same restraint_id
+  are combined as a sum of r**-6, giving the effective distance (sum r**-6)**(-1/6).
+
+DihedralRestraints does the same for nef_dihedral_restraint loops, with every dihedral of every
+  model computed from batched cross products and limits compared going round the circle.
+
+RdcRestraints fits an alignment tensor to every model of an ensemble by a batched singular value
+  decomposition, and back-calculates the couplings and Q-factors.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+from .columns import NULL_VALUES, float_column, loop_columns
+
+DISTANCE_RESTRAINT_LOOP = 'nef_distance_restraint'
+DIHEDRAL_RESTRAINT_LOOP = 'nef_dihedral_restraint'
+RDC_RESTRAINT_LOOP = 'nef_rdc_restraint'
+
+_WILDCARDS = re.compile(r'[%*]')
+_STEREO_MARKER = re.compile(r'^(.+)[xXyY]([%*]*)$')
+
+
+def _float(value):
+    if value is None or value in NULL_VALUES:
+        return np.nan
+    return float(value)
+
+
+def _name_pattern(name):
+    pattern = []
+    for c in name:
+        if c == '%':
+            pattern.append('[0-9]+')
+        elif c == '*':
+            pattern.append('.*')
+        else:
+            pattern.append(re.escape(c))
+    return re.compile(''.join(pattern) + '$')
+
+
+class AtomIndex(object):
+    """
+    Maps NEF atom identities to positions along the atom axis of a coordinate array.
+
+    :param atoms: iterable of (chain_code, sequence_code, atom_name)    # In coordinate order
+    """
+
+    def __init__(self, atoms):
+        self.atoms = [(str(chain), str(sequence), str(name)) for chain, sequence, name in atoms]
+        self._residues = OrderedDict()
+        for i, (chain, sequence, name) in enumerate(self.atoms):
+            self._residues.setdefault((chain, sequence), OrderedDict())[name] = i
+        self._resolved = {}
+
+    def __len__(self):
+        return len(self.atoms)
+
+
+    def resolve(self, chain_code, sequence_code, atom_name):
+        """
+        Indices of the atoms matching a possibly wildcarded atom name.
+
+        :return: list of int    # Empty if nothing matches
+        """
+        key = (str(chain_code), str(sequence_code), atom_name)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        names = self._residues.get(key[:2], {})
+        if atom_name in names:
+            indices = [names[atom_name]]
+        else:
+            indices = self._match(names, atom_name)
+            if not indices:
+                stereo = _STEREO_MARKER.match(atom_name)
+                if stereo is not None:
+                    indices = self._match(names, stereo.group(1) + '*' + stereo.group(2))
+        self._resolved[key] = indices
+        return indices
+
+    @staticmethod
+    def _match(names, atom_name):
+        if _WILDCARDS.search(atom_name) is None:
+            return []
+        pattern = _name_pattern(atom_name)
+        return [i for name, i in names.items() if pattern.match(name)]
+
+
+def _atom_index(atoms):
+    if isinstance(atoms, AtomIndex):
+        return atoms
+    return AtomIndex(atoms)
+
+
+def _as_ensemble(coordinates):
+    """
+    :return: float array of shape (models, atoms, 3)
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    if coordinates.ndim == 2:
+        coordinates = coordinates[np.newaxis]
+    if coordinates.ndim != 3 or coordinates.shape[2] != 3:
+        raise ValueError('Coordinates must have shape (models, atoms, 3) or (atoms, 3), '
+                         'not {}.'.format(coordinates.shape))
+    return coordinates
+
+
+def _loop(saveframe, loop_name):
+    try:
+        return saveframe[loop_name]
+    except KeyError:
+        raise KeyError('Saveframe has no {} loop.'.format(loop_name))
+
+
+def _check_atom_count(coordinates, atoms):
+    if coordinates.shape[1] != len(atoms):
+        raise ValueError('Coordinates have {} atoms, but {} atoms were given.'
+                         .format(coordinates.shape[1], len(atoms)))
+
+
+def _missing_atom(row, n, single=False):
+    return KeyError('No {}atom {} {} {} for restraint {}.'.format(
+        'single ' if single else '', row['chain_code_{}'.format(n)],
+        row['sequence_code_{}'.format(n)], row['atom_name_{}'.format(n)], row['restraint_id']))
+
+
+def _bound_violations(values, lower, upper):
+    """
+    How far values lie outside [lower, upper], 0 inside.  NaN limits are not applied.
+    """
+    below = np.where(np.isnan(lower), 0.0, lower - values)
+    above = np.where(np.isnan(upper), 0.0, values - upper)
+    return np.maximum(np.maximum(below, above), 0.0)
+
+
+class ViolationReport(object):
+    """
+    Restraint values and violations for an ensemble, with per-model and per-restraint statistics.
+
+    :ivar restraint_ids: list of str
+    :ivar values: array (models, restraints), or None   # e.g. effective distances.  None when
+                                                        #   restraints aren't a single value
+    :ivar violations: array (models, restraints)    # Amount outside the limits, 0 when satisfied
+    :ivar threshold: float  # Violations larger than this are counted
+    :ivar model_rms: array (models,)    # RMS violation over all restraints
+    :ivar model_max: array (models,)
+    :ivar model_count: array (models,)  # Restraints violated by more than threshold
+    :ivar restraint_mean: array (restraints,)   # Mean violation over the models
+    :ivar restraint_max: array (restraints,)
+    :ivar restraint_count: array (restraints,)  # Models violating by more than threshold
+    """
+
+    def __init__(self, restraint_ids, values, violations, threshold):
+        self.restraint_ids = restraint_ids
+        self.values = values
+        self.violations = violations
+        self.threshold = threshold
+
+        violated = violations > threshold
+        if violations.shape[1]:
+            self.model_rms = np.sqrt(np.mean(violations ** 2, axis=1))
+            self.model_max = violations.max(axis=1)
+        else:
+            self.model_rms = self.model_max = np.zeros(violations.shape[0])
+        self.model_count = violated.sum(axis=1)
+        self.restraint_mean = violations.mean(axis=0)
+        self.restraint_max = violations.max(axis=0)
+        self.restraint_count = violated.sum(axis=0)
+
+    @property
+    def rms(self):
+        """
+        RMS violation over all models and restraints.
+        """
+        if not self.violations.size:
+            return 0.0
+        return float(np.sqrt(np.mean(self.violations ** 2)))
+
+
+    def violated(self, models=1):
+        """
+        Restraints violated by more than threshold in at least `models` models.
+
+        :return: list of restraint_id
+        """
+        return [self.restraint_ids[i] for i in np.flatnonzero(self.restraint_count >= models)]
+
+
+class DistanceRestraints(object):
+    """
+    A nef_distance_restraint loop compiled for evaluation against coordinates.
+
+    Limits are taken from the first row of each restraint_id.  Missing limits are not applied, so
+      a restraint with only an upper_limit is violated only by being too long.
+
+    :param saveframe: mapping with a nef_distance_restraint loop, e.g. nef['my_restraint_list']
+    :param atoms: AtomIndex, or iterable of (chain_code, sequence_code, atom_name) in the order of
+                  the atom axis of the coordinates to be evaluated
+    :param skip_missing: bool   # Leave out rows naming atoms that aren't in atoms, and restraints
+                                #   that no rows are left for, rather than raising KeyError
+    :ivar restraint_ids: list of str
+    :ivar missing: list of str  # restraint_ids left out by skip_missing
+    :raise KeyError: if the saveframe has no such loop, or an atom can't be found
+    """
+
+    def __init__(self, saveframe, atoms, skip_missing=False):
+        self.atoms = _atom_index(atoms)
+        groups = OrderedDict()
+        limits = []
+        first = []
+        second = []
+        pair_groups = []
+        missing = OrderedDict()
+
+        for row in _loop(saveframe, DISTANCE_RESTRAINT_LOOP):
+            restraint_id = row['restraint_id']
+            atoms_1 = self.atoms.resolve(row['chain_code_1'], row['sequence_code_1'],
+                                         row['atom_name_1'])
+            atoms_2 = self.atoms.resolve(row['chain_code_2'], row['sequence_code_2'],
+                                         row['atom_name_2'])
+            if not atoms_1 or not atoms_2:
+                if not skip_missing:
+                    raise _missing_atom(row, 1 if not atoms_1 else 2)
+                if restraint_id not in groups:
+                    missing[restraint_id] = None
+                continue
+
+            if restraint_id not in groups:
+                missing.pop(restraint_id, None)
+                groups[restraint_id] = len(groups)
+                limits.append((_float(row.get('lower_limit')), _float(row.get('upper_limit')),
+                               _float(row.get('target_value'))))
+            group = groups[restraint_id]
+            for i in atoms_1:
+                for j in atoms_2:
+                    first.append(i)
+                    second.append(j)
+                    pair_groups.append(group)
+
+        self.restraint_ids = list(groups)
+        self.missing = list(missing)
+        limits = np.array(limits, dtype=float).reshape(-1, 3)
+        self.lower = limits[:, 0]
+        self.upper = limits[:, 1]
+        self.target = limits[:, 2]
+
+        # Pairs sorted by restraint, so that each restraint's r**-6 terms are one contiguous run
+        pair_groups = np.array(pair_groups, dtype=np.intp)
+        order = np.argsort(pair_groups, kind='stable')
+        self.first = np.array(first, dtype=np.intp)[order]
+        self.second = np.array(second, dtype=np.intp)[order]
+        counts = np.bincount(pair_groups, minlength=len(groups))
+        self._starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.intp)
+
+    def __len__(self):
+        return len(self.restraint_ids)
+
+
+    def distances(self, coordinates):
+        """
+        Effective distance of each restraint in each model.
+
+        :param coordinates: array (models, atoms, 3), or (atoms, 3) for a single model
+        :return: array (models, restraints)
+        """
+        coordinates = _as_ensemble(coordinates)
+        _check_atom_count(coordinates, self.atoms)
+        if not len(self):
+            return np.zeros((coordinates.shape[0], 0))
+        vectors = coordinates[:, self.first] - coordinates[:, self.second]
+        squared = np.einsum('mpk,mpk->mp', vectors, vectors)
+        with np.errstate(divide='ignore'):
+            sums = np.add.reduceat(squared ** -3, self._starts, axis=1)
+            return sums ** (-1 / 6)
+
+    def violations(self, coordinates):
+        """
+        How far each restraint's effective distance is outside its limits in each model.
+
+        :return: array (models, restraints)
+        """
+        return _bound_violations(self.distances(coordinates), self.lower, self.upper)
+
+    def evaluate(self, coordinates, threshold=0.5):
+        """
+        :param coordinates: array (models, atoms, 3), or (atoms, 3) for a single model
+        :param threshold: float     # Violations larger than this are counted, in the units of
+                                    #   the coordinates
+        :rtype: ViolationReport
+        """
+        distances = self.distances(coordinates)
+        violations = _bound_violations(distances, self.lower, self.upper)
+        return ViolationReport(self.restraint_ids, distances, violations, threshold)
+
+
+def dihedral_angles(coordinates, first, second, third, fourth):
+    """
+    Dihedral angles, in degrees from -180 to 180, for quadruples of atoms in every model.
+
+    :param coordinates: array (models, atoms, 3)
+    :param first, second, third, fourth: int arrays (dihedrals,)    # Atom indices
+    :return: array (models, dihedrals)
+    """
+    b1 = coordinates[:, second] - coordinates[:, first]
+    b2 = coordinates[:, third] - coordinates[:, second]
+    b3 = coordinates[:, fourth] - coordinates[:, third]
+    n1 = np.cross(b1, b2)
+    n2 = np.cross(b2, b3)
+    x = np.einsum('mdk,mdk->md', n1, n2)
+    y = np.sqrt(np.einsum('mdk,mdk->md', b2, b2)) * np.einsum('mdk,mdk->md', b1, n2)
+    return np.degrees(np.arctan2(y, x))
+
+
+def _periodic_violations(angles, lower, upper):
+    """
+    How far angles lie outside the arc from lower to upper, going round the circle, 0 inside.  An
+      arc may pass through 180, e.g. 170 to -170.  NaN limits are not applied.
+    """
+    width = np.mod(upper - lower, 360.0)
+    width = np.where(upper - lower >= 360.0, 360.0, width)
+    offset = np.mod(angles - lower, 360.0)
+    outside = offset > width
+    violation = np.where(outside, np.minimum(offset - width, 360.0 - offset), 0.0)
+    return np.where(np.isnan(lower) | np.isnan(upper), 0.0, violation)
+
+
+class DihedralRestraints(object):
+    """
+    A nef_dihedral_restraint loop compiled for evaluation against coordinates.
+
+    Each row restrains one dihedral to the arc from lower_limit to upper_limit, or, without
+      limits, to target_value +/- target_value_uncertainty.  Limits are in degrees and wrap round,
+      so -170 to 170 is the arc through 0 and 170 to -170 the arc through 180.  Rows with the same
+      restraint_id are alternatives, except that rows which also share a restraint_combination_id
+      must hold together: the restraint's violation is that of its best satisfied combination, and
+      a combination's that of its worst violated row.
+
+    :param saveframe: mapping with a nef_dihedral_restraint loop
+    :param atoms: AtomIndex, or iterable of (chain_code, sequence_code, atom_name) in the order of
+                  the atom axis of the coordinates to be evaluated
+    :param skip_missing: bool   # Leave out rows naming atoms that aren't in atoms, and restraints
+                                #   that no rows are left for, rather than raising KeyError
+    :ivar restraint_ids: list of str
+    :ivar missing: list of str  # restraint_ids left out by skip_missing
+    :raise KeyError: if the saveframe has no such loop, or an atom name doesn't match exactly one
+                     atom
+    """
+
+    def __init__(self, saveframe, atoms, skip_missing=False):
+        self.atoms = _atom_index(atoms)
+        restraints = OrderedDict()
+        combinations = {}
+        quadruples = []
+        limits = []
+        keys = []
+        missing = OrderedDict()
+
+        for row in _loop(saveframe, DIHEDRAL_RESTRAINT_LOOP):
+            restraint_id = row['restraint_id']
+            quadruple = []
+            for n in range(1, 5):
+                indices = self.atoms.resolve(row['chain_code_{}'.format(n)],
+                                             row['sequence_code_{}'.format(n)],
+                                             row['atom_name_{}'.format(n)])
+                if len(indices) != 1:
+                    break
+                quadruple.append(indices[0])
+            if len(quadruple) < 4:
+                if not skip_missing:
+                    raise _missing_atom(row, len(quadruple) + 1, single=True)
+                if restraint_id not in restraints:
+                    missing[restraint_id] = None
+                continue
+
+            if restraint_id not in restraints:
+                missing.pop(restraint_id, None)
+                restraints[restraint_id] = len(restraints)
+            # Rows without a combination id are each a combination of their own
+            combination_id = row.get('restraint_combination_id', '.')
+            if combination_id in NULL_VALUES:
+                combination_key = (restraint_id, None, len(quadruples))
+            else:
+                combination_key = (restraint_id, combination_id)
+            combination = combinations.setdefault(combination_key, len(combinations))
+
+            lower = _float(row.get('lower_limit'))
+            upper = _float(row.get('upper_limit'))
+            if np.isnan(lower) and np.isnan(upper):
+                target = _float(row.get('target_value'))
+                uncertainty = _float(row.get('target_value_uncertainty'))
+                if np.isnan(uncertainty):
+                    uncertainty = 0.0
+                lower, upper = target - uncertainty, target + uncertainty
+            quadruples.append(quadruple)
+            limits.append((lower, upper))
+            keys.append((restraints[restraint_id], combination))
+
+        self.restraint_ids = list(restraints)
+        self.missing = list(missing)
+
+        # Rows sorted by restraint and then combination, so that each is one contiguous run
+        keys = np.array(keys, dtype=np.intp).reshape(-1, 2)
+        order = np.lexsort((keys[:, 1], keys[:, 0]))
+        keys = keys[order]
+        quadruples = np.array(quadruples, dtype=np.intp).reshape(-1, 4)[order]
+        limits = np.array(limits, dtype=float).reshape(-1, 2)[order]
+        self.first, self.second, self.third, self.fourth = quadruples.T
+        self.lower = limits[:, 0]
+        self.upper = limits[:, 1]
+
+        new_combination = np.ones(len(keys), dtype=bool)
+        new_combination[1:] = keys[1:, 1] != keys[:-1, 1]
+        self._combination_starts = np.flatnonzero(new_combination)
+        combination_restraints = keys[self._combination_starts, 0]
+        new_restraint = np.ones(len(combination_restraints), dtype=bool)
+        new_restraint[1:] = combination_restraints[1:] != combination_restraints[:-1]
+        self._restraint_starts = np.flatnonzero(new_restraint)
+
+    def __len__(self):
+        return len(self.restraint_ids)
+
+
+    def angles(self, coordinates):
+        """
+        Dihedral angle of each row, in the order of row_violations, in each model.
+
+        :param coordinates: array (models, atoms, 3), or (atoms, 3) for a single model
+        :return: array (models, rows)   # Degrees, -180 to 180
+        """
+        coordinates = _as_ensemble(coordinates)
+        _check_atom_count(coordinates, self.atoms)
+        return dihedral_angles(coordinates, self.first, self.second, self.third, self.fourth)
+
+    def row_violations(self, coordinates):
+        """
+        :return: array (models, rows)   # Degrees outside each row's limits
+        """
+        return _periodic_violations(self.angles(coordinates), self.lower, self.upper)
+
+    def violations(self, coordinates):
+        """
+        How far each restraint is from being satisfied in each model.
+
+        :return: array (models, restraints)     # Degrees
+        """
+        rows = self.row_violations(coordinates)
+        if not len(self):
+            return np.zeros((rows.shape[0], 0))
+        combinations = np.maximum.reduceat(rows, self._combination_starts, axis=1)
+        return np.minimum.reduceat(combinations, self._restraint_starts, axis=1)
+
+    def evaluate(self, coordinates, threshold=5.0):
+        """
+        :param coordinates: array (models, atoms, 3), or (atoms, 3) for a single model
+        :param threshold: float     # Violations larger than this are counted, in degrees
+        :rtype: ViolationReport     # With values None, as a restraint may be several dihedrals.
+                                    #   The angles themselves are given by angles()
+        """
+        return ViolationReport(self.restraint_ids, None, self.violations(coordinates), threshold)
+
+
+def _saupe_design(vectors, scale):
+    """
+    Rows of the 5 parameter Saupe matrix fit: y**2-x**2, z**2-x**2, 2xy, 2xz, 2yz per vector.
+
+    :param vectors: array (..., 3)
+    :param scale: array broadcastable to vectors[..., 0]
+    :return: array (..., 5)
+    """
+    x, y, z = vectors[..., 0], vectors[..., 1], vectors[..., 2]
+    return scale[..., np.newaxis] * np.stack((y * y - x * x, z * z - x * x,
+                                              2 * x * y, 2 * x * z, 2 * y * z), axis=-1)
+
+
+def _saupe_matrices(parameters):
+    """
+    :param parameters: array (..., 5)   # Syy, Szz, Sxy, Sxz, Syz
+    :return: array (..., 3, 3)
+    """
+    syy, szz, sxy, sxz, syz = np.moveaxis(parameters, -1, 0)
+    sxx = -syy - szz
+    return np.stack((np.stack((sxx, sxy, sxz), axis=-1),
+                     np.stack((sxy, syy, syz), axis=-1),
+                     np.stack((sxz, syz, szz), axis=-1)), axis=-2)
+
+
+def tensor_magnitude_and_rhombicity(saupe):
+    """
+    Axial component Da and rhombicity R of alignment tensors, in the sense of the NEF
+      tensor_magnitude and tensor_rhombicity fields: D = Da((3cos**2(theta) - 1) +
+      3/2 R sin**2(theta) cos(2 phi)).
+
+    :param saupe: array (..., 3, 3)
+    :return: (array (...), array (...))
+    """
+    eigenvalues = np.linalg.eigvalsh(saupe)
+    order = np.argsort(np.abs(eigenvalues), axis=-1)
+    sxx, syy, szz = np.moveaxis(np.take_along_axis(eigenvalues, order, axis=-1), -1, 0)
+    magnitude = szz / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rhombicity = np.where(szz == 0, 0.0, 2 * (sxx - syy) / (3 * szz))
+    return magnitude, np.abs(rhombicity)
+
+
+class RdcFit(object):
+    """
+    Alignment tensors fitted to each model of an ensemble, and the couplings they give.
+
+    :ivar restraint_ids: list of str    # One per fitted row
+    :ivar observed: array (restraints,)
+    :ivar calculated: array (models, restraints)
+    :ivar saupe: array (models, 3, 3)
+    :ivar magnitude: array (models,)    # Da, in the units of the couplings
+    :ivar rhombicity: array (models,)
+    :ivar q_factors: array (models,)    # rms(calculated - observed) / rms(observed)
+    """
+
+    def __init__(self, restraint_ids, observed, calculated, saupe):
+        self.restraint_ids = restraint_ids
+        self.observed = observed
+        self.calculated = calculated
+        self.saupe = saupe
+        self.magnitude, self.rhombicity = tensor_magnitude_and_rhombicity(saupe)
+        rms_observed = np.sqrt(np.mean(observed ** 2)) if len(observed) else np.nan
+        self.q_factors = np.sqrt(np.mean((calculated - observed) ** 2, axis=1)) / rms_observed
+
+
+class RdcRestraints(object):
+    """
+    A nef_rdc_restraint loop compiled for alignment tensor fitting against coordinates.
+
+    The loop is read column by column, so it can be the rows of a parsed Nef or the columns from
+      iter_loop(..., as_columns=True).  Rows without a target_value are left out.  Each coupling is
+      multiplied by its scale, and rows with distance_dependent true also by the cube of the
+      inverse bond length, so that couplings between different kinds of nuclei can be fitted
+      together.  Rows are weighted by their weight column in the fit.
+
+    :param saveframe: mapping with a nef_rdc_restraint loop
+    :param atoms: AtomIndex, or iterable of (chain_code, sequence_code, atom_name) in the order of
+                  the atom axis of the coordinates to be evaluated
+    :param skip_missing: bool   # Leave out rows naming atoms that aren't in atoms, rather than
+                                #   raising KeyError
+    :ivar restraint_ids: list of str    # One per row used
+    :ivar missing: list of str  # restraint_ids of rows left out by skip_missing
+    :ivar magnitude: float or None  # tensor_magnitude of the saveframe
+    :ivar rhombicity: float or None # tensor_rhombicity of the saveframe
+    :raise KeyError: if the saveframe has no such loop, or an atom name doesn't match exactly one
+                     atom
+    """
+
+    COLUMNS = ('restraint_id',
+               'chain_code_1', 'sequence_code_1', 'atom_name_1',
+               'chain_code_2', 'sequence_code_2', 'atom_name_2',
+               'weight', 'target_value', 'scale', 'distance_dependent')
+
+    def __init__(self, saveframe, atoms, skip_missing=False):
+        self.atoms = _atom_index(atoms)
+        self.magnitude = self._field(saveframe, 'tensor_magnitude')
+        self.rhombicity = self._field(saveframe, 'tensor_rhombicity')
+        columns = loop_columns(_loop(saveframe, RDC_RESTRAINT_LOOP), self.COLUMNS)
+        restraint_ids = columns['restraint_id'] or []
+
+        first = []
+        second = []
+        resolved = np.zeros(len(restraint_ids), dtype=bool)
+        missing = []
+        for i, restraint_id in enumerate(restraint_ids):
+            atoms_1 = self.atoms.resolve(columns['chain_code_1'][i], columns['sequence_code_1'][i],
+                                         columns['atom_name_1'][i])
+            atoms_2 = self.atoms.resolve(columns['chain_code_2'][i], columns['sequence_code_2'][i],
+                                         columns['atom_name_2'][i])
+            if len(atoms_1) != 1 or len(atoms_2) != 1:
+                if not skip_missing:
+                    row = dict((name, values[i]) for name, values in columns.items()
+                               if values is not None)
+                    raise _missing_atom(row, 1 if len(atoms_1) != 1 else 2, single=True)
+                missing.append(restraint_id)
+                continue
+            resolved[i] = True
+            first.append(atoms_1[0])
+            second.append(atoms_2[0])
+
+        rows = len(restraint_ids)
+        observed = float_column(columns['target_value'], rows)
+        used = resolved & ~np.isnan(observed)
+        kept = used[resolved]
+        self.restraint_ids = [r for r, u in zip(restraint_ids, used) if u]
+        self.missing = missing
+        self.first = np.array(first, dtype=np.intp)[kept]
+        self.second = np.array(second, dtype=np.intp)[kept]
+        self.observed = observed[used]
+        self.scale = float_column(columns['scale'], rows, 1.0)[used]
+        self.weight = float_column(columns['weight'], rows, 1.0)[used]
+        distance_dependent = columns['distance_dependent']
+        if distance_dependent is None:
+            distance_dependent = ['false'] * rows
+        self.distance_dependent = np.array([str(v).lower() == 'true'
+                                            for v in distance_dependent], dtype=bool)[used]
+
+    @staticmethod
+    def _field(saveframe, name):
+        value = saveframe.get(name)
+        if value is None or value in NULL_VALUES:
+            return None
+        return float(value)
+
+    def __len__(self):
+        return len(self.restraint_ids)
+
+
+    def design_matrices(self, coordinates):
+        """
+        The matrices A of the linear system A s = observed couplings for the five independent
+          Saupe matrix elements s, one for each model.
+
+        :param coordinates: array (models, atoms, 3), or (atoms, 3) for a single model
+        :return: array (models, restraints, 5)
+        """
+        coordinates = _as_ensemble(coordinates)
+        _check_atom_count(coordinates, self.atoms)
+        vectors = coordinates[:, self.second] - coordinates[:, self.first]
+        lengths = np.sqrt(np.einsum('mrk,mrk->mr', vectors, vectors))
+        scale = np.where(self.distance_dependent, lengths ** -3, 1.0) * self.scale
+        return _saupe_design(vectors / lengths[..., np.newaxis], scale)
+
+    def back_calculate(self, coordinates, saupe):
+        """
+        Couplings given by alignment tensors.
+
+        :param coordinates: array (models, atoms, 3), or (atoms, 3) for a single model
+        :param saupe: array (3, 3) for the same tensor for every model, or (models, 3, 3)
+        :return: array (models, restraints)
+        """
+        saupe = np.asarray(saupe, dtype=float)
+        parameters = np.stack((saupe[..., 1, 1], saupe[..., 2, 2], saupe[..., 0, 1],
+                               saupe[..., 0, 2], saupe[..., 1, 2]), axis=-1)
+        design = self.design_matrices(coordinates)
+        parameters = np.broadcast_to(parameters, (design.shape[0], 5))
+        return np.einsum('mrp,mp->mr', design, parameters)
+
+    def fit(self, coordinates):
+        """
+        Fit an alignment tensor to each model by singular value decomposition, all models at once.
+
+        :param coordinates: array (models, atoms, 3), or (atoms, 3) for a single model
+        :rtype: RdcFit
+        :raise ValueError: with fewer than five restraints
+        """
+        if len(self) < 5:
+            raise ValueError('Fitting an alignment tensor needs at least 5 restraints, not {}.'
+                             .format(len(self)))
+        design = self.design_matrices(coordinates)
+        root_weight = np.sqrt(self.weight)
+        u, s, vt = np.linalg.svd(design * root_weight[:, np.newaxis], full_matrices=False)
+        cutoff = s.max(axis=-1, keepdims=True) * 1e-10
+        inverse_s = np.where(s > cutoff, 1 / np.where(s > cutoff, s, 1.0), 0.0)
+        projected = np.einsum('mrk,r->mk', u, root_weight * self.observed) * inverse_s
+        parameters = np.einsum('mkp,mk->mp', vt, projected)
+        calculated = np.einsum('mrp,mp->mr', design, parameters)
+        return RdcFit(self.restraint_ids, self.observed, calculated, _saupe_matrices(parameters))
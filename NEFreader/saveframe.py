@@ -0,0 +1,114 @@
+"""
+Compact saveframe representation.
+
+Parsed saveframes are OrderedDicts by default.  On Python 3 an OrderedDict carries a doubly linked
+  list alongside its hash table, which adds up for projects with hundreds of spectra.  Saveframe
+  keeps sf_category and sf_framecode in fixed slots and the remaining data items and loops in two
+  plain dicts, while still behaving as a mapping for the writer, the validator and user code.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+import sys
+from collections import OrderedDict
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+if sys.version_info >= (3, 7):
+    _ordered_dict = dict
+else:
+    _ordered_dict = OrderedDict
+
+_CATEGORY = 'sf_category'
+_FRAMECODE = 'sf_framecode'
+
+
+class Saveframe(MutableMapping):
+    """
+    A saveframe as a mapping.
+
+    Keys iterate in the order sf_category, sf_framecode, data items, loops, which is the order the
+      writer uses.  Values that are lists are loops, everything else is a data item.
+    """
+    __slots__ = ('name', 'category', 'framecode', 'fields', 'loops')
+
+    def __init__(self, name=None, category=None, framecode=None):
+        """
+        :type name: str     # Key of the saveframe in its Nef
+        :type category: str
+        :type framecode: str
+        """
+        self.name = name
+        self.category = category
+        self.framecode = framecode
+        self.fields = _ordered_dict()
+        self.loops = _ordered_dict()
+
+
+    def __getitem__(self, key):
+        if key == _CATEGORY:
+            if self.category is None:
+                raise KeyError(key)
+            return self.category
+        if key == _FRAMECODE:
+            if self.framecode is None:
+                raise KeyError(key)
+            return self.framecode
+        if key in self.fields:
+            return self.fields[key]
+        return self.loops[key]
+
+    def __setitem__(self, key, value):
+        if key == _CATEGORY:
+            self.category = value
+        elif key == _FRAMECODE:
+            self.framecode = value
+        elif isinstance(value, list):
+            self.fields.pop(key, None)
+            self.loops[key] = value
+        else:
+            self.loops.pop(key, None)
+            self.fields[key] = value
+
+    def __delitem__(self, key):
+        if key == _CATEGORY and self.category is not None:
+            self.category = None
+        elif key == _FRAMECODE and self.framecode is not None:
+            self.framecode = None
+        elif key in self.fields:
+            del self.fields[key]
+        else:
+            del self.loops[key]
+
+    def __contains__(self, key):
+        if key == _CATEGORY:
+            return self.category is not None
+        if key == _FRAMECODE:
+            return self.framecode is not None
+        return key in self.fields or key in self.loops
+
+    def __iter__(self):
+        if self.category is not None:
+            yield _CATEGORY
+        if self.framecode is not None:
+            yield _FRAMECODE
+        for key in self.fields:
+            yield key
+        for key in self.loops:
+            yield key
+
+    def __len__(self):
+        return ((self.category is not None) + (self.framecode is not None) +
+                len(self.fields) + len(self.loops))
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(type(self).__name__, self.name, list(self.items()))
+
+    def __getstate__(self):
+        return (self.name, self.category, self.framecode, self.fields, self.loops)
+
+    def __setstate__(self, state):
+        self.name, self.category, self.framecode, self.fields, self.loops = state
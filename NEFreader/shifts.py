@@ -0,0 +1,238 @@
+"""
+Chemical shift statistics across many shift lists.
+
+    statistics = ShiftStatistics()
+    for filename in filenames:
+        statistics.add(Nef.from_file(filename))     # Every nef_chemical_shift_list
+    statistics.table()[('ALA', 'CA')]               # (count, mean, sd)
+
+    outliers(nef['nef_chemical_shift_list_1'])      # Against the shipped reference table
+
+Shifts are grouped by (residue_type, atom_name) with NumPy grouped reductions, a whole shift list
+  at a time.  Statistics are kept as counts, means and sums of squared deviations, which combine
+  exactly, so adding a file updates them without going over the earlier files again, and
+  statistics gathered separately, in other processes for instance, can be merged.
+
+The reference table, data/shift_reference.csv, has approximate average protein shifts for the
+  backbone atoms and CB of the standard residues.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+import csv
+import io
+import pkgutil
+from collections import namedtuple, OrderedDict
+
+import numpy as np
+
+from .columns import float_column, loop_columns
+
+SHIFT_LIST_CATEGORY = 'nef_chemical_shift_list'
+SHIFT_LOOP = 'nef_chemical_shift'
+REFERENCE_TABLE = 'data/shift_reference.csv'
+OUTLIER_THRESHOLD = 4.0
+
+Outlier = namedtuple('Outlier', ('chain_code', 'sequence_code', 'residue_type', 'atom_name',
+                                 'value', 'expected', 'sd', 'z'))
+
+_reference_table = None
+
+
+def reference_table():
+    """
+    The shipped reference shifts, read on first use.
+
+    :return: dict of (residue_type, atom_name) to (mean, sd)
+    """
+    global _reference_table
+    if _reference_table is None:
+        text = pkgutil.get_data(__name__.rpartition('.')[0], REFERENCE_TABLE).decode('utf-8')
+        lines = [line for line in io.StringIO(text) if not line.startswith('#')]
+        _reference_table = dict(((row['residue_type'], row['atom_name']),
+                                 (float(row['mean']), float(row['sd'])))
+                                for row in csv.DictReader(lines))
+    return _reference_table
+
+
+def shift_lists(source):
+    """
+    The shift list saveframes of a Nef, or of an iterable of Nefs and shift lists.
+    """
+    if hasattr(source, 'get') and SHIFT_LOOP in source:
+        yield source
+    elif hasattr(source, 'values') and hasattr(source, 'get'):
+        for saveframe in source.values():
+            if hasattr(saveframe, 'get') and saveframe.get('sf_category') == SHIFT_LIST_CATEGORY:
+                yield saveframe
+    else:
+        for item in source:
+            for saveframe in shift_lists(item):
+                yield saveframe
+
+
+def _shift_columns(shift_list):
+    columns = loop_columns(shift_list[SHIFT_LOOP], ('chain_code', 'sequence_code',
+                                                    'residue_type', 'atom_name', 'value'))
+    count = len(columns['value'] or [])
+    for name in ('chain_code', 'sequence_code', 'residue_type', 'atom_name'):
+        if columns[name] is None:
+            columns[name] = ['.'] * count
+    columns['value'] = float_column(columns['value'], count)
+    return columns
+
+
+def _group(residue_types, atom_names):
+    """
+    :return: (list of unique (residue_type, atom_name), index of each shift's group)
+    """
+    index = {}
+    group = np.fromiter((index.setdefault(key, len(index))
+                         for key in zip(residue_types, atom_names)), dtype=np.intp)
+    return sorted(index, key=index.get), group
+
+
+class ShiftStatistics(object):
+    """
+    Count, mean and standard deviation of shifts by (residue_type, atom_name), updated as shift
+      lists are added.
+
+    :ivar keys: list of (residue_type, atom_name)
+    :ivar count: int array  # By key
+    :ivar mean: array
+    :ivar m2: array     # Sum of squared deviations from the mean
+    """
+
+    def __init__(self):
+        self.keys = []
+        self._index = {}
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+    def _positions(self, keys):
+        """
+        Positions of keys, adding any that are new.
+        """
+        positions = np.empty(len(keys), dtype=np.intp)
+        for i, key in enumerate(keys):
+            position = self._index.get(key)
+            if position is None:
+                position = self._index[key] = len(self.keys)
+                self.keys.append(key)
+            positions[i] = position
+        new = len(self.keys) - len(self.count)
+        if new:
+            self.count = np.concatenate((self.count, np.zeros(new, dtype=np.int64)))
+            self.mean = np.concatenate((self.mean, np.zeros(new)))
+            self.m2 = np.concatenate((self.m2, np.zeros(new)))
+        return positions
+
+    def _combine(self, positions, count, mean, m2):
+        """
+        Fold in statistics of other shifts, by the parallel form of Welford's algorithm.
+        """
+        old_count = self.count[positions]
+        total = old_count + count
+        delta = mean - self.mean[positions]
+        self.mean[positions] += delta * count / total
+        self.m2[positions] += m2 + delta ** 2 * old_count * count / total
+        self.count[positions] = total
+
+    def add_values(self, residue_types, atom_names, values):
+        """
+        :param residue_types: sequence of str
+        :param atom_names: sequence of str
+        :param values: array    # NaN values are left out
+        """
+        values = np.asarray(values, dtype=float)
+        known = ~np.isnan(values)
+        if not known.all():
+            residue_types = [r for r, k in zip(residue_types, known) if k]
+            atom_names = [a for a, k in zip(atom_names, known) if k]
+            values = values[known]
+        if not len(values):
+            return
+        keys, group = _group(residue_types, atom_names)
+        count = np.bincount(group, minlength=len(keys))
+        mean = np.bincount(group, weights=values, minlength=len(keys)) / count
+        m2 = np.bincount(group, weights=(values - mean[group]) ** 2, minlength=len(keys))
+        self._combine(self._positions(keys), count, mean, m2)
+
+    def add(self, source):
+        """
+        Add the shifts of a shift list saveframe, of every shift list of a Nef, or of an iterable
+          of those.
+        """
+        for shift_list in shift_lists(source):
+            columns = _shift_columns(shift_list)
+            self.add_values(columns['residue_type'], columns['atom_name'], columns['value'])
+
+    def merge(self, other):
+        """
+        Add statistics gathered separately.
+
+        :type other: ShiftStatistics
+        """
+        if len(other):
+            self._combine(self._positions(other.keys), other.count, other.mean, other.m2)
+
+
+    @property
+    def sd(self):
+        """
+        Sample standard deviation by key, NaN where there is only one shift.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+    def table(self, minimum_count=1):
+        """
+        :param minimum_count: int   # Leave out keys with fewer shifts
+        :return: OrderedDict of (residue_type, atom_name) to (count, mean, sd), sorted by key
+        """
+        sd = self.sd
+        return OrderedDict((key, (int(self.count[i]), float(self.mean[i]), float(sd[i])))
+                           for key, i in sorted(self._index.items())
+                           if self.count[i] >= minimum_count)
+
+
+def outliers(source, reference=None, threshold=OUTLIER_THRESHOLD, minimum_count=10):
+    """
+    Shifts more than threshold standard deviations from the reference mean for their residue type
+      and atom.  Shifts with no reference are not checked.
+
+    :param source: shift list saveframe, Nef, or iterable of those
+    :param reference: dict of (residue_type, atom_name) to (mean, sd), or ShiftStatistics.
+                      Default reference_table()
+    :param threshold: float
+    :param minimum_count: int   # With ShiftStatistics, ignore keys with fewer shifts
+    :return: list of Outlier, furthest out first
+    """
+    if reference is None:
+        reference = reference_table()
+    elif isinstance(reference, ShiftStatistics):
+        reference = dict((key, (mean, sd)) for key, (count, mean, sd)
+                         in reference.table(minimum_count).items())
+
+    found = []
+    for shift_list in shift_lists(source):
+        columns = _shift_columns(shift_list)
+        keys, group = _group(columns['residue_type'], columns['atom_name'])
+        expected = np.array([reference.get(key, (np.nan, np.nan)) for key in keys],
+                            dtype=float).reshape(-1, 2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = (columns['value'] - expected[group, 0]) / expected[group, 1]
+            flagged = np.flatnonzero(np.abs(z) > threshold)
+        for i in flagged:
+            found.append(Outlier(columns['chain_code'][i], columns['sequence_code'][i],
+                                 columns['residue_type'][i], columns['atom_name'][i],
+                                 float(columns['value'][i]), float(expected[group[i], 0]),
+                                 float(expected[group[i], 1]), float(z[i])))
+    found.sort(key=lambda outlier: -abs(outlier.z))
+    return found
@@ -0,0 +1,264 @@
+"""
+Reading parts of a NEF file without loading the rest.
+
+    for batch in iter_loop('project.nef', 'nef_nmr_spectrum_cnoesy1', 'nef_peak'):
+        for peak in batch:
+            print(peak.position_1, peak.height)
+
+Lines before the saveframe are skipped without being tokenized, and reading stops at the end of
+  the saveframe, so the cost depends on where the loop is in the file rather than on its size.
+
+index_file lists the saveframes, their categories and the size of their loops, splitting plain
+  lines on whitespace and only running the lexer over lines with quotes or comments.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+from collections import namedtuple, OrderedDict
+from itertools import islice
+
+from .compression import open_text
+from .parser import Lexer, Parser, ParseHandler, iter_tokens
+
+BATCH_SIZE = 1000
+TOKENS_PER_FEED = 10000
+
+
+class _LoopCollector(ParseHandler):
+    """
+    Keeps the rows of one loop in one saveframe.
+    """
+    __slots__ = ('saveframe', 'loop', 'columns', 'rows', 'found', 'done', '_in_saveframe',
+                 '_in_loop')
+
+    def __init__(self, saveframe, loop):
+        self.saveframe = saveframe
+        self.loop = loop
+        self.columns = None
+        self.rows = []
+        self.found = False
+        self.done = False
+        self._in_saveframe = False
+        self._in_loop = False
+
+    def start_saveframe(self, name):
+        self._in_saveframe = name == self.saveframe
+
+    def start_loop(self, category, columns):
+        if self._in_saveframe and category == self.loop:
+            self.columns = tuple(columns)
+            self.found = self._in_loop = True
+
+    def row(self, values):
+        if self._in_loop:
+            self.rows.append(tuple(values))
+
+    def end_loop(self, category):
+        if self._in_loop:
+            self._in_loop = False
+            self.done = True
+
+    def end_saveframe(self, name):
+        if self._in_saveframe:
+            self._in_saveframe = False
+            self.done = True
+
+
+def _saveframe_lines(f, saveframe):
+    """
+    The datablock declaration, followed by the lines of `f` from the start of `saveframe` on.
+
+    :raise KeyError: if there is no such saveframe
+    """
+    start = 'save_' + saveframe
+    datablock_line = None
+    in_semicolon_value = False
+    for line in f:
+        if line.startswith(';'):
+            in_semicolon_value = not in_semicolon_value
+        if in_semicolon_value:
+            continue
+        words = line.split(None, 1)
+        if not words:
+            continue
+        if datablock_line is None and words[0].lower().startswith('data_'):
+            datablock_line = line
+        elif words[0] == start:
+            if datablock_line is not None:
+                yield datablock_line
+            yield line
+            for line in f:
+                yield line
+            return
+    raise KeyError('No saveframe {} in file.'.format(saveframe))
+
+
+def _batch(rows, row_type, columns, as_columns):
+    if as_columns:
+        return OrderedDict((column, list(values))
+                           for column, values in zip(columns, zip(*rows)))
+    return [row_type._make(row) for row in rows]
+
+
+def iter_loop(filename, saveframe, loop, batch_size=BATCH_SIZE, as_columns=False, strict=True):
+    """
+    Yield the rows of one loop in batches.
+
+    Each batch is a list of up to batch_size rows, as namedtuples with a field per loop column.
+      With as_columns set each batch is instead an OrderedDict of column name to a list of values.
+      Values are the strings from the file, as in a parsed Nef.
+
+    :param filename: str
+    :param saveframe: str   # Saveframe name, e.g. 'nef_nmr_spectrum_cnoesy1'
+    :param loop: str    # Loop category, e.g. 'nef_peak'
+    :param batch_size: int
+    :param as_columns: bool
+    :param strict: bool
+    :raise KeyError: if the file has no such saveframe, or the saveframe no such loop
+    """
+    collector = _LoopCollector(saveframe, loop)
+    parser = Parser(strict=strict, handler=collector)
+    parser.reset()
+    row_type = None
+
+    with open_text(filename) as f:
+        tokens = iter_tokens(_saveframe_lines(f, saveframe))
+        while not collector.done:
+            chunk = list(islice(tokens, TOKENS_PER_FEED))
+            if not chunk:
+                break
+            parser.feed(chunk)
+            if len(collector.rows) >= batch_size:
+                if row_type is None:
+                    row_type = namedtuple('Row', collector.columns, rename=True)
+                full = len(collector.rows) - len(collector.rows) % batch_size
+                rows = collector.rows[:full]
+                del collector.rows[:full]
+                for start in range(0, full, batch_size):
+                    yield _batch(rows[start:start + batch_size], row_type, collector.columns,
+                                 as_columns)
+    parser.close()
+
+    if not collector.found:
+        raise KeyError('No loop {} in saveframe {}.'.format(loop, saveframe))
+    if collector.rows:
+        if row_type is None:
+            row_type = namedtuple('Row', collector.columns, rename=True)
+        yield _batch(collector.rows, row_type, collector.columns, as_columns)
+
+
+LoopSummary = namedtuple('LoopSummary', ('columns', 'rows'))
+
+
+class SaveframeSummary(object):
+    """
+    What index_file found out about a saveframe.
+
+    :ivar name: str
+    :ivar category: str or None
+    :ivar loops: OrderedDict of loop category to LoopSummary
+    :ivar line: int     # Line number of the save_ line, from 1
+    """
+    __slots__ = ('name', 'category', 'loops', 'line')
+
+    def __init__(self, name, line):
+        self.name = name
+        self.category = None
+        self.loops = OrderedDict()
+        self.line = line
+
+    def __repr__(self):
+        return 'SaveframeSummary({!r}, {!r}, {!r})'.format(self.name, self.category,
+                                                          list(self.loops.items()))
+
+
+def _line_tokens(f, lexer):
+    """
+    (line number, tokens, plain) for each line of f, leaving out newlines and comments.  A
+      semicolon delimited value is a single token on its closing line.  Lines are plain when they
+      have no quotes, comments or underscores, and so hold nothing but unquoted values.
+    """
+    semicolon_value = None
+    for number, line in enumerate(f, 1):
+        if semicolon_value is not None:
+            if not line.startswith(';'):
+                semicolon_value.append(line)
+                continue
+            semicolon_value.append(';')
+            yield number, [''.join(semicolon_value)], False
+            semicolon_value = None
+            line = line[1:]
+        elif line.startswith(';'):
+            semicolon_value = [line]
+            continue
+        if '"' in line or "'" in line or '#' in line:
+            yield number, [token for token in lexer.tokenize(line)
+                           if token != '\n' and not token.startswith('#')], False
+        else:
+            yield number, line.split(), '_' not in line
+
+
+def index_file(filename):
+    """
+    Summarize a NEF file without parsing it into a Nef.
+
+    Loop rows are counted from the number of values, so this is fast enough for a quick look at
+      a large file, but the file isn't checked for errors.
+
+    :param filename: str
+    :return: (datablock name or None, OrderedDict of saveframe name to SaveframeSummary)
+    """
+    datablock = None
+    saveframes = OrderedDict()
+    saveframe = None
+    data_name = None
+    loop_name = None
+    columns = None
+    values = 0
+
+    def finish_loop():
+        rows = values // len(columns) + (1 if values % len(columns) else 0) if columns else 0
+        saveframe.loops[loop_name] = LoopSummary(tuple(columns), rows)
+
+    with open_text(filename) as f:
+        for number, tokens, plain in _line_tokens(f, Lexer()):
+            if plain and columns:
+                # Loop values, the bulk of most files
+                values += len(tokens)
+                continue
+            for token in tokens:
+                lower = token.lower()
+                if columns is not None and (lower in ('stop_', 'loop_') or
+                                            lower.startswith('save_') or
+                                            (token.startswith('_') and values)):
+                    finish_loop()
+                    columns = None
+                    values = 0
+                    if lower == 'stop_':
+                        continue
+                if lower.startswith('data_'):
+                    datablock = token[5:]
+                elif lower == 'save_':
+                    saveframe = None
+                elif lower.startswith('save_'):
+                    saveframe = saveframes[token[5:]] = SaveframeSummary(token[5:], number)
+                elif saveframe is None:
+                    continue
+                elif lower == 'loop_':
+                    columns = []
+                    loop_name = None
+                    values = 0
+                elif token.startswith('_'):
+                    if columns is not None:
+                        loop_name = token[1:].split('.')[0]
+                        columns.append(token.split('.', 1)[-1])
+                    else:
+                        data_name = token
+                elif columns is not None:
+                    values += 1
+                elif data_name is not None:
+                    if data_name.endswith('.sf_category'):
+                        saveframe.category = token
+                    data_name = None
+    return datablock, saveframes
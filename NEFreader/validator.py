@@ -2,11 +2,24 @@ from __future__ import unicode_literals, print_function, absolute_import, divisi
 
 __author__ = 'TJ Ragan'
 
-import re
-
 from .nef import Nef
 from .nef import __nef_version__
 
+_optional_peak_field_patterns = None
+
+
+def _compiled_optional_peak_field_patterns():
+    """
+    Nef.PL_P_OPTIONAL_ALTERNATE_FIELDS with compiled keys.  Compiled on first use, so importing
+      the validator doesn't import re.
+    """
+    global _optional_peak_field_patterns
+    if _optional_peak_field_patterns is None:
+        import re
+        _optional_peak_field_patterns = [(re.compile(pattern), fields) for pattern, fields
+                                         in Nef.PL_P_OPTIONAL_ALTERNATE_FIELDS.items()]
+    return _optional_peak_field_patterns
+
 class Validator(object):
 
     def __init__(self, nef=None):
@@ -14,22 +27,32 @@ class Validator(object):
         self.validation_errors = []
 
 
-    def isValid(self, nef=None):
+    def isValid(self, nef=None, stats=None):
+        """
+        :type nef: Nef
+        :type stats: NEFreader.profiling.Stats  # Records one phase per validation step
+        """
         if nef is None:
             nef = self.nef
         self.validation_errors = dict()
 
-        self.validation_errors.update(self._validate_datablock(nef))
-        self.validation_errors.update(self._validate_saveframe_fields(nef))
-        self.validation_errors.update(self._validate_required_saveframes(nef))
-        self.validation_errors.update(self._validate_metadata(nef))
-        self.validation_errors.update(self._validate_molecular_system(nef))
-        self.validation_errors.update(self._validate_chemical_shift_lists(nef))
-        self.validation_errors.update(self._validate_distance_restraint_lists(nef))
-        self.validation_errors.update(self._validate_dihedral_restraint_lists(nef))
-        self.validation_errors.update(self._validate_rdc_restraint_lists(nef))
-        self.validation_errors.update(self._validate_peak_lists(nef))
-        self.validation_errors.update(self._validate_linkage_table(nef))
+        validations = (self._validate_datablock,
+                       self._validate_saveframe_fields,
+                       self._validate_required_saveframes,
+                       self._validate_metadata,
+                       self._validate_molecular_system,
+                       self._validate_chemical_shift_lists,
+                       self._validate_distance_restraint_lists,
+                       self._validate_dihedral_restraint_lists,
+                       self._validate_rdc_restraint_lists,
+                       self._validate_peak_lists,
+                       self._validate_linkage_table)
+        for validation in validations:
+            if stats is None:
+                self.validation_errors.update(validation(nef))
+            else:
+                with stats.phase('validate' + validation.__name__[len('_validate'):]):
+                    self.validation_errors.update(validation(nef))
 
         v = list(self.validation_errors.values())
         return not any(v)
@@ -373,8 +396,8 @@ class Validator(object):
                                     e.append('test: found_alternate')
 
                         for req_field in req_fields:
-                            for optional_re, optional_re_val in Nef.PL_P_OPTIONAL_ALTERNATE_FIELDS.items():
-                                match = re.search(optional_re,req_field)
+                            for optional_re, optional_re_val in _compiled_optional_peak_field_patterns():
+                                match = optional_re.search(req_field)
                                 if match:
                                     for orv in optional_re_val:
                                         opt_fields.append(orv.format(match.groups([0])[0]))
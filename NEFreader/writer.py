@@ -1,8 +1,67 @@
+"""
+NEF text output.
+
+nefToText and nefTextChunks write saveframes, data items, loops and columns in the order they
+  have in the Nef.  With canonical set they instead write the same content always the same way,
+  whatever order it was built or read in, so equal content gives identical bytes:
+
+    - saveframes in CANONICAL_CATEGORIES order, then by category, then by sf_framecode
+    - sf_category and sf_framecode first, then the other data items by name
+    - loops by name, and columns by dimension number and then name, so that for instance
+      position_1 comes with the other _1 columns (see _canonicalColumnKey).  The columns are
+      those of the first row; a row without one of them has '.' there.
+    - values quoted only when they have to be, and then always the same way (_canonicalValueText).
+      The parser reads a semicolon delimited text field as ending with a newline, so a value
+      written as one that doesn't end with a newline gains one when read back, once.
+    - int and float values formatted as repr does, booleans as true and false and None as '.'.
+      Text values, including numbers read from a file, are written as they are.
+    - loops with no rows left out, as they have no columns to write
+
+Canonical output is written in the same single pass as the default: the ordering only sorts
+  saveframe, item, loop and column names, and the rows of each loop are still written in runs.
+"""
 from __future__ import unicode_literals, print_function, absolute_import, division
 
 __author__ = 'TJ Ragan'
 
+from operator import itemgetter
+
 ITEM_PAD = '  '
+ROWS_PER_CHUNK = 1000   # Loop rows per chunk from nefTextChunks
+
+CANONICAL_CATEGORIES = ('nef_nmr_meta_data',
+                        'nef_molecular_system',
+                        'nef_chemical_shift_list',
+                        'nef_distance_restraint_list',
+                        'nef_dihedral_restraint_list',
+                        'nef_rdc_restraint_list',
+                        'nef_nmr_spectrum',
+                        'nef_peak_restraint_links')
+
+_canonical_patterns = None
+
+
+def _compiled_canonical_patterns():
+    """
+    (needs quotes, row needs quotes, dimension suffix) patterns for canonical output.  Compiled on
+      first use, so importing the writer doesn't import re.
+    """
+    global _canonical_patterns
+    if _canonical_patterns is None:
+        import re
+        _canonical_patterns = (
+            # Values that must be quoted to be read back as one data value: empty, containing
+            #   whitespace, quotes or a comment character, starting with a character the parser
+            #   treats specially, or a reserved word
+            re.compile(r'''[\s'"#]|^$|^[_;$\[\]]|^(?:data_|save_|global_)|'''
+                       r'''^(?:loop_|stop_)$''', re.IGNORECASE),
+            # The same test on a row of values joined with tabs, as a quick check for the whole row
+            re.compile(r'''[ \n\r\x0b\x0c'"#]|\t\t|^\t|\t$|^$|'''
+                       r'''(?:^|\t)(?:[_;$\[\]]|data_|save_|global_|'''
+                       r'''(?:loop_|stop_)(?:\t|$))''', re.IGNORECASE),
+            re.compile(r'^(.*)_([0-9]+)$'))
+    return _canonical_patterns
+
 
 def _datablockText( nef ):
     return 'data_{}\n'.format(nef.datablock)
@@ -13,8 +72,8 @@ def _saveframeHeaderText(nef, saveframeName):
 
 
 def _dataLabelText(saveframe, dataLabel):
-    sf_framecode = saveframe['sf_framecode']
-    return '_{0}.{1}'.format(sf_framecode, dataLabel)
+    sf_category = saveframe['sf_category']
+    return '_{0}.{1}'.format(sf_category, dataLabel)
 
 
 def _dataValueText(saveframe, dataLabel):
@@ -91,6 +150,7 @@ def _loopText(saveframe, loopName, strict=True):
 
 
 def _adjustTemplate(baseLoopRowTextTemplate, loopRow):
+    loopRowTextTemplate = baseLoopRowTextTemplate
     for k, v in loopRow.items():
         quoteString = None
         if '\n' in v:
@@ -101,15 +161,11 @@ def _adjustTemplate(baseLoopRowTextTemplate, loopRow):
             quoteString = '"'
 
         if quoteString is not None:
-            topSplit = baseLoopRowTextTemplate.find(k)-1
-            bottomSplit = topSplit + len(k) + 2
-            loopRowTextTemplate = baseLoopRowTextTemplate[:topSplit]
-            loopRowTextTemplate += quoteString
-            loopRowTextTemplate += baseLoopRowTextTemplate[topSplit:bottomSplit]
-            loopRowTextTemplate += quoteString
-            loopRowTextTemplate += baseLoopRowTextTemplate[bottomSplit:]
-            return loopRowTextTemplate
-    return baseLoopRowTextTemplate
+            # The whole field, so that a column whose name starts another's isn't matched
+            field = '{' + k + '}'
+            loopRowTextTemplate = loopRowTextTemplate.replace(field,
+                                                              quoteString + field + quoteString)
+    return loopRowTextTemplate
 
 def _loopRowsText(loop, loopColumnNames, strict):
     text = ''
@@ -152,10 +208,183 @@ def _saveframeText(nef, saveframeName):
     return text
 
 
-def nefToText(nef):
+def nefToText(nef, stats=None, canonical=False):
+    """
+    :param stats: NEFreader.profiling.Stats     # Records per-saveframe timings and sizes
+    :param canonical: bool  # Write in canonical form; see the module documentation
+    """
+    if canonical:
+        saveframeNames = _canonicalSaveframeNames(nef)
+        formatSaveframe = _canonicalSaveframeText
+    else:
+        saveframeNames = nef.keys()
+        formatSaveframe = _saveframeText
+
     text = _datablockText(nef)
     text += '\n'
-    for saveframeName in nef.keys():
-        text += _saveframeText(nef, saveframeName)
+    for saveframeName in saveframeNames:
+        if stats is None:
+            text += formatSaveframe(nef, saveframeName)
+        else:
+            stats.start_saveframe(saveframeName)
+            saveframeText = formatSaveframe(nef, saveframeName)
+            for loopName in _findLoopsInSaveframe(nef[saveframeName]):
+                stats.loop_rows(saveframeName, loopName, len(nef[saveframeName][loopName]))
+            stats.end_saveframe(saveframeName)
+            stats.saveframes[saveframeName].bytes = len(saveframeText)
+            text += saveframeText
+
+    return text
+
+
+def nefTextChunks(nef, rowsPerChunk=None, canonical=False):
+    """
+    The text of nefToText in pieces: the datablock, then for each saveframe its items, each loop
+      in runs of rowsPerChunk rows, and its footer.  Joined, the pieces are the same as
+      nefToText(nef, canonical=canonical), but no piece holds more than one saveframe's items or
+      one run of rows.
 
-    return text
\ No newline at end of file
+    :param rowsPerChunk: int    # Default ROWS_PER_CHUNK
+    :param canonical: bool  # Write in canonical form; see the module documentation
+    """
+    if rowsPerChunk is None:
+        rowsPerChunk = ROWS_PER_CHUNK
+
+    yield _datablockText(nef) + '\n'
+    if canonical:
+        for saveframeName in _canonicalSaveframeNames(nef):
+            for chunk in _canonicalSaveframeChunks(nef[saveframeName], rowsPerChunk):
+                yield chunk
+        return
+
+    for saveframeName in nef.keys():
+        sf = nef[saveframeName]
+        yield (_saveframeHeaderText(nef, saveframeName) + '\n' +
+               _saveframeItemsText(nef, saveframeName))
+
+        for loopName in _findLoopsInSaveframe(sf):
+            loop = sf[loopName]
+            if len(loop) == 0:
+                raise IndexError('loop {} must contain at least one entry.'.format(loopName))
+            loopColumnNames = tuple(loop[0].keys())
+            yield ('\n' + _loopHeaderText(sf, loopName) +
+                   _loopLabelsText(loopName, loopColumnNames) + '\n')
+            for start in range(0, len(loop), rowsPerChunk):
+                yield _loopRowsText(loop[start:start + rowsPerChunk], loopColumnNames, True)
+            yield _loopFooterText(sf, loopName) + '\n'
+
+        yield _saveframeFooterText(nef, saveframeName) + '\n'
+
+
+### Canonical output ###
+
+def canonicalText(value):
+    """
+    A value as text, as canonical output writes it before any quoting: numbers are formatted the
+      same way whatever their type.
+    """
+    if isinstance(value, str):
+        return value
+    if value is None:
+        return '.'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    import numbers
+    if isinstance(value, numbers.Integral):
+        return '{:d}'.format(int(value))
+    if isinstance(value, numbers.Real):
+        return repr(float(value))
+    return '{}'.format(value)
+
+
+def _canonicalValueText(value):
+    """
+    A value as written in canonical output: bare if it can be, otherwise in single quotes, or
+      double quotes if it has a single quote in it, or as a semicolon delimited text field if it
+      has both kinds of quote, a newline or a #.
+    """
+    value = canonicalText(value)
+    if _compiled_canonical_patterns()[0].search(value) is None:
+        return value
+    if '\n' in value or '#' in value or ("'" in value and '"' in value):
+        return '\n;{}{};\n'.format(value, '' if value.endswith('\n') else '\n')
+    if "'" in value:
+        return '"{}"'.format(value)
+    return "'{}'".format(value)
+
+
+def _canonicalRowsText(rows, loopColumnNames):
+    columns = itemgetter(*loopColumnNames)
+    if len(loopColumnNames) == 1:
+        columns = lambda row, c=loopColumnNames[0]: (row[c],)
+    pad = ITEM_PAD * 2
+    rowNeedsQuotes = _compiled_canonical_patterns()[1]
+    lines = []
+    for row in rows:
+        try:
+            values = columns(row)
+        except KeyError:
+            values = [row.get(c, '.') for c in loopColumnNames]
+        try:
+            text = '\t'.join(values)
+        except TypeError:
+            text = None
+        if (text is None or text.count('\t') != len(values) - 1 or
+                rowNeedsQuotes.search(text) is not None):
+            text = '\t'.join([_canonicalValueText(v) for v in values])
+        lines.append(pad + text + '\n')
+    return ''.join(lines)
+
+
+def _canonicalColumnKey(columnName):
+    """
+    Columns without a dimension number first, then those of dimension 1, 2 and so on, each by
+      name.
+    """
+    match = _compiled_canonical_patterns()[2].match(columnName)
+    if match is None:
+        return (0, columnName)
+    return (int(match.group(2)), match.group(1))
+
+
+def _canonicalSaveframeNames(nef):
+    def key(saveframeName):
+        sf = nef[saveframeName]
+        category = sf.get('sf_category', '')
+        try:
+            rank = CANONICAL_CATEGORIES.index(category)
+        except ValueError:
+            rank = len(CANONICAL_CATEGORIES)
+        return (rank, category, canonicalText(sf.get('sf_framecode', saveframeName)))
+    return sorted(nef.keys(), key=key)
+
+
+def _canonicalSaveframeChunks(sf, rowsPerChunk):
+    """
+    The text of a saveframe in canonical form, in pieces as for nefTextChunks.
+    """
+    category = sf['sf_category']
+    itemLabels = sorted(k for k, v in sf.items() if not isinstance(v, list) and
+                        k not in ('sf_category', 'sf_framecode'))
+    text = 'save_{}\n\n'.format(canonicalText(sf['sf_framecode']))
+    for label in ['sf_category', 'sf_framecode'] + itemLabels:
+        text += '{0}_{1}.{2}\t{3}\n'.format(ITEM_PAD, category, label,
+                                            _canonicalValueText(sf[label]))
+    yield text
+
+    for loopName in sorted(k for k, v in sf.items() if isinstance(v, list)):
+        loop = sf[loopName]
+        if len(loop) == 0:
+            continue
+        loopColumnNames = sorted(loop[0].keys(), key=_canonicalColumnKey)
+        yield ('\n' + _loopHeaderText(sf, loopName) +
+               _loopLabelsText(loopName, loopColumnNames) + '\n')
+        for start in range(0, len(loop), rowsPerChunk):
+            yield _canonicalRowsText(loop[start:start + rowsPerChunk], loopColumnNames)
+        yield _loopFooterText(sf, loopName) + '\n'
+
+    yield _saveframeFooterText(None, None) + '\n'
+
+
+def _canonicalSaveframeText(nef, saveframeName):
+    return ''.join(_canonicalSaveframeChunks(nef[saveframeName], ROWS_PER_CHUNK))
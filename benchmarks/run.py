@@ -0,0 +1,312 @@
+"""
+Benchmarks for the lexer, parser, writer and validator.
+
+Times and memory-profiles Lexer.tokenize, Parser.parse, Nef.from_file, nefToText and
+  Validator.isValid on the bundled test files and on synthetic files made by replicating the
+  saveframes of a small file 10x and 100x.  Throughput is reported in MB/s of NEF text and loop
+  rows/s.  Also times importing the package in a fresh interpreter, which dominates the run time of
+  small command line tools.
+
+Usage, from the repository root:
+
+    python -m benchmarks.run
+    python -m benchmarks.run --save-baseline baseline.json
+    python -m benchmarks.run --compare baseline.json --tolerance 0.25
+    python -m benchmarks.run --generated 1000 10000
+
+With --compare the exit status is 1 if any benchmark is slower than the baseline by more than the
+  tolerance.
+"""
+from __future__ import unicode_literals, print_function, absolute_import, division
+
+__author__ = 'TJ Ragan'
+
+import argparse
+import gc
+import glob
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import NEFreader
+from NEFreader import Lexer, Parser, Nef, Validator
+from NEFreader import generator
+from NEFreader.writer import nefToText
+
+TEST_FILES = sorted(glob.glob(os.path.join('tests', 'test_files', '*.nef')))
+SCALE_BASE = os.path.join('tests', 'test_files', 'Commented_Example.nef')
+SCALES = (10, 100)
+OPERATIONS = ('tokenize', 'parse', 'from_file', 'nefToText', 'isValid')
+IMPORTS = (('NEFreader', 'import NEFreader'),
+           ('Nef', 'from NEFreader import Nef'),
+           ('Validator', 'from NEFreader import Validator'))
+
+# Saveframes that may only appear once per file, and so are not replicated when scaling
+SINGLETON_SAVEFRAMES = ('nef_nmr_meta_data', 'nef_molecular_system', 'nef_peak_restraint_links')
+
+_SAVEFRAME_RE = re.compile(r'^save_(\S+)[ \t]*\n.*?^save_[ \t]*$\n?', re.MULTILINE | re.DOTALL)
+
+
+def scaled_text(text, scale):
+    """
+    NEF text with every non-singleton saveframe of `text` repeated `scale` times under new
+      framecodes.
+
+    :type text: str
+    :type scale: int
+    :rtype: str
+    """
+    blocks = []
+    end = 0
+    for match in _SAVEFRAME_RE.finditer(text):
+        blocks.append(text[end:match.start()])
+        name = match.group(1)
+        block = match.group(0)
+        if name in SINGLETON_SAVEFRAMES:
+            blocks.append(block)
+        else:
+            framecode_re = re.compile(r'(\.sf_framecode\s+){}\b'.format(re.escape(name)))
+            for copy in range(1, scale + 1):
+                new_name = '{}_copy{}'.format(name, copy)
+                new_block = 'save_' + new_name + block[len('save_' + name):]
+                new_block = framecode_re.sub(r'\g<1>' + new_name, new_block, count=1)
+                blocks.append(new_block + '\n')
+        end = match.end()
+    blocks.append(text[end:])
+    return ''.join(blocks)
+
+
+def generated_sizes(residues):
+    """
+    Arguments for generator.write giving a project that grows linearly with `residues`.
+    """
+    return {'residues': residues,
+            'distance_restraints': 10 * residues,
+            'dihedral_restraints': 2 * residues,
+            'rdc_restraints': residues,
+            'spectra': max(1, residues // 100),
+            'peaks': 10 * residues,
+            'creation_date': '2016-01-01T00:00:00'}
+
+
+def make_inputs(directory, files=TEST_FILES, scale_base=SCALE_BASE, scales=SCALES, generated=()):
+    """
+    :param generated: residue counts for projects written with NEFreader.generator
+    :return: list of (label, path)
+    """
+    inputs = [(os.path.basename(f), f) for f in files]
+    if scales:
+        with open(scale_base, 'r') as f:
+            text = f.read()
+        for scale in scales:
+            root, ext = os.path.splitext(os.path.basename(scale_base))
+            label = '{}_x{}{}'.format(root, scale, ext)
+            path = os.path.join(directory, label)
+            with open(path, 'w') as f:
+                f.write(scaled_text(text, scale))
+            inputs.append((label, path))
+    for residues in generated:
+        label = 'generated_{}_residues.nef'.format(residues)
+        path = os.path.join(directory, label)
+        generator.save(path, **generated_sizes(residues))
+        inputs.append((label, path))
+    return inputs
+
+
+def count_rows(nef):
+    return sum(len(v) for saveframe in nef.values() for v in saveframe.values()
+               if isinstance(v, list))
+
+
+def _operations(path):
+    """
+    Set up the inputs for each operation outside the timed region.
+
+    :return: (dict of operation name -> callable, number of loop rows)
+    """
+    with open(path, 'r') as f:
+        text = f.read()
+    tokens = Lexer().tokenize(text)
+    nef = Nef.from_text(text)
+
+    def parse():
+        Parser(Nef.empty()).parse(tokens)
+
+    return {'tokenize': lambda: Lexer().tokenize(text),
+            'parse': parse,
+            'from_file': lambda: Nef.from_file(path),
+            'nefToText': lambda: nefToText(nef),
+            'isValid': lambda: Validator(nef).isValid()}, count_rows(nef)
+
+
+def _time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = timeit.default_timer()
+        func()
+        elapsed = timeit.default_timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def _peak_memory(func):
+    if tracemalloc is None:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(inputs, operations=OPERATIONS, repeat=3, memory=True, out=sys.stdout):
+    """
+    :type inputs: list of (label, path)
+    :return: dict of results, keyed by '<label>:<operation>'
+    """
+    results = {}
+    for label, path in inputs:
+        size = os.path.getsize(path)
+        funcs, rows = _operations(path)
+        for operation in operations:
+            key = '{}:{}'.format(label, operation)
+            try:
+                seconds = _time(funcs[operation], repeat)
+                peak = _peak_memory(funcs[operation]) if memory else None
+            except Exception as e:
+                results[key] = {'error': '{}: {}'.format(type(e).__name__, e)}
+                print('{:<52} ERROR {}'.format(key, results[key]['error'])[:120], file=out)
+                continue
+            results[key] = {'seconds': seconds,
+                            'bytes': size,
+                            'rows': rows,
+                            'mb_per_s': size / 1e6 / seconds if seconds else None,
+                            'rows_per_s': rows / seconds if seconds else None,
+                            'peak_memory': peak}
+            print('{:<52} {:>9.4f} s {:>8.2f} MB/s {:>11.0f} rows/s {:>9} peak'
+                  .format(key, seconds, results[key]['mb_per_s'], results[key]['rows_per_s'],
+                          '-' if peak is None else '{:.1f}MB'.format(peak / 1e6)), file=out)
+    return results
+
+
+def _interpreter_seconds(statement, repeat):
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(NEFreader.__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (package_dir, env.get('PYTHONPATH')) if p)
+    return _time(lambda: subprocess.check_call([sys.executable, '-c', statement], env=env),
+                 repeat)
+
+
+def import_times(imports=IMPORTS, repeat=3, out=sys.stdout):
+    """
+    Time each import statement in a fresh interpreter, less the start up time of the interpreter.
+
+    :type imports: list of (label, statement)
+    :return: dict of results, keyed by 'import:<label>'
+    """
+    results = {}
+    baseline = _interpreter_seconds('pass', repeat)
+    for label, statement in imports:
+        key = 'import:{}'.format(label)
+        seconds = max(_interpreter_seconds(statement, repeat) - baseline, 0.0)
+        results[key] = {'seconds': seconds}
+        print('{:<52} {:>9.4f} s'.format(key, seconds), file=out)
+    return results
+
+
+def compare(results, baseline, tolerance=0.25, out=sys.stdout):
+    """
+    Report benchmarks slower than baseline by more than `tolerance` (a fraction).
+
+    :return: list of regressed keys
+    """
+    regressions = []
+    for key, result in sorted(results.items()):
+        reference = baseline.get(key)
+        if reference is None or 'seconds' not in reference or 'seconds' not in result:
+            continue
+        ratio = result['seconds'] / reference['seconds']
+        status = 'ok'
+        if ratio > 1 + tolerance:
+            status = 'REGRESSION'
+            regressions.append(key)
+        elif ratio < 1 - tolerance:
+            status = 'improved'
+        print('{:<52} {:>6.2f}x baseline  {}'.format(key, ratio, status), file=out)
+    return regressions
+
+
+def environment():
+    return {'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--files', nargs='*', default=TEST_FILES,
+                        help='NEF files to benchmark (default: the bundled test files)')
+    parser.add_argument('--scale-base', default=SCALE_BASE,
+                        help='file replicated to make the synthetic inputs')
+    parser.add_argument('--scales', nargs='*', type=int, default=list(SCALES),
+                        help='replication factors for the synthetic inputs')
+    parser.add_argument('--generated', nargs='*', type=int, default=[], metavar='RESIDUES',
+                        help='also benchmark generated projects of these numbers of residues')
+    parser.add_argument('--operations', nargs='*', default=list(OPERATIONS),
+                        choices=OPERATIONS)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timings are the best of this many runs')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the tracemalloc peak memory runs')
+    parser.add_argument('--no-import', action='store_true',
+                        help='skip timing the package import')
+    parser.add_argument('--save-baseline', metavar='FILE',
+                        help='write the results to FILE as JSON')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare the results to a baseline written with --save-baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown against the baseline, as a fraction')
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    try:
+        inputs = make_inputs(directory, files=args.files, scale_base=args.scale_base,
+                             scales=args.scales, generated=args.generated)
+        results = run(inputs, operations=args.operations, repeat=args.repeat,
+                      memory=not args.no_memory)
+        if not args.no_import:
+            results.update(import_times(repeat=args.repeat))
+    finally:
+        shutil.rmtree(directory)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f,
+                      indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        print()
+        if compare(results, baseline['results'], tolerance=args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,7 +12,9 @@ config = {
     'version': '0.1',
     'install_requires': ['nose', 'numpy', 'pandas'],
     'packages': ['NEFreader'],
+    'package_data': {'NEFreader': ['data/*.csv']},
     'scripts': [],
+    'entry_points': {'console_scripts': ['nef = NEFreader.cli:main']},
     'name': 'NEFreader'
 }
 
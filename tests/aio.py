@@ -0,0 +1,75 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import asyncio
+import unittest
+
+import NEFreader
+from NEFreader import aio, writer
+
+
+class BytesWriter(object):
+
+    def __init__(self):
+        self.chunks = []
+        self.drains = 0
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    async def drain(self):
+        self.drains += 1
+
+
+async def _read(data, chunk_size=aio.CHUNK_SIZE):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return await aio.aload(reader, chunk_size=chunk_size)
+
+
+async def _iterate(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class Test_aio(unittest.TestCase):
+
+    def setUp(self):
+        self.f_name = 'tests/test_files/Commented_Example.nef'
+        with open(self.f_name, 'r') as f:
+            self.text = f.read()
+        self.nef = NEFreader.Nef.from_text(self.text)
+
+
+    def test_aload(self):
+        nef = asyncio.run(_read(self.text.encode('utf-8')))
+        self.assertEqual(nef, self.nef)
+        self.assertEqual(nef.datablock, self.nef.datablock)
+
+    def test_aload_small_chunks(self):
+        nef = asyncio.run(_read(self.text.encode('utf-8'), 7))
+        self.assertEqual(nef, self.nef)
+
+    def test_aload_multibyte_characters_split_between_chunks(self):
+        text = self.text.replace('Commented_Example', 'Commentéd_Example')
+        nef = asyncio.run(_read(text.encode('utf-8'), 1))
+        self.assertEqual(nef, NEFreader.Nef.from_text(text))
+
+    def test_aload_async_iterable(self):
+        chunks = [self.text[i:i + 100] for i in range(0, len(self.text), 100)]
+        nef = asyncio.run(NEFreader.Nef.aload(_iterate(chunks)))
+        self.assertEqual(nef, self.nef)
+
+    def test_awrite(self):
+        nef = NEFreader.Nef.from_file('tests/test_files/CCPN_2l9r_Paris_155.nef')
+        stream = BytesWriter()
+        asyncio.run(nef.awrite(stream))
+
+        self.assertGreater(len(stream.chunks), 1)
+        self.assertEqual(stream.drains, len(stream.chunks))
+        self.assertEqual(b''.join(stream.chunks).decode('utf-8'), writer.nefToText(nef))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+import NEFreader
+from NEFreader import generator
+from NEFreader.archive import Archive
+
+
+class Test_archive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.files = []
+        for residues in (5, 10, 15):
+            filename = os.path.join(self.directory, 'project_{}.nef'.format(residues))
+            generator.save(filename, residues=residues, distance_restraints=10, peaks=10,
+                           creation_date='2016-01-01T00:00:00')
+            self.files.append(filename)
+        readme = os.path.join(self.directory, 'README.txt')
+        with open(readme, 'w') as f:
+            f.write('Not NEF\n')
+
+        self.tar_name = os.path.join(self.directory, 'campaign.tar.gz')
+        with tarfile.open(self.tar_name, 'w:gz') as tar:
+            for filename in self.files + [readme]:
+                tar.add(filename, arcname='campaign/' + os.path.basename(filename))
+
+        self.zip_name = os.path.join(self.directory, 'campaign.zip')
+        with zipfile.ZipFile(self.zip_name, 'w') as z:
+            for filename in self.files + [readme]:
+                z.write(filename, arcname='campaign/' + os.path.basename(filename))
+
+        self.names = ['campaign/' + os.path.basename(f) for f in self.files]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def test_members(self):
+        for archive_name in (self.tar_name, self.zip_name):
+            with Archive(archive_name) as archive:
+                self.assertEqual(list(archive), self.names)
+                self.assertEqual(len(archive), 3)
+                self.assertNotIn('campaign/README.txt', archive)
+
+    def test_lazy_parsing(self):
+        for archive_name in (self.tar_name, self.zip_name):
+            with Archive(archive_name) as archive:
+                self.assertFalse(any(archive.is_parsed(name) for name in archive))
+                nef = archive[self.names[1]]
+                self.assertTrue(archive.is_parsed(self.names[1]))
+                self.assertFalse(archive.is_parsed(self.names[0]))
+                self.assertIs(archive[self.names[1]], nef)
+                self.assertEqual(nef, NEFreader.Nef.from_file(self.files[1]))
+                self.assertEqual(nef.datablock, 'nef_synthetic_project')
+
+    def test_missing_member(self):
+        with Archive(self.zip_name) as archive:
+            with self.assertRaises(KeyError):
+                archive['campaign/README.txt']
+
+    def test_not_an_archive(self):
+        with self.assertRaises(ValueError):
+            Archive(self.files[0])
+
+    def test_prefetch(self):
+        with Archive(self.tar_name) as archive:
+            archive.prefetch(self.names[:2], workers=2)
+            self.assertTrue(archive.is_parsed(self.names[0]))
+            self.assertFalse(archive.is_parsed(self.names[2]))
+            for name, filename in zip(self.names[:2], self.files):
+                self.assertEqual(archive[name], NEFreader.Nef.from_file(filename))
+                self.assertEqual(list(archive[name]),
+                                 list(NEFreader.Nef.from_file(filename)))
+
+
+if __name__ == '__main__':
+    unittest.main()
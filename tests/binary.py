@@ -0,0 +1,130 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import os
+import shutil
+import tempfile
+import unittest
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+from collections import OrderedDict
+
+import NEFreader
+from NEFreader import binary
+
+
+class Test_binary_format(unittest.TestCase):
+
+    def setUp(self):
+        self.nef = NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef')
+
+
+    def test_round_trip(self):
+        restored = binary.nefFromBinary(binary.nefToBinary(self.nef))
+
+        self.assertEqual(restored.datablock, self.nef.datablock)
+        self.assertEqual(list(restored.keys()), list(self.nef.keys()))
+        for name in self.nef:
+            self.assertEqual(restored[name], self.nef[name])
+
+    def test_round_trip_preserves_column_order(self):
+        restored = binary.nefFromBinary(binary.nefToBinary(self.nef))
+        loop = self.nef['nef_molecular_system']['nef_sequence']
+        self.assertEqual(list(restored['nef_molecular_system']['nef_sequence'][0].keys()),
+                         list(loop[0].keys()))
+
+    def test_numeric_columns_keep_their_text(self):
+        d = OrderedDict()
+        d['sf'] = OrderedDict((('sf_category', 'test'),
+                               ('sf_framecode', 'sf'),
+                               ('test_loop', [OrderedDict((('i', '-0'), ('f', '1.500'))),
+                                              OrderedDict((('i', '007'), ('f', '-2.250'))),
+                                              OrderedDict((('i', '12'), ('f', '0.000')))])))
+        restored = binary.nefFromBinary(binary.nefToBinary(d))
+        self.assertEqual([r['i'] for r in restored['sf']['test_loop']], ['-0', '007', '12'])
+        self.assertEqual([r['f'] for r in restored['sf']['test_loop']],
+                         ['1.500', '-2.250', '0.000'])
+
+    def test_repeated_values_are_shared(self):
+        restored = binary.nefFromBinary(binary.nefToBinary(self.nef))
+        loop = restored['nef_molecular_system']['nef_sequence']
+        self.assertIs(loop[0]['chain_code'], loop[1]['chain_code'])
+
+    def test_ragged_loop(self):
+        d = OrderedDict()
+        d['sf'] = OrderedDict((('test_loop', [OrderedDict((('a', '1'),)),
+                                              OrderedDict((('a', '2'), ('b', 'x')))]),))
+        restored = binary.nefFromBinary(binary.nefToBinary(d))
+        self.assertEqual(restored['sf']['test_loop'], d['sf']['test_loop'])
+
+    def test_not_binary(self):
+        with self.assertRaises(ValueError):
+            binary.nefFromBinary(b'data_nef_my_nmr_project\n')
+
+    def test_save_and_load_binary(self):
+        directory = tempfile.mkdtemp()
+        try:
+            f_name = os.path.join(directory, 'test.nefb')
+            self.nef.save_binary(f_name)
+            restored = NEFreader.Nef.load_binary(f_name)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertIsInstance(restored, NEFreader.Nef)
+        self.assertEqual(restored.datablock, 'nef_my_nmr_project_1')
+        self.assertEqual(restored, self.nef)
+
+
+class Test_binary_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.f_name = os.path.join(self.directory, 'test.nef')
+        shutil.copy('tests/test_files/Commented_Example.nef', self.f_name)
+        self.cache_dir = os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def test_warm_read_skips_lexer(self):
+        with patch('NEFreader.parser.Lexer', wraps=NEFreader.parser.Lexer) as lexer:
+            cold = NEFreader.Nef.from_file(self.f_name, cache=self.cache_dir)
+            self.assertTrue(lexer.called)
+        self.assertTrue(os.path.exists(binary.cache_path(self.f_name, self.cache_dir)))
+
+        with patch('NEFreader.parser.Lexer', wraps=NEFreader.parser.Lexer) as lexer, \
+                patch.object(NEFreader.Nef, 'from_tokens') as from_tokens:
+            warm = NEFreader.Nef.from_file(self.f_name, cache=self.cache_dir)
+            self.assertFalse(lexer.called)
+            self.assertFalse(from_tokens.called)
+
+        self.assertEqual(warm.datablock, cold.datablock)
+        self.assertEqual(warm, cold)
+
+    def test_modified_file_is_reparsed(self):
+        NEFreader.Nef.from_file(self.f_name, cache=self.cache_dir)
+        old_path = binary.cache_path(self.f_name, self.cache_dir)
+
+        with open(self.f_name, 'a') as f:
+            f.write('\n')
+        stat = os.stat(self.f_name)
+        os.utime(self.f_name, (stat.st_atime, stat.st_mtime + 10))
+
+        self.assertNotEqual(binary.cache_path(self.f_name, self.cache_dir), old_path)
+        NEFreader.Nef.from_file(self.f_name, cache=self.cache_dir)
+        self.assertTrue(os.path.exists(binary.cache_path(self.f_name, self.cache_dir)))
+
+    def test_corrupt_cache_entry_is_ignored(self):
+        NEFreader.Nef.from_file(self.f_name, cache=self.cache_dir)
+        with open(binary.cache_path(self.f_name, self.cache_dir), 'wb') as f:
+            f.write(b'NEFB')
+
+        nef = NEFreader.Nef.from_file(self.f_name, cache=self.cache_dir)
+        self.assertEqual(nef.datablock, 'nef_my_nmr_project_1')
+
+
+if __name__ == '__main__':
+    unittest.main()
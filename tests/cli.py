@@ -0,0 +1,129 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import NEFreader
+from NEFreader import cli, generator
+
+
+class Test_cli(unittest.TestCase):
+
+    def setUp(self):
+        self.f_name = 'tests/test_files/CCPN_2l9r_Paris_155.nef'
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_cli(self, *argv):
+        out = io.StringIO()
+        status = cli.main(list(argv), out=out)
+        return status, out.getvalue()
+
+
+    def test_info(self):
+        status, text = self.run_cli('info', self.f_name)
+        self.assertEqual(status, 0)
+        self.assertTrue(text.startswith('datablock 2l9r_Paris_155\n'))
+        self.assertIn('nef_molecular_system  (nef_molecular_system)', text)
+
+    def test_info_json(self):
+        status, text = self.run_cli('info', '--json', 'tests/test_files/Commented_Example.nef')
+        summary = json.loads(text)
+        nef = NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef')
+
+        self.assertEqual([sf['name'] for sf in summary['saveframes']], list(nef))
+        sequence = summary['saveframes'][list(nef).index('nef_molecular_system')]['loops'][0]
+        self.assertEqual(sequence['rows'], len(nef['nef_molecular_system']['nef_sequence']))
+
+    def test_validate(self):
+        filename = os.path.join(self.directory, 'valid.nef')
+        generator.save(filename, residues=10, distance_restraints=10, peaks=10)
+
+        status, text = self.run_cli('validate', filename)
+        self.assertEqual(status, 0)
+        self.assertEqual(text, '{}: valid\n'.format(filename))
+
+    def test_validate_invalid(self):
+        status, text = self.run_cli('validate', 'tests/test_files/Commented_Example.nef')
+        self.assertEqual(status, 1)
+        self.assertIn('invalid', text)
+        self.assertIn('    PEAK_LISTS: nef_nmr_spectrum_dummy15d: missing '
+                      'nef_spectrum_dimension_transfer label.\n', text)
+        self.assertNotIn('DATABLOCK', text)
+        self.assertNotIn('LINKAGE_TABLES', text)
+
+    def test_extract(self):
+        status, text = self.run_cli('extract', 'tests/test_files/Commented_Example.nef',
+                                    'nef_molecular_system', 'nef_sequence', '--format', 'csv')
+        lines = text.splitlines()
+        nef = NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef')
+        sequence = nef['nef_molecular_system']['nef_sequence']
+
+        self.assertEqual(status, 0)
+        self.assertEqual(lines[0].split(','), list(sequence[0].keys()))
+        self.assertEqual(len(lines), len(sequence) + 1)
+
+    def test_extract_missing_saveframe(self):
+        status, text = self.run_cli('extract', self.f_name, 'no_such_saveframe', 'nef_peak')
+        self.assertEqual(status, 1)
+
+    def test_convert(self):
+        source = os.path.join(self.directory, 'in.nef')
+        generator.save(source, residues=10, distance_restraints=10, peaks=10)
+        compressed = os.path.join(self.directory, 'out.nef.gz')
+        binary = os.path.join(self.directory, 'out.nefb')
+        text = os.path.join(self.directory, 'out.nef')
+
+        self.assertEqual(self.run_cli('convert', source, compressed)[0], 0)
+        self.assertEqual(self.run_cli('convert', compressed, binary)[0], 0)
+        self.assertEqual(self.run_cli('convert', binary, text)[0], 0)
+
+        original = NEFreader.Nef.from_file(source)
+        converted = NEFreader.Nef.from_file(text)
+        self.assertEqual(list(converted), list(original))
+        for saveframe in list(original)[1:]:
+            self.assertEqual(converted[saveframe], original[saveframe])
+        self.assertEqual(NEFreader.Nef.load_binary(binary),
+                         NEFreader.Nef.from_file(compressed))
+
+    def test_convert_canonical(self):
+        source = os.path.join(self.directory, 'in.nef')
+        generator.save(source, residues=10, distance_restraints=10, peaks=10)
+        first = os.path.join(self.directory, 'first.nef')
+        second = os.path.join(self.directory, 'second.nef')
+
+        for output in (first, second):
+            self.assertEqual(self.run_cli('convert', '--canonical', '--creation-date',
+                                          '2016-01-01T00:00:00', source, output)[0], 0)
+
+        with open(first) as f, open(second) as g:
+            self.assertEqual(f.read(), g.read())
+        self.assertFalse(NEFreader.diff(NEFreader.Nef.from_file(source),
+                                        NEFreader.Nef.from_file(first)).changed
+                         .get('nef_molecular_system'))
+
+    def test_diff(self):
+        self.assertEqual(self.run_cli('diff', self.f_name, self.f_name), (0, ''))
+
+        status, text = self.run_cli('diff', self.f_name, 'tests/test_files/Commented_Example.nef')
+        self.assertEqual(status, 1)
+        self.assertIn('datablock 2l9r_Paris_155 -> nef_my_nmr_project_1\n', text)
+        self.assertIn('+ nef_nmr_spectrum_cnoesy1\n', text)
+
+    def test_stats(self):
+        status, text = self.run_cli('stats', 'tests/test_files/Commented_Example.nef',
+                                    '--saveframes', '2')
+        self.assertEqual(status, 0)
+        self.assertIn('tokenize', text)
+        self.assertIn('validate_peak_lists', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import copy
+import unittest
+from collections import OrderedDict
+
+import NEFreader
+from NEFreader.combine import merge
+
+
+def _project(shifts, restraint_ids, peak_ids, links):
+    """
+    A Nef with a shift list, a distance restraint list, a spectrum and peak-restraint links.
+    """
+    nef = NEFreader.Nef()
+    nef['nef_chemical_shift_list_1']['nef_chemical_shift'] = [
+        OrderedDict([('chain_code', 'A'), ('sequence_code', s), ('residue_type', 'ALA'),
+                     ('atom_name', 'CA'), ('value', v)]) for s, v in shifts]
+    nef.add_distance_restraint_list('nef_distance_restraint_list_1', 'square-well-parabolic')
+    nef['nef_distance_restraint_list_1']['nef_distance_restraint'] = [
+        OrderedDict([('ordinal', str(i)), ('restraint_id', r)])
+        for i, r in enumerate(restraint_ids, 1)]
+    nef.add_saveframe('nef_nmr_spectrum_1', 'nef_nmr_spectrum')
+    nef['nef_nmr_spectrum_1']['chemical_shift_list'] = 'nef_chemical_shift_list_1'
+    nef['nef_nmr_spectrum_1']['nef_peak'] = [OrderedDict([('ordinal', str(i)), ('peak_id', p)])
+                                             for i, p in enumerate(peak_ids, 1)]
+    nef.add_linkage_table()
+    nef['nef_peak_restraint_links']['nef_peak_restraint_link'] = [
+        OrderedDict([('nmr_spectrum_id', 'nef_nmr_spectrum_1'), ('peak_id', p),
+                     ('restraint_list_id', 'nef_distance_restraint_list_1'),
+                     ('restraint_id', r)]) for p, r in links]
+    return nef
+
+
+class Test_merge(unittest.TestCase):
+
+    def setUp(self):
+        self.first = _project([('1', '52.0'), ('2', '53.0')], ['1', '1', '2'], ['1', '2'],
+                              [('1', '1'), ('2', '2')])
+        self.second = _project([('2', '99.0'), ('3', '54.0')], ['1', '5'], ['3'],
+                               [('3', '5')])
+
+
+    def test_rename(self):
+        merged = merge([self.first, self.second])
+
+        self.assertEqual(list(merged), ['nef_nmr_meta_data', 'nef_molecular_system',
+                                        'nef_chemical_shift_list_1',
+                                        'nef_distance_restraint_list_1', 'nef_nmr_spectrum_1',
+                                        'nef_chemical_shift_list_1_2',
+                                        'nef_distance_restraint_list_1_2', 'nef_nmr_spectrum_1_2',
+                                        'nef_peak_restraint_links'])
+        self.assertEqual(merged['nef_nmr_spectrum_1_2']['sf_framecode'], 'nef_nmr_spectrum_1_2')
+        self.assertEqual(merged['nef_nmr_spectrum_1_2']['chemical_shift_list'],
+                         'nef_chemical_shift_list_1_2')
+        self.assertEqual(merged['nef_nmr_spectrum_1']['chemical_shift_list'],
+                         'nef_chemical_shift_list_1')
+        links = merged['nef_peak_restraint_links']['nef_peak_restraint_link']
+        self.assertEqual([(l['nmr_spectrum_id'], l['peak_id'], l['restraint_list_id'],
+                           l['restraint_id']) for l in links],
+                         [('nef_nmr_spectrum_1', '1', 'nef_distance_restraint_list_1', '1'),
+                          ('nef_nmr_spectrum_1', '2', 'nef_distance_restraint_list_1', '2'),
+                          ('nef_nmr_spectrum_1_2', '3', 'nef_distance_restraint_list_1_2', '5')])
+
+    def test_concatenate(self):
+        merged = merge([self.first, self.second], policy='concatenate')
+
+        restraints = merged['nef_distance_restraint_list_1']['nef_distance_restraint']
+        self.assertEqual([(r['ordinal'], r['restraint_id']) for r in restraints],
+                         [('1', '1'), ('2', '1'), ('3', '2'), ('4', '3'), ('5', '7')])
+        peaks = merged['nef_nmr_spectrum_1']['nef_peak']
+        self.assertEqual([(p['ordinal'], p['peak_id']) for p in peaks],
+                         [('1', '1'), ('2', '2'), ('3', '5')])
+        shifts = merged['nef_chemical_shift_list_1']['nef_chemical_shift']
+        self.assertEqual([(s['sequence_code'], s['value']) for s in shifts],
+                         [('1', '52.0'), ('2', '53.0'), ('3', '54.0')])
+        links = merged['nef_peak_restraint_links']['nef_peak_restraint_link']
+        self.assertEqual([(l['nmr_spectrum_id'], l['peak_id'], l['restraint_id'])
+                          for l in links],
+                         [('nef_nmr_spectrum_1', '1', '1'), ('nef_nmr_spectrum_1', '2', '2'),
+                          ('nef_nmr_spectrum_1', '5', '7')])
+
+    def test_inputs_unchanged(self):
+        first, second = copy.deepcopy(self.first), copy.deepcopy(self.second)
+
+        merged = merge([self.first, self.second], policy='concatenate')
+        merged['nef_nmr_spectrum_1']['nef_peak'].append(OrderedDict())
+
+        self.assertEqual(self.first, first)
+        self.assertEqual(self.second, second)
+
+    def test_first_and_last(self):
+        first = merge([self.first, self.second], policy='first')
+        last = merge([self.first, self.second], policy='last')
+
+        self.assertEqual(first['nef_nmr_spectrum_1'], self.first['nef_nmr_spectrum_1'])
+        self.assertEqual(last['nef_nmr_spectrum_1'], self.second['nef_nmr_spectrum_1'])
+        self.assertEqual(last['nef_nmr_meta_data'], self.first['nef_nmr_meta_data'])
+        self.assertEqual(len(last), len(self.first))
+
+    def test_first_and_last_links(self):
+        first = merge([self.first, self.second], policy='first')
+        last = merge([self.first, self.second], policy='last')
+
+        links = first['nef_peak_restraint_links']['nef_peak_restraint_link']
+        self.assertEqual([(l['peak_id'], l['restraint_id']) for l in links],
+                         [('1', '1'), ('2', '2')])
+        links = last['nef_peak_restraint_links']['nef_peak_restraint_link']
+        self.assertEqual([(l['nmr_spectrum_id'], l['peak_id'], l['restraint_id'])
+                          for l in links],
+                         [('nef_nmr_spectrum_1', '3', '5')])
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            merge([self.first, self.second], policy='error')
+        with self.assertRaises(ValueError):
+            merge([self.first, self.second], policy='no such policy')
+        with self.assertRaises(ValueError):
+            merge([])
+
+    def test_non_integer_ids(self):
+        self.second['nef_nmr_spectrum_1']['nef_peak'][0]['peak_id'] = 'x'
+
+        with self.assertRaises(ValueError):
+            merge([self.first, self.second], policy='concatenate')
+
+    def test_many(self):
+        merged = merge([self.first] * 20, policy='concatenate')
+
+        peaks = merged['nef_nmr_spectrum_1']['nef_peak']
+        self.assertEqual(len(peaks), 40)
+        self.assertEqual(len(set(p['peak_id'] for p in peaks)), 40)
+        links = merged['nef_peak_restraint_links']['nef_peak_restraint_link']
+        self.assertEqual(links[-1]['peak_id'], '40')
+        self.assertEqual(links[-1]['restraint_id'], '40')
+
+    def test_package_name(self):
+        self.assertIs(NEFreader.merge, merge)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import copy
+import io
+import unittest
+from collections import OrderedDict
+
+import NEFreader
+from NEFreader import compare
+
+
+class Test_diff(unittest.TestCase):
+
+    def setUp(self):
+        self.old = NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef')
+        self.new = copy.deepcopy(self.old)
+
+
+    def test_identical(self):
+        differences = compare.diff(self.old, self.new)
+
+        self.assertFalse(differences)
+        self.assertEqual(differences.lines(), [])
+
+    def test_compact(self):
+        compact = NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef', compact=True)
+
+        self.assertFalse(compare.diff(self.old, compact))
+
+    def test_recorded_digests(self):
+        text = io.StringIO()
+        self.old.write(text, canonical=True)
+        rewritten = NEFreader.Nef.from_text(text.getvalue())
+        del rewritten['nef_nmr_meta_data']
+        del self.old['nef_nmr_meta_data']
+
+        self.assertFalse(compare.diff(self.old, rewritten, digests=True))
+
+        rewritten['nef_molecular_system'] = OrderedDict(rewritten['nef_molecular_system'],
+                                                        new_item='x')
+        differences = compare.diff(self.old, rewritten, digests=True)
+        self.assertEqual(list(differences.changed), ['nef_molecular_system'])
+
+    def test_saveframes(self):
+        del self.new['nef_rdc_restraint_list_1']
+        self.new.add_saveframe('nef_nmr_spectrum_new', 'nef_nmr_spectrum')
+
+        differences = compare.diff(self.old, self.new)
+
+        self.assertEqual(differences.added, ['nef_nmr_spectrum_new'])
+        self.assertEqual(differences.removed, ['nef_rdc_restraint_list_1'])
+        self.assertEqual(differences.changed, OrderedDict())
+        self.assertEqual(differences.lines(), ['+ nef_nmr_spectrum_new',
+                                               '- nef_rdc_restraint_list_1'])
+
+    def test_items(self):
+        self.new['nef_chemical_shift_list_1']['atom_chem_shift_units'] = 'Hz'
+        self.new['nef_chemical_shift_list_1']['new_item'] = 'x'
+
+        differences = compare.diff(self.old, self.new)
+
+        self.assertEqual(list(differences.changed), ['nef_chemical_shift_list_1'])
+        shift_list = differences.changed['nef_chemical_shift_list_1']
+        self.assertEqual(shift_list.items,
+                         OrderedDict([('atom_chem_shift_units', ('ppm', 'Hz')),
+                                      ('new_item', (None, 'x'))]))
+        self.assertEqual(shift_list.loops, OrderedDict())
+
+    def test_rows(self):
+        shifts = self.new['nef_chemical_shift_list_1']['nef_chemical_shift']
+        removed = shifts.pop(0)
+        shifts[0] = OrderedDict(shifts[0], value='99.0')
+        added = OrderedDict(shifts[1], atom_name='QQ')
+        shifts.insert(3, added)
+
+        loop = compare.diff(self.old, self.new) \
+            .changed['nef_chemical_shift_list_1'].loops['nef_chemical_shift']
+
+        self.assertEqual(loop.added, [added])
+        self.assertEqual(loop.removed, [removed])
+        old_shifts = self.old['nef_chemical_shift_list_1']['nef_chemical_shift']
+        self.assertEqual(loop.changed, [(old_shifts[1], shifts[0])])
+
+    def test_renumbered_rows(self):
+        restraints = self.new['nef_distance_restraint_list_L1']['nef_distance_restraint']
+        removed = restraints.pop(0)
+        for i, row in enumerate(restraints, 1):
+            row['ordinal'] = str(i)
+
+        loop = compare.diff(self.old, self.new) \
+            .changed['nef_distance_restraint_list_L1'].loops['nef_distance_restraint']
+
+        self.assertEqual(loop, compare.LoopDiff([], [removed], []))
+
+    def test_repeated_keys(self):
+        old = [OrderedDict([('peak_id', '1'), ('atom_name_1', 'HA')]),
+               OrderedDict([('peak_id', '1'), ('atom_name_1', 'HB')])]
+        new = old + [OrderedDict([('peak_id', '1'), ('atom_name_1', 'HG')])]
+
+        loop = compare.diff_loop('nef_peak', old, new)
+
+        self.assertEqual(loop, compare.LoopDiff([new[2]], [], []))
+
+    def test_unkeyed_loop(self):
+        old = [OrderedDict([('a', '1'), ('b', '2')])]
+        new = [OrderedDict([('a', '1'), ('b', '3')])]
+
+        self.assertEqual(compare.diff_loop('nef_unknown', old, new),
+                         compare.LoopDiff(new, old, []))
+
+    def test_new_loop(self):
+        spectrum = self.new['nef_nmr_spectrum_cnoesy1']
+        del spectrum['nef_spectrum_dimension_transfer']
+
+        loop = compare.diff(self.old, self.new) \
+            .changed['nef_nmr_spectrum_cnoesy1'].loops['nef_spectrum_dimension_transfer']
+
+        self.assertEqual(loop.added, [])
+        self.assertEqual(len(loop.removed), 2)
+
+    def test_ignored(self):
+        self.new['nef_nmr_spectrum_cnoesy1']['nef_peak'][0]['ordinal'] = '100'
+
+        self.assertFalse(compare.diff(self.old, self.new))
+        self.assertTrue(compare.diff(self.old, self.new, ignored=()))
+
+    def test_package_name(self):
+        self.assertIs(NEFreader.diff, compare.diff)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import NEFreader
+from NEFreader import compression, generator
+
+
+class Test_compression(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.plain = os.path.join(self.directory, 'project.nef')
+        generator.save(self.plain, residues=10, distance_restraints=20, peaks=20,
+                       creation_date='2016-01-01T00:00:00')
+        with open(self.plain, 'r') as f:
+            self.text = f.read()
+        self.nef = NEFreader.Nef.from_file(self.plain)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def test_compression_from_extension(self):
+        self.assertEqual(compression.compression_from_extension('a.nef.gz'), 'gzip')
+        self.assertEqual(compression.compression_from_extension('a.nef.BZ2'), 'bz2')
+        self.assertEqual(compression.compression_from_extension('a.nef.xz'), 'xz')
+        self.assertIsNone(compression.compression_from_extension('a.nef'))
+
+    def test_write_and_read_each_compression(self):
+        for extension, magic in (('.gz', b'\x1f\x8b'), ('.bz2', b'BZh'), ('.xz', b'\xfd7zXZ')):
+            filename = self.plain + extension
+            generator.save(filename, residues=10, distance_restraints=20, peaks=20,
+                           creation_date='2016-01-01T00:00:00')
+            with open(filename, 'rb') as f:
+                self.assertEqual(f.read(len(magic)), magic)
+            self.assertEqual(NEFreader.Nef.from_file(filename), self.nef)
+
+    def test_detected_from_magic_bytes(self):
+        filename = os.path.join(self.directory, 'misleading.nef')
+        with gzip.open(filename, 'wt') as f:
+            f.write(self.text)
+
+        self.assertEqual(compression.compression_from_magic(filename), 'gzip')
+        self.assertEqual(NEFreader.Nef.from_file(filename), self.nef)
+
+    def test_parser_load(self):
+        filename = self.plain + '.bz2'
+        with compression.open_text(filename, 'w') as f:
+            f.write(self.text)
+        self.assertEqual(NEFreader.Parser().load(filename), NEFreader.Parser().load(self.plain))
+
+    def test_save(self):
+        filename = os.path.join(self.directory, 'saved.nef.gz')
+        self.nef.save(filename)
+
+        with gzip.open(filename, 'rt') as f:
+            restored = NEFreader.Nef.from_text(f.read())
+        self.assertEqual(restored, self.nef)
+
+    def test_iter_loop(self):
+        filename = self.plain + '.xz'
+        with compression.open_text(filename, 'w') as f:
+            f.write(self.text)
+        rows = [row for batch in NEFreader.iter_loop(filename, 'nef_nmr_spectrum_synthetic_1',
+                                                     'nef_peak')
+                for row in batch]
+        self.assertEqual(len(rows), 20)
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            compression.open_text(self.plain, compression='zstd')
+
+
+if __name__ == '__main__':
+    unittest.main()
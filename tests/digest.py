@@ -0,0 +1,136 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import io
+import unittest
+from collections import OrderedDict
+
+import NEFreader
+from NEFreader import digest, generator
+
+
+class Test_digest(unittest.TestCase):
+
+    def setUp(self):
+        self.f_name = 'tests/test_files/Commented_Example.nef'
+        self.nef = NEFreader.Nef.from_file(self.f_name)
+
+
+    def test_known_value(self):
+        saveframe = OrderedDict([('sf_category', 'x'), ('sf_framecode', 'y'),
+                                 ('l', [OrderedDict([('a', '1'), ('b', '2')])])])
+
+        self.assertEqual(digest.saveframe_digest(saveframe).digest.hex(),
+                         'dddd0470ec1d2307d4bd917759c6d00c')
+
+    def test_parsed_digests_match_contents(self):
+        self.assertEqual(set(self.nef._digests), set(self.nef))
+        for name, (saveframe, recorded) in self.nef._digests.items():
+            self.assertIs(saveframe, self.nef[name])
+            self.assertEqual(recorded, digest.saveframe_digest(saveframe))
+
+    def test_large_loops(self):
+        text = io.StringIO()
+        generator.write(text, residues=50, distance_restraints=2 * digest.ROWS_PER_UPDATE + 1)
+        nef = NEFreader.Nef.from_text(text.getvalue())
+
+        for name, (saveframe, recorded) in nef._digests.items():
+            self.assertEqual(recorded, digest.saveframe_digest(saveframe))
+
+    def test_representations(self):
+        compact = NEFreader.Nef.from_file(self.f_name, compact=True)
+        with open(self.f_name) as f:
+            streamed = NEFreader.Nef.from_stream(f)
+
+        for name in self.nef:
+            self.assertEqual(compact.saveframe_digest(name), self.nef.saveframe_digest(name))
+            self.assertEqual(streamed.saveframe_digest(name), self.nef.saveframe_digest(name))
+            self.assertEqual(compact.saveframe_digest(name, recompute=True),
+                             self.nef.saveframe_digest(name))
+
+    def test_layout_independent(self):
+        text = io.StringIO()
+        generator.write(text, residues=10, distance_restraints=10, peaks=10)
+        generator_text = text.getvalue()
+        nef = NEFreader.Nef.from_text(generator_text)
+        text = io.StringIO()
+        nef.write(text)
+        rewritten = NEFreader.Nef.from_text(text.getvalue())
+
+        self.assertNotEqual(text.getvalue(), generator_text)
+        for name in nef:
+            self.assertEqual(rewritten.saveframe_digest(name),
+                             nef.saveframe_digest(name, recompute=True))
+
+    def test_changes(self):
+        name = 'nef_nmr_spectrum_cnoesy1'
+        before = self.nef.saveframe_digest(name)
+        peaks = self.nef.loop_digest(name, 'nef_peak')
+        dimensions = self.nef.loop_digest(name, 'nef_spectrum_dimension')
+
+        self.nef[name]['nef_peak'][0]['height'] = '1.0'
+        self.assertEqual(self.nef.saveframe_digest(name), before)
+        self.assertNotEqual(self.nef.saveframe_digest(name, recompute=True), before)
+        self.assertNotEqual(self.nef.loop_digest(name, 'nef_peak'), peaks)
+        self.assertEqual(self.nef.loop_digest(name, 'nef_spectrum_dimension'), dimensions)
+
+    def test_replaced_saveframe(self):
+        name = 'nef_chemical_shift_list_1'
+        before = self.nef.saveframe_digest(name)
+
+        self.nef[name] = OrderedDict(self.nef[name], atom_chem_shift_units='Hz')
+
+        self.assertNotEqual(self.nef.saveframe_digest(name), before)
+
+    def test_missing(self):
+        with self.assertRaises(KeyError):
+            self.nef.saveframe_digest('no_such_saveframe')
+        with self.assertRaises(KeyError):
+            self.nef.loop_digest('nef_chemical_shift_list_1', 'no_such_loop')
+
+    def test_from_files(self):
+        nefs = list(NEFreader.Nef.from_files([self.f_name, self.f_name]))
+
+        self.assertIsNot(nefs[0]._digests, nefs[1]._digests)
+        self.assertEqual(set(nefs[1]._digests), set(nefs[1]))
+        self.assertEqual(nefs[0].content_digest(), nefs[1].content_digest())
+
+    def test_content_digest(self):
+        before = self.nef.content_digest()
+        self.nef['nef_nmr_meta_data']['creation_date'] = 'now'
+        self.assertEqual(self.nef.content_digest(), before)
+
+        self.nef.datablock = 'other'
+        self.assertNotEqual(self.nef.content_digest(), before)
+
+    def test_uuid(self):
+        nef = NEFreader.Nef()
+        nef._update_metadata()
+        metadata = nef['nef_nmr_meta_data']
+
+        self.assertEqual(metadata['uuid'], '-'.join((metadata['program_name'],
+                                                     metadata['creation_date'],
+                                                     nef.content_digest()[:16])))
+        self.assertEqual(NEFreader.Nef().content_digest(), nef.content_digest())
+
+    def test_uuid_uses_recorded_digests(self):
+        metadata = {'creation_date': '2016-01-01T00:00:00'}
+        self.nef._update_metadata(metadata)
+        uuid = self.nef['nef_nmr_meta_data']['uuid']
+
+        self.nef['nef_chemical_shift_list_1']['atom_chem_shift_units'] = 'Hz'
+        self.nef._update_metadata(metadata)
+        self.assertEqual(self.nef['nef_nmr_meta_data']['uuid'], uuid)
+
+        self.nef._update_metadata(metadata, recompute=True)
+        changed = self.nef['nef_nmr_meta_data']['uuid']
+        self.assertNotEqual(changed, uuid)
+
+        self.nef['nef_chemical_shift_list_1'] = OrderedDict(self.nef['nef_chemical_shift_list_1'],
+                                                            atom_chem_shift_units='ppm')
+        self.nef._update_metadata(metadata)
+        self.assertEqual(self.nef['nef_nmr_meta_data']['uuid'], uuid)
+
+
+if __name__ == '__main__':
+    unittest.main()
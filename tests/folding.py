@@ -0,0 +1,118 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+
+import NEFreader
+from NEFreader.folding import SpectrumDimensions, fold, unfold
+
+
+def _spectrum(folding='circular', absolute='false'):
+    columns = ('dimension_id', 'axis_code', 'spectral_width', 'value_first_point', 'folding',
+               'absolute_peak_positions')
+    dimensions = [OrderedDict(zip(columns, ('1', '1H', '10.0', '11.0', 'none', 'true'))),
+                  OrderedDict(zip(columns, ('2', '13C', '20.0', '70.0', folding, absolute)))]
+    peaks = [OrderedDict([('peak_id', '1'), ('position_1', '4.5'), ('position_2', '55.0')]),
+             OrderedDict([('peak_id', '2'), ('position_1', '1.0'), ('position_2', '.')])]
+    return OrderedDict([('sf_category', 'nef_nmr_spectrum'),
+                        ('nef_spectrum_dimension', dimensions),
+                        ('nef_peak', peaks)])
+
+
+class Test_fold(unittest.TestCase):
+
+    def test_circular(self):
+        np.testing.assert_allclose(fold([55.0, 35.0, 75.0, 20.0], 70.0, 20.0, 'circular'),
+                                   [55.0, 55.0, 55.0, 60.0])
+
+    def test_mirror(self):
+        np.testing.assert_allclose(fold([55.0, 45.0, 75.0, 20.0], 70.0, 20.0, 'mirror'),
+                                   [55.0, 55.0, 65.0, 60.0])
+
+    def test_none_and_missing_width(self):
+        np.testing.assert_allclose(fold([35.0], 70.0, 20.0, 'none'), [35.0])
+        np.testing.assert_allclose(fold([35.0], 70.0, np.nan, 'circular'), [35.0])
+
+    def test_per_dimension(self):
+        positions = np.array([[35.0, 35.0], [75.0, 75.0]])
+
+        np.testing.assert_allclose(fold(positions, 70.0, 20.0, np.array(['circular', 'mirror'])),
+                                   [[55.0, 65.0], [55.0, 65.0]])
+
+
+class Test_unfold(unittest.TestCase):
+
+    def test_circular_nearest_reference(self):
+        np.testing.assert_allclose(unfold([55.0, 55.0, 55.0, 55.0], 70.0, 20.0, 'circular',
+                                          [36.0, 52.0, 80.0, np.nan]),
+                                   [35.0, 55.0, 75.0, 55.0])
+
+    def test_mirror_nearest_reference(self):
+        np.testing.assert_allclose(unfold([55.0, 55.0, 65.0], 70.0, 20.0, 'mirror',
+                                          [44.0, 56.0, 76.0]),
+                                   [45.0, 55.0, 75.0])
+
+    def test_round_trip(self):
+        rng = np.random.RandomState(3)
+        absolute = rng.uniform(0.0, 200.0, 1000)
+        # Circular images are a width apart.  Mirror images can be arbitrarily close either side
+        #   of a window edge, so only an exact reference is sure to pick the right one
+        for folding, error in (('circular', 9.0), ('mirror', 0.0)):
+            folded = fold(absolute, 70.0, 20.0, folding)
+            self.assertTrue(np.all((folded >= 50.0) & (folded <= 70.0)))
+            np.testing.assert_allclose(unfold(folded, 70.0, 20.0, folding, absolute + error),
+                                       absolute)
+
+
+class Test_SpectrumDimensions(unittest.TestCase):
+
+    def test_parameters(self):
+        dimensions = SpectrumDimensions(_spectrum())
+
+        self.assertEqual(dimensions.axis_codes, ['1H', '13C'])
+        np.testing.assert_array_equal(dimensions.width, [10.0, 20.0])
+        np.testing.assert_array_equal(dimensions.folded, [False, True])
+        np.testing.assert_array_equal(dimensions.absolute, [True, False])
+        self.assertIsNone(dimensions.window(0))
+        self.assertEqual(dimensions.window(1), (70.0, 20.0, 'circular'))
+
+    def test_peak_positions(self):
+        dimensions = SpectrumDimensions(_spectrum())
+        spectrum = _spectrum()
+
+        positions = dimensions.peak_positions(spectrum)
+        np.testing.assert_array_equal(positions, [[4.5, 55.0], [1.0, np.nan]])
+
+        reference = np.array([[14.0, 36.0], [np.nan, np.nan]])
+        np.testing.assert_array_equal(dimensions.peak_positions(spectrum, reference),
+                                      [[4.5, 35.0], [1.0, np.nan]])
+
+    def test_absolute_positions_not_unfolded(self):
+        spectrum = _spectrum(absolute='true')
+        dimensions = SpectrumDimensions(spectrum)
+
+        np.testing.assert_array_equal(
+            dimensions.peak_positions(spectrum, np.array([[4.5, 36.0], [1.0, 36.0]])),
+            [[4.5, 55.0], [1.0, np.nan]])
+
+    def test_without_folding_columns(self):
+        spectrum = {'nef_spectrum_dimension': {'dimension_id': ['1'], 'axis_code': ['1H']}}
+        dimensions = SpectrumDimensions(spectrum)
+
+        np.testing.assert_array_equal(dimensions.folded, [False])
+        np.testing.assert_array_equal(dimensions.absolute, [True])
+
+    def test_paris(self):
+        nef = NEFreader.Nef.from_file('tests/test_files/CCPN_2l9r_Paris_155.nef')
+        dimensions = SpectrumDimensions(nef['nef_nmr_spectrum_cnoe_raw'])
+
+        np.testing.assert_array_equal(dimensions.folded, [True, True, True])
+        np.testing.assert_array_equal(dimensions.absolute, [True, True, True])
+        np.testing.assert_allclose(dimensions.width, [13.312, 203.60000162466437, 13.312])
+
+
+if __name__ == '__main__':
+    unittest.main()
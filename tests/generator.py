@@ -0,0 +1,70 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import io
+import unittest
+
+import NEFreader
+from NEFreader import generator
+
+
+class Test_generator(unittest.TestCase):
+
+    def setUp(self):
+        self.sizes = dict(residues=30, chains=2, shift_lists=2, distance_restraint_lists=2,
+                          distance_restraints=25, dihedral_restraints=10, rdc_restraints=5,
+                          spectra=3, dimensions=4, peaks=12, creation_date='2016-01-01T00:00:00')
+        f = io.StringIO()
+        generator.write(f, **self.sizes)
+        self.text = f.getvalue()
+        self.nef = NEFreader.Nef.from_text(self.text)
+
+
+    def test_valid(self):
+        v = NEFreader.Validator(self.nef)
+        self.assertTrue(v.isValid(), v.validation_errors)
+
+    def test_saveframes(self):
+        self.assertIn('nef_chemical_shift_list_2', self.nef)
+        self.assertIn('nef_distance_restraint_list_2', self.nef)
+        self.assertIn('nef_nmr_spectrum_synthetic_3', self.nef)
+        self.assertEqual(self.nef['nef_nmr_spectrum_synthetic_1']['chemical_shift_list'],
+                         'nef_chemical_shift_list_1')
+
+    def test_sizes(self):
+        self.assertEqual(len(self.nef['nef_molecular_system']['nef_sequence']), 30)
+        self.assertEqual(set(r['chain_code'] for r in
+                             self.nef['nef_molecular_system']['nef_sequence']), {'A', 'B'})
+        restraints = self.nef['nef_distance_restraint_list_1']['nef_distance_restraint']
+        self.assertEqual(len(set(r['restraint_id'] for r in restraints)), 25)
+        spectrum = self.nef['nef_nmr_spectrum_synthetic_1']
+        self.assertEqual(len(spectrum['nef_spectrum_dimension']), 4)
+        self.assertEqual(len(spectrum['nef_peak']), 12)
+        self.assertIn('position_4', spectrum['nef_peak'][0])
+
+    def test_reproducible(self):
+        f = io.StringIO()
+        generator.write(f, **self.sizes)
+        self.assertEqual(f.getvalue(), self.text)
+
+    def test_rows_written_in_batches(self):
+        f = io.StringIO()
+        old_batch_size = generator.ROW_BATCH_SIZE
+        generator.ROW_BATCH_SIZE = 7
+        try:
+            generator.write(f, **self.sizes)
+        finally:
+            generator.ROW_BATCH_SIZE = old_batch_size
+        self.assertEqual(f.getvalue(), self.text)
+
+    def test_empty_loops_not_allowed(self):
+        with self.assertRaises(ValueError):
+            generator.write(io.StringIO(), peaks=0)
+
+    def test_one_dimensional_spectra_not_allowed(self):
+        with self.assertRaises(ValueError):
+            generator.write(io.StringIO(), dimensions=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import NEFreader
+
+
+def _run(code):
+    """
+    Output of running code in a fresh interpreter.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(os.path.abspath(NEFreader.__file__)))
+    return subprocess.check_output([sys.executable, '-c', code], env=env).decode('utf-8')
+
+
+def _modules_after(statement):
+    """
+    Modules loaded by running statement in a fresh interpreter.
+    """
+    return set(json.loads(_run('{}\nimport sys\nmodules = sorted(sys.modules)\n'
+                               'import json\nprint(json.dumps(modules))'.format(statement))))
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'Lazy imports need module __getattr__')
+class Test_lazy_imports(unittest.TestCase):
+
+    def test_package_import_loads_no_submodules(self):
+        modules = _modules_after('import NEFreader')
+        self.assertFalse([m for m in modules if m.startswith('NEFreader.')])
+
+    def test_nef_import_defers_optional_modules(self):
+        modules = _modules_after('from NEFreader import Nef')
+        self.assertIn('NEFreader.nef', modules)
+        for module in ('NEFreader.binary', 'NEFreader.validator', 'NEFreader.archive',
+                       'tracemalloc', 'gzip', 'bz2', 'lzma', 'tarfile', 'zipfile', 'numpy',
+                       're', 'numbers'):
+            self.assertNotIn(module, modules)
+
+    def test_names_resolve(self):
+        self.assertIs(NEFreader.Nef, NEFreader.nef.Nef)
+        self.assertIs(NEFreader.Validator, NEFreader.validator.Validator)
+        self.assertIn('Parser', dir(NEFreader))
+
+    def test_unknown_name(self):
+        with self.assertRaises(AttributeError):
+            NEFreader.no_such_name
+
+    def test_missing_dependency(self):
+        output = _run('import sys\n'
+                      'sys.modules["numpy"] = None\n'
+                      'import NEFreader\n'
+                      'try:\n'
+                      '    NEFreader.restraints\n'
+                      'except AttributeError:\n'
+                      '    print("AttributeError")\n'
+                      'except ImportError as e:\n'
+                      '    print(e.name)\n')
+        self.assertEqual(output.strip(), 'numpy')
+
+
+if __name__ == '__main__':
+    unittest.main()
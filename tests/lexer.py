@@ -163,3 +163,65 @@ class Test_Tokenizer_tokenize(unittest.TestCase):
     def test_tokenize_comment_without_newline(self):
         self.l.tokenize('#=')
         self.assertEquals( self.l.tokens, ['#='] )
+
+
+
+class Test_Tokenizer_feed(unittest.TestCase):
+
+    TEXT = ("data_nef_test\n"
+            "save_nef_nmr_meta_data # comment 'with quotes'\n"
+            "   _nef_nmr_meta_data.program_name   'quoted value'\n"
+            "   _nef_nmr_meta_data.other \"it's\" 'x'y' z\n"
+            ";\nsemicolon\n ; not the end\n;\n"
+            "   loop_ _a.b _a.c\n"
+            "   1 \"two words\" 3 ;4\n"
+            "   stop_\n"
+            "save_")
+
+    def setUp(self):
+        self.l = NEFreader.Lexer()
+        self.tokens = NEFreader.Lexer().tokenize(self.TEXT)
+
+
+    def test_feed_split_at_every_position(self):
+        for i in range(len(self.TEXT) + 1):
+            tokens = self.l.feed(self.TEXT[:i])
+            tokens += self.l.feed(self.TEXT[i:])
+            tokens += self.l.close()
+            self.assertEqual(tokens, self.tokens, 'split at {}'.format(i))
+
+    def test_feed_one_character_at_a_time(self):
+        tokens = []
+        for c in self.TEXT:
+            tokens += self.l.feed(c)
+        tokens += self.l.close()
+        self.assertEqual(tokens, self.tokens)
+
+    def test_feed_keeps_partial_token(self):
+        self.assertEqual(self.l.feed('data_nef'), [])
+        self.assertEqual(self.l.feed('_test\n;semi'), ['data_nef_test', '\n'])
+        self.assertEqual(self.l._state, 'semicolon comment')
+        self.assertEqual(self.l.close(), [';semi'])
+
+    def test_feed_keeps_quote_state(self):
+        self.l.feed("'a b")
+        self.assertEqual(self.l._state, 'quoted')
+        self.l.feed("'")
+        self.assertEqual(self.l._state, 'potential unquote')
+        self.assertEqual(self.l.feed(' '), ["'a b'"])
+
+    def test_close_resets(self):
+        self.l.feed("'unfinished")
+        self.l.close()
+        self.assertEqual(self.l.feed('x y'), ['x'])
+
+    def test_feed_file_matches_tokenize(self):
+        with open('tests/test_files/Commented_Example.nef', 'r') as f:
+            text = f.read()
+        tokens = []
+        for i in range(0, len(text), 5):
+            tokens += self.l.feed(text[i:i + 5])
+        tokens += self.l.close()
+
+        self.assertEqual(tokens, NEFreader.Lexer().tokenize(text))
+
@@ -1,9 +1,16 @@
 from __future__ import absolute_import, print_function, unicode_literals
 __author__ = 'TJ Ragan'
 
+import io
+import pickle
 import unittest
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
 
 import NEFreader
+from NEFreader.profiling import Stats
 
 
 class Test_bare_nef(unittest.TestCase):
@@ -172,5 +179,69 @@ class Test_nef_convenience_functions(unittest.TestCase):
         self.assertEqual(self.nef['arbitrary_name']['sf_category'], 'arbitrary_category')
 
 
+class Test_construction(unittest.TestCase):
+
+    def setUp(self):
+        self.f_name = 'tests/test_files/Commented_Example.nef'
+        with open(self.f_name, 'r') as f:
+            self.text = f.read()
+        self.nef = NEFreader.Nef.from_text(self.text)
+
+
+    def test_empty(self):
+        nef = NEFreader.Nef.empty('x.nef')
+        self.assertEqual(len(nef), 0)
+        self.assertFalse(hasattr(nef, 'datablock'))
+        self.assertEqual(nef.input_filename, 'x.nef')
+        self.assertIsInstance(nef, NEFreader.Nef)
+
+    def test_from_text_skips_initialize(self):
+        with patch.object(NEFreader.Nef, 'initialize') as initialize:
+            NEFreader.Nef.from_text(self.text)
+        self.assertFalse(initialize.called)
+
+    def test_from_text(self):
+        self.assertEqual(self.nef.datablock, 'nef_my_nmr_project_1')
+        saveframes = [line.split()[0][5:] for line in self.text.splitlines()
+                      if line.startswith('save_') and line.strip() != 'save_']
+        self.assertEqual(list(self.nef.keys()), saveframes)
+
+    def test_from_tokens(self):
+        nef = NEFreader.Nef.from_tokens(NEFreader.Lexer().tokenize(self.text))
+        self.assertEqual(nef, self.nef)
+        self.assertEqual(nef.datablock, self.nef.datablock)
+
+    def test_from_stream(self):
+        nef = NEFreader.Nef.from_stream(io.StringIO(self.text))
+        self.assertEqual(nef, self.nef)
+
+    def test_from_file_input_filename(self):
+        self.assertEqual(NEFreader.Nef.from_file(self.f_name).input_filename, self.f_name)
+        self.assertEqual(NEFreader.Nef.from_file(self.f_name, stats=Stats()).input_filename,
+                         self.f_name)
+
+    def test_from_files(self):
+        f_names = [self.f_name, 'tests/test_files/CCPN_2l9r_Paris_155.nef', self.f_name]
+        nefs = list(NEFreader.Nef.from_files(f_names))
+
+        self.assertEqual(len(nefs), 3)
+        self.assertEqual(nefs[0], self.nef)
+        self.assertEqual(nefs[2], self.nef)
+        self.assertIsNot(nefs[0], nefs[2])
+        self.assertEqual(nefs[1], NEFreader.Nef.from_file(f_names[1]))
+        self.assertEqual([nef.input_filename for nef in nefs], f_names)
+
+
+class Test_Nef_pickle(unittest.TestCase):
+
+    def test_pickle_keeps_saveframes_and_datablock(self):
+        nef = NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef')
+        restored = pickle.loads(pickle.dumps(nef))
+
+        self.assertEqual(list(restored.keys()), list(nef.keys()))
+        self.assertEqual(restored, nef)
+        self.assertEqual(restored.datablock, nef.datablock)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
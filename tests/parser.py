@@ -1,6 +1,7 @@
 from __future__ import absolute_import, print_function, unicode_literals
 __author__ = 'TJ Ragan'
 
+import io
 import unittest
 try:
     from unittest.mock import patch
@@ -270,6 +271,165 @@ class Test_Parser(unittest.TestCase):
 
 
 
+    def test_parse_loop_values_are_interned(self):
+        tokens = ['data_nef_my_nmr_project']
+        tokens.append('save_nef_molecular_system')
+        tokens.append('loop_')
+        tokens.append('_nef_sequence.chain_code')
+        tokens.append(''.join(['A', 'B']))
+        tokens.append(''.join(['A', 'B']))
+        tokens.append('stop_')
+        tokens.append('save_')
+
+        self.p.parse(tokens)
+
+        loop = self.p.target['nef_molecular_system']['nef_sequence']
+        self.assertIs(loop[0]['chain_code'], loop[1]['chain_code'])
+
+    def test_parse_loop_values_without_interning(self):
+        tokens = ['data_nef_my_nmr_project']
+        tokens.append('save_nef_molecular_system')
+        tokens.append('loop_')
+        tokens.append('_nef_sequence.chain_code')
+        tokens.append(''.join(['A', 'B']))
+        tokens.append(''.join(['A', 'B']))
+        tokens.append('stop_')
+        tokens.append('save_')
+
+        self.p.intern_values = False
+        self.p.parse(tokens)
+
+        loop = self.p.target['nef_molecular_system']['nef_sequence']
+        self.assertEqual(loop[0]['chain_code'], loop[1]['chain_code'])
+        self.assertIsNot(loop[0]['chain_code'], loop[1]['chain_code'])
+
+
+
+class RecordingHandler(NEFreader.ParseHandler):
+
+    def __init__(self):
+        self.events = []
+
+    def datablock(self, name):
+        self.events.append(('datablock', name))
+
+    def start_saveframe(self, name):
+        self.events.append(('start_saveframe', name))
+
+    def item(self, name, value):
+        self.events.append(('item', name, value))
+
+    def start_loop(self, category, columns):
+        self.events.append(('start_loop', category, list(columns)))
+
+    def row(self, values):
+        self.events.append(('row', list(values)))
+
+    def end_loop(self, category):
+        self.events.append(('end_loop', category))
+
+    def end_saveframe(self, name):
+        self.events.append(('end_saveframe', name))
+
+
+class Test_Parser_events(unittest.TestCase):
+
+    def setUp(self):
+        self.h = RecordingHandler()
+        self.p = NEFreader.Parser(handler=self.h)
+
+
+    def test_parse_events(self):
+        tokens = ['data_nef_my_nmr_project', '\n',
+                  'save_nef_molecular_system', '\n',
+                  '_nef_molecular_system.sf_category', 'nef_molecular_system', '\n',
+                  'loop_',
+                  '_nef_sequence.chain_code', '_nef_sequence.sequence_code',
+                  'A', '1',
+                  'A', '2',
+                  'stop_',
+                  'save_']
+
+        result = self.p.parse(tokens)
+
+        self.assertIsNone(result)
+        self.assertEqual(self.h.events,
+                         [('datablock', 'nef_my_nmr_project'),
+                          ('start_saveframe', 'nef_molecular_system'),
+                          ('item', 'sf_category', 'nef_molecular_system'),
+                          ('start_loop', 'nef_sequence', ['chain_code', 'sequence_code']),
+                          ('row', ['A', '1']),
+                          ('row', ['A', '2']),
+                          ('end_loop', 'nef_sequence'),
+                          ('end_saveframe', 'nef_molecular_system')])
+
+    def test_parse_events_partial_row_non_strict(self):
+        tokens = ['data_nef_my_nmr_project',
+                  'save_nef_molecular_system',
+                  'loop_',
+                  '_nef_sequence.chain_code', '_nef_sequence.sequence_code',
+                  'A', '1', 'A',
+                  'stop_',
+                  'save_']
+
+        self.p.strict = False
+        with patch('NEFreader.parser.logger'):
+            self.p.parse(tokens)
+
+        self.assertIn(('row', ['A']), self.h.events)
+
+    def test_parse_events_empty_loop(self):
+        tokens = ['data_nef_my_nmr_project',
+                  'save_nef_molecular_system',
+                  'loop_',
+                  '_nef_sequence.chain_code',
+                  'stop_',
+                  'save_']
+
+        self.p.parse(tokens)
+
+        self.assertEqual(self.h.events[2:4], [('start_loop', 'nef_sequence', ['chain_code']),
+                                              ('end_loop', 'nef_sequence')])
+
+    def test_load_events_match_target(self):
+        f_name = 'tests/test_files/Commented_Example.nef'
+        self.p.load(f_name)
+        nef = NEFreader.Nef.from_file(f_name)
+
+        saveframes = [e[1] for e in self.h.events if e[0] == 'start_saveframe']
+        rows = sum(1 for e in self.h.events if e[0] == 'row')
+        self.assertEqual(saveframes, list(nef.keys()))
+        self.assertEqual(rows, sum(len(v) for sf in nef.values() for v in sf.values()
+                                   if isinstance(v, list)))
+
+
+class Test_iter_tokens(unittest.TestCase):
+
+    def test_same_tokens_as_tokenize(self):
+        f_name = 'tests/test_files/Commented_Example.nef'
+        with open(f_name, 'r') as f:
+            text = f.read()
+        tokens = list(NEFreader.parser.iter_tokens(text.splitlines(True)))
+        self.assertEqual(tokens, NEFreader.Lexer().tokenize(text))
+
+    def test_read_chunks(self):
+        f_name = 'tests/test_files/Commented_Example.nef'
+        with open(f_name, 'r') as f:
+            text = f.read()
+            f.seek(0)
+            chunks = list(NEFreader.parser.read_chunks(f, 10))
+        self.assertEqual(''.join(chunks), text)
+        self.assertTrue(all(len(chunk) == 10 for chunk in chunks[:-1]))
+
+    def test_read_file_like(self):
+        f_name = 'tests/test_files/Commented_Example.nef'
+        with open(f_name, 'r') as f:
+            text = f.read()
+        with patch('NEFreader.parser.CHUNK_SIZE', 3):
+            target = NEFreader.Parser().read(io.StringIO(text))
+        self.assertEqual(target, NEFreader.Parser().read(text))
+
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
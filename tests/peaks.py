@@ -0,0 +1,165 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+
+import NEFreader
+from NEFreader.peaks import PeakMatcher, ShiftIndex, element
+
+
+SHIFTS = [('A', '1', 'ALA', 'H', '8.10'),
+          ('A', '1', 'ALA', 'N', '120.0'),
+          ('A', '2', 'GLY', 'H', '8.12'),
+          ('A', '2', 'GLY', 'N', '109.0'),
+          ('A', '3', 'SER', 'H', '7.50'),
+          ('A', '3', 'SER', 'N', '115.5'),
+          ('A', '3', 'SER', 'HA', '.')]
+
+
+def _shift_list():
+    columns = ('chain_code', 'sequence_code', 'residue_type', 'atom_name', 'value')
+    return OrderedDict([('sf_category', 'nef_chemical_shift_list'),
+                        ('nef_chemical_shift', [OrderedDict(zip(columns, shift))
+                                                for shift in SHIFTS])])
+
+
+def _spectrum(peaks):
+    dimensions = [OrderedDict([('dimension_id', '1'), ('axis_unit', 'ppm'), ('axis_code', '1H')]),
+                  OrderedDict([('dimension_id', '2'), ('axis_unit', 'ppm'), ('axis_code', '15N')])]
+    rows = []
+    for i, (h, n, atom_name) in enumerate(peaks, 1):
+        rows.append(OrderedDict([('ordinal', str(i)), ('peak_id', str(i)), ('height', '1.0'),
+                                 ('position_1', h), ('position_2', n),
+                                 ('atom_name_1', atom_name), ('atom_name_2', '.')]))
+    return OrderedDict([('sf_category', 'nef_nmr_spectrum'),
+                        ('chemical_shift_list', 'nef_chemical_shift_list_1'),
+                        ('nef_spectrum_dimension', dimensions),
+                        ('nef_peak', rows)])
+
+
+class Test_ShiftIndex(unittest.TestCase):
+
+    def test_element(self):
+        self.assertEqual(element('13C'), 'C')
+        self.assertEqual(element('1H'), 'H')
+
+    def test_sorted_leaves_out_null_values(self):
+        values, indices = ShiftIndex(_shift_list()).sorted('H')
+
+        np.testing.assert_array_equal(values, [7.5, 8.1, 8.12])
+        np.testing.assert_array_equal(indices, [4, 0, 2])
+
+    def test_candidates_closest_first(self):
+        candidates = ShiftIndex(_shift_list()).candidates('H', np.array([8.115, np.nan, 7.0]),
+                                                          0.04)
+
+        np.testing.assert_array_equal(candidates.peaks, [0, 0])
+        np.testing.assert_array_equal(candidates.shifts, [2, 0])
+        np.testing.assert_allclose(candidates.deviations, [0.005, -0.015])
+
+
+class Test_PeakMatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.spectrum = _spectrum([('8.105', '120.1', '.'),
+                                   ('8.118', '109.2', '.'),
+                                   ('7.50', '115.5', 'H'),
+                                   ('9.50', '130.0', '.')])
+
+
+    def test_unassigned_only(self):
+        matches = PeakMatcher(self.spectrum, _shift_list()).match()
+
+        self.assertEqual(matches.peak_ids, ['1', '2', '4'])
+        np.testing.assert_array_equal(matches.best(), [[0, 1], [2, 3], [-1, -1]])
+
+    def test_all_peaks(self):
+        matches = PeakMatcher(self.spectrum, _shift_list()).match(unassigned_only=False)
+
+        self.assertEqual(len(matches), 4)
+        np.testing.assert_array_equal(matches.best()[2], [4, 5])
+
+    def test_assignments(self):
+        matches = PeakMatcher(self.spectrum, _shift_list()).match()
+
+        h, n = matches.assignments(0)
+        self.assertEqual([a[:4] for a in h], [('A', '1', 'ALA', 'H'), ('A', '2', 'GLY', 'H')])
+        self.assertEqual([a[:4] for a in n], [('A', '1', 'ALA', 'N')])
+        self.assertAlmostEqual(n[0][4], -0.1)
+        self.assertEqual(matches.assignments(2), [[], []])
+
+    def test_tolerances(self):
+        matcher = PeakMatcher(self.spectrum, _shift_list(), tolerances={'15N': 0.05})
+        self.assertEqual(matcher.tolerances, [0.04, 0.05])
+        np.testing.assert_array_equal(matcher.match().best()[:, 1], [-1, -1, -1])
+
+        matcher = PeakMatcher(self.spectrum, _shift_list(), tolerances=[0.001, 0.5])
+        np.testing.assert_array_equal(matcher.match().best()[:, 0], [-1, -1, -1])
+
+        with self.assertRaises(ValueError):
+            PeakMatcher(self.spectrum, _shift_list(), tolerances=[0.1])
+
+    def test_columns(self):
+        rows = self.spectrum['nef_peak']
+        self.spectrum['nef_peak'] = OrderedDict((name, [row[name] for row in rows])
+                                                for name in rows[0])
+
+        matches = PeakMatcher(self.spectrum, _shift_list()).match()
+
+        np.testing.assert_array_equal(matches.best(), [[0, 1], [2, 3], [-1, -1]])
+
+    def test_folded_dimension(self):
+        h, dimension = self.spectrum['nef_spectrum_dimension']
+        h.update([('spectral_width', '.'), ('value_first_point', '.'), ('folding', 'none'),
+                  ('absolute_peak_positions', 'true')])
+        dimension.update([('spectral_width', '10.0'), ('value_first_point', '125.0'),
+                          ('folding', 'circular'), ('absolute_peak_positions', 'false')])
+        # In a window from 115 to 125, Gly N at 109.0 appears at 119.0, and the 130.0 of peak 4
+        #   at 120.0, where Ala N is
+        self.spectrum['nef_peak'][1]['position_2'] = '119.1'
+
+        matches = PeakMatcher(self.spectrum, _shift_list()).match()
+
+        np.testing.assert_array_equal(matches.best(), [[0, 1], [2, 3], [-1, 1]])
+        self.assertAlmostEqual(matches.assignments(1)[1][0][4], -0.1)
+
+        dimension['absolute_peak_positions'] = 'true'
+        matches = PeakMatcher(self.spectrum, _shift_list()).match()
+        np.testing.assert_array_equal(matches.best()[1], [2, -1])
+
+    def test_from_nef(self):
+        nef = NEFreader.Nef.from_file('tests/test_files/CCPN_2l9r_Paris_155.nef')
+
+        matcher = PeakMatcher.from_nef(nef, 'nef_nmr_spectrum_cnoe_raw')
+        matches = matcher.match()
+
+        self.assertEqual(matcher.axis_codes, ['1H', '13C', '1H'])
+        self.assertEqual(len(matches), len(nef['nef_nmr_spectrum_cnoe_raw']['nef_peak']))
+        self.assertIn(('A', '10', 'HIS', 'CA'), [a[:4] for a in matches.assignments(0)[1]])
+
+    def test_scales(self):
+        rng = np.random.RandomState(0)
+        shifts = [('A', str(i), 'ALA', 'H', '{:.3f}'.format(v))
+                  for i, v in enumerate(rng.uniform(6, 10, 2000))]
+        columns = ('chain_code', 'sequence_code', 'residue_type', 'atom_name', 'value')
+        shift_list = {'nef_chemical_shift': OrderedDict(zip(columns, zip(*shifts)))}
+        positions = rng.uniform(6, 10, 20000)
+        spectrum = {'nef_spectrum_dimension': {'dimension_id': ['1'], 'axis_code': ['1H']},
+                    'nef_peak': {'peak_id': [str(i) for i in range(len(positions))],
+                                 'position_1': ['{:.3f}'.format(p) for p in positions]}}
+
+        matches = PeakMatcher(spectrum, shift_list).match()
+
+        self.assertEqual(len(matches), len(positions))
+        values = np.array([float(s[4]) for s in shifts])
+        best = matches.best()[:, 0]
+        found = best >= 0
+        np.testing.assert_array_equal(np.abs(values[best[found]] - positions[found]) <= 0.0405,
+                                      True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import NEFreader
+from NEFreader.profiling import Stats
+
+
+class Test_profiling(unittest.TestCase):
+
+    def setUp(self):
+        self.f_name = 'tests/test_files/Commented_Example.nef'
+
+
+    def test_load_phases(self):
+        stats = Stats()
+        NEFreader.Nef.from_file(self.f_name, stats=stats)
+
+        self.assertEqual(list(stats.phases), ['read', 'tokenize', 'parse'])
+        self.assertEqual(stats.phases['read'].bytes, stats.phases['tokenize'].bytes)
+        self.assertGreater(stats.phases['tokenize'].tokens, 0)
+        self.assertEqual(stats.phases['tokenize'].tokens, stats.phases['parse'].tokens)
+        for record in stats.phases.values():
+            self.assertGreaterEqual(record.seconds, 0)
+
+    def test_saveframe_records(self):
+        stats = Stats()
+        nef = NEFreader.Nef.from_file(self.f_name, stats=stats)
+
+        self.assertEqual(list(stats.saveframes), list(nef.keys()))
+        record = stats.saveframes['nef_molecular_system']
+        self.assertEqual(record.loops['nef_sequence'],
+                         len(nef['nef_molecular_system']['nef_sequence']))
+        self.assertGreater(record.tokens, 0)
+        self.assertEqual(stats.phases['parse'].rows,
+                         sum(r.rows for r in stats.saveframes.values()))
+
+    def test_callback(self):
+        finished = []
+        stats = Stats(callback=lambda kind, record: finished.append((kind, record.name)))
+        NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef', stats=stats)
+
+        self.assertIn(('saveframe', 'nef_molecular_system'), finished)
+        self.assertEqual(finished[-1], ('phase', 'parse'))
+
+    def test_allocations(self):
+        stats = Stats(trace_allocations=True)
+        try:
+            NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef', stats=stats)
+        finally:
+            stats.stop()
+        self.assertGreater(stats.phases['tokenize'].peak_allocated, 0)
+        self.assertIsNotNone(stats.saveframes['nef_molecular_system'].allocated)
+
+    def test_peak_allocations_span_saveframes(self):
+        stats = Stats(trace_allocations=True)
+        try:
+            with stats.phase('outer') as outer:
+                block = bytearray(10 ** 7)
+                del block
+                stats.start_saveframe('inner')
+                stats.end_saveframe('inner')
+        finally:
+            stats.stop()
+        self.assertGreaterEqual(outer.peak_allocated, 10 ** 7)
+        self.assertLess(stats.saveframes['inner'].peak_allocated, 10 ** 7)
+
+    def test_save_phases(self):
+        nef = NEFreader.Nef.from_file('tests/test_files/CCPN_2l9r_Paris_155.nef')
+        stats = Stats()
+        directory = tempfile.mkdtemp()
+        try:
+            nef.save(os.path.join(directory, 'test.nef'), stats=stats)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(list(stats.phases), ['format', 'write'])
+        self.assertEqual(stats.phases['format'].bytes, stats.phases['write'].bytes)
+        self.assertEqual(list(stats.saveframes), list(nef.keys()))
+        self.assertGreater(stats.saveframes['nef_molecular_system'].bytes, 0)
+
+    def test_validation_phases(self):
+        nef = NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef')
+        stats = Stats()
+        NEFreader.Validator(nef).isValid(stats=stats)
+
+        self.assertIn('validate_datablock', stats.phases)
+        self.assertIn('validate_peak_lists', stats.phases)
+        self.assertEqual(len(stats.phases), 11)
+
+    def test_report(self):
+        stats = Stats()
+        NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef', stats=stats)
+        report = stats.report()
+        self.assertIn('tokenize', report)
+        self.assertIn('nef_molecular_system', report)
+        self.assertIn('phases', stats.as_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,417 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+
+import NEFreader
+from NEFreader.restraints import (AtomIndex, DistanceRestraints, DihedralRestraints,
+                                  RdcRestraints, dihedral_angles, float_column,
+                                  tensor_magnitude_and_rhombicity)
+
+
+ATOMS = [('A', '1', 'H'),
+         ('A', '2', 'HB1'),
+         ('A', '2', 'HB2'),
+         ('A', '2', 'HB3'),
+         ('A', '3', 'H'),
+         ('A', '3', 'HG12'),
+         ('A', '3', 'HG13')]
+
+
+def _row(restraint_id, atom_1, atom_2, lower='.', upper='.', target='.'):
+    row = OrderedDict([('ordinal', '0'), ('restraint_id', restraint_id)])
+    for n, (chain, sequence, name) in ((1, atom_1), (2, atom_2)):
+        row['chain_code_{}'.format(n)] = chain
+        row['sequence_code_{}'.format(n)] = sequence
+        row['residue_type_{}'.format(n)] = 'ALA'
+        row['atom_name_{}'.format(n)] = name
+    row['weight'] = '1.0'
+    row['target_value'] = target
+    row['lower_limit'] = lower
+    row['upper_limit'] = upper
+    return row
+
+
+def _saveframe(*rows):
+    return OrderedDict([('sf_category', 'nef_distance_restraint_list'),
+                        ('nef_distance_restraint', list(rows))])
+
+
+class Test_AtomIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.atoms = AtomIndex(ATOMS)
+
+
+    def test_exact(self):
+        self.assertEqual(self.atoms.resolve('A', 1, 'H'), [0])
+
+    def test_percent_wildcard(self):
+        self.assertEqual(self.atoms.resolve('A', '2', 'HB%'), [1, 2, 3])
+
+    def test_star_wildcard(self):
+        self.assertEqual(self.atoms.resolve('A', '3', 'H*'), [4, 5, 6])
+
+    def test_non_stereospecific(self):
+        self.assertEqual(self.atoms.resolve('A', '3', 'HGx%'), [5, 6])
+
+    def test_missing(self):
+        self.assertEqual(self.atoms.resolve('A', '4', 'H'), [])
+        self.assertEqual(self.atoms.resolve('A', '1', 'HA'), [])
+
+
+class Test_DistanceRestraints(unittest.TestCase):
+
+    def setUp(self):
+        self.coordinates = np.zeros((2, len(ATOMS), 3))
+        self.coordinates[:, :, 0] = np.arange(len(ATOMS))
+        self.coordinates[1, 4, 0] = 10.0
+
+
+    def test_single_pair_distance(self):
+        restraints = DistanceRestraints(_saveframe(_row('1', ATOMS[0], ATOMS[4])), ATOMS)
+
+        np.testing.assert_allclose(restraints.distances(self.coordinates), [[4.0], [10.0]])
+
+    def test_single_model(self):
+        restraints = DistanceRestraints(_saveframe(_row('1', ATOMS[0], ATOMS[4])), ATOMS)
+
+        np.testing.assert_allclose(restraints.distances(self.coordinates[0]), [[4.0]])
+
+    def test_ambiguous_rows_sum_r6(self):
+        restraints = DistanceRestraints(_saveframe(_row('1', ATOMS[0], ATOMS[1]),
+                                                   _row('2', ATOMS[0], ATOMS[4]),
+                                                   _row('1', ATOMS[0], ATOMS[2])), ATOMS)
+
+        expected = (1.0 ** -6 + 2.0 ** -6) ** (-1 / 6)
+        self.assertEqual(restraints.restraint_ids, ['1', '2'])
+        np.testing.assert_allclose(restraints.distances(self.coordinates)[0], [expected, 4.0])
+
+    def test_wildcard_sums_r6(self):
+        restraints = DistanceRestraints(_saveframe(_row('1', ('A', '1', 'H'), ('A', '2', 'HB%'))),
+                                        ATOMS)
+
+        expected = (1.0 ** -6 + 2.0 ** -6 + 3.0 ** -6) ** (-1 / 6)
+        np.testing.assert_allclose(restraints.distances(self.coordinates)[0], [expected])
+
+    def test_violations(self):
+        restraints = DistanceRestraints(
+            _saveframe(_row('1', ATOMS[0], ATOMS[4], lower='1.8', upper='5.0'),
+                       _row('2', ATOMS[0], ATOMS[1], lower='1.8', upper='5.0'),
+                       _row('3', ATOMS[0], ATOMS[4], upper='6.0')), ATOMS)
+
+        np.testing.assert_allclose(restraints.violations(self.coordinates),
+                                   [[0.0, 0.8, 0.0], [5.0, 0.8, 4.0]])
+
+    def test_report(self):
+        restraints = DistanceRestraints(
+            _saveframe(_row('1', ATOMS[0], ATOMS[4], lower='1.8', upper='5.0'),
+                       _row('2', ATOMS[0], ATOMS[1], lower='1.8', upper='5.0')), ATOMS)
+
+        report = restraints.evaluate(self.coordinates, threshold=0.5)
+
+        np.testing.assert_allclose(report.model_max, [0.8, 5.0])
+        np.testing.assert_allclose(report.model_rms, [np.sqrt(0.32), np.sqrt(12.82)])
+        self.assertEqual(list(report.model_count), [1, 2])
+        np.testing.assert_allclose(report.restraint_mean, [2.5, 0.8])
+        self.assertEqual(list(report.restraint_count), [1, 2])
+        self.assertEqual(report.violated(), ['1', '2'])
+        self.assertEqual(report.violated(models=2), ['2'])
+
+    def test_missing_atom(self):
+        saveframe = _saveframe(_row('1', ATOMS[0], ('A', '9', 'H')),
+                               _row('2', ATOMS[0], ATOMS[4]))
+
+        with self.assertRaises(KeyError):
+            DistanceRestraints(saveframe, ATOMS)
+
+        restraints = DistanceRestraints(saveframe, ATOMS, skip_missing=True)
+        self.assertEqual(restraints.restraint_ids, ['2'])
+        self.assertEqual(restraints.missing, ['1'])
+
+    def test_atom_count_mismatch(self):
+        restraints = DistanceRestraints(_saveframe(_row('1', ATOMS[0], ATOMS[4])), ATOMS)
+
+        with self.assertRaises(ValueError):
+            restraints.distances(np.zeros((1, 3, 3)))
+
+    def test_empty(self):
+        restraints = DistanceRestraints(_saveframe(), ATOMS)
+
+        report = restraints.evaluate(self.coordinates)
+        self.assertEqual(report.violations.shape, (2, 0))
+        self.assertEqual(report.violated(), [])
+
+    def test_commented_example(self):
+        nef = NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef')
+        saveframe = [v for v in nef.values()
+                     if v.get('sf_category') == 'nef_distance_restraint_list'][0]
+        atoms = [('A', '21', 'HB1'), ('A', '21', 'HB2'), ('A', '21', 'HB3'),
+                 ('A', '17', 'H'), ('A', '18', 'H')]
+
+        restraints = DistanceRestraints(saveframe, atoms, skip_missing=True)
+
+        self.assertEqual(restraints.restraint_ids, ['1'])
+        self.assertEqual(len(restraints.first), 6)
+        np.testing.assert_allclose(restraints.upper, [4.2])
+
+
+DIHEDRAL_ATOMS = [('A', '1', 'C'), ('A', '2', 'N'), ('A', '2', 'CA'), ('A', '2', 'C'),
+                  ('A', '3', 'N')]
+
+
+def _dihedral_row(restraint_id, atoms, lower='.', upper='.', target='.', uncertainty='.',
+                  combination='.'):
+    row = OrderedDict([('ordinal', '0'), ('restraint_id', restraint_id),
+                       ('restraint_combination_id', combination)])
+    for n, (chain, sequence, name) in enumerate(atoms, 1):
+        row['chain_code_{}'.format(n)] = chain
+        row['sequence_code_{}'.format(n)] = sequence
+        row['residue_type_{}'.format(n)] = 'ALA'
+        row['atom_name_{}'.format(n)] = name
+    row['weight'] = '1.0'
+    row['target_value'] = target
+    row['target_value_uncertainty'] = uncertainty
+    row['lower_limit'] = lower
+    row['upper_limit'] = upper
+    return row
+
+
+def _dihedral_saveframe(*rows):
+    return OrderedDict([('sf_category', 'nef_dihedral_restraint_list'),
+                        ('nef_dihedral_restraint', list(rows))])
+
+
+def _backbone(phi, psi=180.0):
+    """
+    Positions of DIHEDRAL_ATOMS with the C-N-CA-C dihedral at phi and N-CA-C-N at psi.
+    """
+    phi, psi = np.radians(phi), np.radians(psi)
+    return np.array([[np.cos(phi), -np.sin(phi), 0.0],
+                     [0.0, 0.0, 0.0],
+                     [0.0, 0.0, 1.0],
+                     [1.0, 0.0, 1.0],
+                     [1.0, np.sin(psi), 1.0 - np.cos(psi)]])
+
+
+class Test_dihedral_angles(unittest.TestCase):
+
+    def test_cis_trans_and_sign(self):
+        coordinates = np.array([[[1.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 1.0],
+                                 [1.0, 0.0, 1.0], [-1.0, 0.0, 1.0], [0.0, 1.0, 1.0]]])
+        angles = dihedral_angles(coordinates, np.array([0, 0, 0]), np.array([1, 1, 1]),
+                                 np.array([2, 2, 2]), np.array([3, 4, 5]))
+
+        np.testing.assert_allclose(angles, [[0.0, 180.0, 90.0]], atol=1e-9)
+
+
+class Test_DihedralRestraints(unittest.TestCase):
+
+    def setUp(self):
+        self.phi = DIHEDRAL_ATOMS[:4]
+        self.psi = DIHEDRAL_ATOMS[1:]
+        self.coordinates = np.array([_backbone(phi) for phi in (-60.0, 175.0, 90.0)])
+
+
+    def test_angles(self):
+        restraints = DihedralRestraints(_dihedral_saveframe(
+            _dihedral_row('1', self.phi, '-70', '-50'),
+            _dihedral_row('2', self.psi, '-10', '10')), DIHEDRAL_ATOMS)
+
+        np.testing.assert_allclose(np.mod(restraints.angles(self.coordinates), 360.0),
+                                   [[300.0, 180.0], [175.0, 180.0], [90.0, 180.0]], atol=1e-9)
+
+    def test_violations_wrap_around(self):
+        restraints = DihedralRestraints(_dihedral_saveframe(
+            _dihedral_row('1', self.phi, '-70', '-50'),
+            _dihedral_row('2', self.phi, '170', '-170'),
+            _dihedral_row('3', self.phi, target='-175', uncertainty='5')), DIHEDRAL_ATOMS)
+
+        np.testing.assert_allclose(restraints.violations(self.coordinates),
+                                   [[0.0, 110.0, 110.0],
+                                    [115.0, 0.0, 5.0],
+                                    [140.0, 80.0, 90.0]], atol=1e-9)
+
+    def test_alternatives_and_combinations(self):
+        restraints = DihedralRestraints(_dihedral_saveframe(
+            _dihedral_row('1', self.phi, '-70', '-50'),
+            _dihedral_row('1', self.phi, '80', '100'),
+            _dihedral_row('2', self.phi, '-70', '-50', combination='1'),
+            _dihedral_row('2', self.psi, '170', '-170', combination='1'),
+            _dihedral_row('2', self.phi, '80', '100', combination='2'),
+            _dihedral_row('2', self.psi, '-10', '10', combination='2')), DIHEDRAL_ATOMS)
+
+        violations = restraints.violations(self.coordinates)
+
+        self.assertEqual(restraints.restraint_ids, ['1', '2'])
+        np.testing.assert_allclose(violations[:, 0], [0.0, 75.0, 0.0], atol=1e-9)
+        np.testing.assert_allclose(violations[:, 1], [0.0, 115.0, 140.0], atol=1e-9)
+
+    def test_report(self):
+        restraints = DihedralRestraints(_dihedral_saveframe(
+            _dihedral_row('1', self.phi, '-70', '-50')), DIHEDRAL_ATOMS)
+
+        report = restraints.evaluate(self.coordinates, threshold=5.0)
+
+        self.assertIsNone(report.values)
+        self.assertEqual(list(report.model_count), [0, 1, 1])
+        self.assertEqual(report.violated(models=2), ['1'])
+
+    def test_wildcard_is_missing(self):
+        saveframe = _dihedral_saveframe(
+            _dihedral_row('1', [('A', '1', 'C'), ('A', '2', '*'), ('A', '2', 'CA'),
+                                ('A', '2', 'C')], '-70', '-50'),
+            _dihedral_row('2', self.phi, '-70', '-50'))
+
+        with self.assertRaises(KeyError):
+            DihedralRestraints(saveframe, DIHEDRAL_ATOMS)
+
+        restraints = DihedralRestraints(saveframe, DIHEDRAL_ATOMS, skip_missing=True)
+        self.assertEqual(restraints.restraint_ids, ['2'])
+        self.assertEqual(restraints.missing, ['1'])
+
+    def test_commented_example(self):
+        nef = NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef')
+        saveframe = [v for v in nef.values()
+                     if v.get('sf_category') == 'nef_dihedral_restraint_list'][0]
+        atoms = [('A', '15', 'C'), ('A', '16', 'N'), ('A', '16', 'CA'), ('A', '16', 'C'),
+                 ('A', '17', 'N')]
+
+        restraints = DihedralRestraints(saveframe, atoms, skip_missing=True)
+        coordinates = _backbone(-80.0, 155.0)
+
+        self.assertEqual(restraints.restraint_ids, ['4'])
+        np.testing.assert_allclose(restraints.angles(coordinates), [[-80.0, 155.0] * 2],
+                                   atol=1e-9)
+        np.testing.assert_allclose(restraints.violations(coordinates), [[0.0]], atol=1e-9)
+        np.testing.assert_allclose(restraints.violations(_backbone(-50.0, 105.0)), [[0.0]],
+                                   atol=1e-9)
+        np.testing.assert_allclose(restraints.violations(_backbone(-50.0, 155.0)), [[20.0]],
+                                   atol=1e-9)
+
+
+def _rdc_saveframe(couplings, scale='1.0', distance_dependent='false'):
+    rows = []
+    for i, coupling in enumerate(couplings):
+        rows.append(OrderedDict([('ordinal', str(i + 1)), ('restraint_id', str(i + 1)),
+                                 ('chain_code_1', 'A'), ('sequence_code_1', str(i + 1)),
+                                 ('atom_name_1', 'N'),
+                                 ('chain_code_2', 'A'), ('sequence_code_2', str(i + 1)),
+                                 ('atom_name_2', 'H'),
+                                 ('weight', '1.0'), ('target_value', coupling),
+                                 ('scale', scale), ('distance_dependent', distance_dependent)]))
+    return OrderedDict([('sf_category', 'nef_rdc_restraint_list'),
+                        ('tensor_magnitude', '11.0'), ('tensor_rhombicity', '.'),
+                        ('nef_rdc_restraint', rows)])
+
+
+class Test_RdcRestraints(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(7)
+        self.residues = 30
+        self.atoms = [('A', str(i + 1), name) for i in range(self.residues) for name in ('N', 'H')]
+        # Two models with different random N-H bond vectors of length 1.02
+        directions = rng.normal(size=(2, self.residues, 3))
+        directions /= np.linalg.norm(directions, axis=-1, keepdims=True)
+        nitrogens = rng.normal(scale=10.0, size=(2, self.residues, 3))
+        self.coordinates = np.empty((2, 2 * self.residues, 3))
+        self.coordinates[:, 0::2] = nitrogens
+        self.coordinates[:, 1::2] = nitrogens + 1.02 * directions
+        # Diagonal Saupe matrix with Da 10 and R 0.3
+        self.saupe = np.diag([-10.0 * (1 + 1.5 * 0.3), -10.0 * (1 - 1.5 * 0.3), 20.0])
+        rotation = np.linalg.qr(rng.normal(size=(3, 3)))[0]
+        self.saupe = rotation.dot(self.saupe).dot(rotation.T)
+        self.couplings = np.einsum('ri,ij,rj->r', directions[0], self.saupe, directions[0])
+
+
+    def test_recovers_tensor(self):
+        restraints = RdcRestraints(_rdc_saveframe(['{:.6f}'.format(c) for c in self.couplings]),
+                                   self.atoms)
+
+        fit = restraints.fit(self.coordinates)
+
+        self.assertEqual(len(restraints), self.residues)
+        self.assertEqual(restraints.magnitude, 11.0)
+        self.assertIsNone(restraints.rhombicity)
+        self.assertAlmostEqual(fit.q_factors[0], 0.0, places=5)
+        self.assertGreater(fit.q_factors[1], 0.1)
+        np.testing.assert_allclose(fit.saupe[0], self.saupe, atol=1e-4)
+        self.assertAlmostEqual(fit.magnitude[0], 10.0, places=4)
+        self.assertAlmostEqual(fit.rhombicity[0], 0.3, places=4)
+        np.testing.assert_allclose(fit.calculated[0], self.couplings, atol=1e-4)
+
+    def test_back_calculate(self):
+        restraints = RdcRestraints(_rdc_saveframe(['0.0'] * self.residues), self.atoms)
+
+        np.testing.assert_allclose(restraints.back_calculate(self.coordinates, self.saupe)[0],
+                                   self.couplings)
+        np.testing.assert_allclose(
+            restraints.back_calculate(self.coordinates, np.array([self.saupe] * 2))[0],
+            self.couplings)
+
+    def test_scale_and_distance_dependence(self):
+        restraints = RdcRestraints(_rdc_saveframe(['0.0'] * self.residues, scale='2.0',
+                                                  distance_dependent='true'), self.atoms)
+
+        np.testing.assert_allclose(restraints.back_calculate(self.coordinates, self.saupe)[0],
+                                   2.0 * self.couplings / 1.02 ** 3)
+
+    def test_columns(self):
+        saveframe = _rdc_saveframe(['{:.6f}'.format(c) for c in self.couplings])
+        rows = saveframe['nef_rdc_restraint']
+        columns = OrderedDict((name, [row[name] for row in rows]) for name in rows[0])
+        saveframe['nef_rdc_restraint'] = columns
+
+        fit = RdcRestraints(saveframe, self.atoms).fit(self.coordinates)
+
+        self.assertAlmostEqual(fit.q_factors[0], 0.0, places=5)
+
+    def test_rows_without_target_left_out(self):
+        couplings = ['{:.6f}'.format(c) for c in self.couplings]
+        couplings[3] = '.'
+
+        restraints = RdcRestraints(_rdc_saveframe(couplings), self.atoms)
+
+        self.assertEqual(len(restraints), self.residues - 1)
+        self.assertNotIn('4', restraints.restraint_ids)
+        self.assertEqual(len(restraints.first), self.residues - 1)
+
+    def test_too_few_restraints(self):
+        restraints = RdcRestraints(_rdc_saveframe(['1.0'] * 4), self.atoms)
+
+        with self.assertRaises(ValueError):
+            restraints.fit(self.coordinates)
+
+    def test_commented_example(self):
+        nef = NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef')
+        saveframe = nef['nef_rdc_restraint_list_1']
+        atoms = [('A', '21', 'H'), ('A', '21', 'N'), ('A', '22', 'H'), ('A', '22', 'N')]
+
+        restraints = RdcRestraints(saveframe, atoms)
+
+        self.assertEqual(restraints.restraint_ids, ['1', '2'])
+        np.testing.assert_allclose(restraints.observed, [-5.2, 3.1])
+        self.assertEqual(restraints.magnitude, 11.0)
+        self.assertAlmostEqual(restraints.rhombicity, 0.067)
+
+
+class Test_helpers(unittest.TestCase):
+
+    def test_float_column(self):
+        np.testing.assert_array_equal(float_column(['1.5', '.', '?', '-2'], 4),
+                                      [1.5, np.nan, np.nan, -2.0])
+        np.testing.assert_array_equal(float_column(None, 2, 1.0), [1.0, 1.0])
+
+    def test_magnitude_and_rhombicity_of_axial_tensor(self):
+        magnitude, rhombicity = tensor_magnitude_and_rhombicity(np.diag([-1.0, -1.0, 2.0]))
+
+        self.assertAlmostEqual(magnitude, 1.0)
+        self.assertAlmostEqual(rhombicity, 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import pickle
+import unittest
+
+import NEFreader
+from NEFreader import writer
+from NEFreader.saveframe import Saveframe
+
+
+class Test_saveframe_mapping(unittest.TestCase):
+
+    def setUp(self):
+        self.sf = Saveframe('nef_chemical_shift_list_1')
+        self.sf['atom_chem_shift_units'] = 'ppm'
+        self.sf['nef_chemical_shift'] = []
+        self.sf['sf_framecode'] = 'nef_chemical_shift_list_1'
+        self.sf['sf_category'] = 'nef_chemical_shift_list'
+
+
+    def test_metadata_slots(self):
+        self.assertEqual(self.sf.name, 'nef_chemical_shift_list_1')
+        self.assertEqual(self.sf.category, 'nef_chemical_shift_list')
+        self.assertEqual(self.sf.framecode, 'nef_chemical_shift_list_1')
+        self.assertFalse(hasattr(self.sf, '__dict__'))
+
+    def test_key_order(self):
+        self.assertEqual(list(self.sf.keys()), ['sf_category', 'sf_framecode',
+                                                'atom_chem_shift_units', 'nef_chemical_shift'])
+
+    def test_items_and_loops_are_separated(self):
+        self.assertEqual(list(self.sf.fields), ['atom_chem_shift_units'])
+        self.assertEqual(list(self.sf.loops), ['nef_chemical_shift'])
+
+    def test_replacing_item_with_loop(self):
+        self.sf['atom_chem_shift_units'] = []
+        self.assertNotIn('atom_chem_shift_units', self.sf.fields)
+        self.assertEqual(self.sf['atom_chem_shift_units'], [])
+        self.assertEqual(len(self.sf), 4)
+
+    def test_delete(self):
+        del self.sf['sf_category']
+        self.assertNotIn('sf_category', self.sf)
+        with self.assertRaises(KeyError):
+            self.sf['sf_category']
+        with self.assertRaises(KeyError):
+            del self.sf['sf_category']
+
+    def test_equal_to_dict(self):
+        self.assertEqual(self.sf, dict(self.sf.items()))
+
+    def test_pickle(self):
+        restored = pickle.loads(pickle.dumps(self.sf))
+        self.assertEqual(restored, self.sf)
+        self.assertEqual(restored.name, self.sf.name)
+
+
+class Test_compact_parsing(unittest.TestCase):
+
+    def setUp(self):
+        f_name = 'tests/test_files/Commented_Example.nef'
+        self.nef = NEFreader.Nef.from_file(f_name)
+        self.compact = NEFreader.Nef.from_file(f_name, compact=True)
+
+
+    def test_saveframes_are_compact(self):
+        for name, saveframe in self.compact.items():
+            self.assertIsInstance(saveframe, Saveframe)
+            self.assertEqual(saveframe.name, name)
+
+    def test_same_content(self):
+        self.assertEqual(list(self.compact.keys()), list(self.nef.keys()))
+        for name in self.nef:
+            self.assertEqual(self.compact[name], self.nef[name])
+
+    def test_same_validation(self):
+        v = NEFreader.Validator()
+        compact_valid = v.isValid(self.compact)
+        compact_errors = v.validation_errors
+
+        self.assertEqual(compact_valid, v.isValid(self.nef))
+        self.assertEqual(compact_errors, v.validation_errors)
+
+    def test_same_text(self):
+        for name in ('nef_molecular_system', 'nef_chemical_shift_list_1',
+                     'nef_nmr_spectrum_cnoesy1'):
+            self.assertEqual(writer._saveframeText(self.compact, name),
+                             writer._saveframeText(self.nef, name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+
+import NEFreader
+from NEFreader.shifts import ShiftStatistics, outliers, reference_table, shift_lists
+
+
+def _shift_list(shifts, name='nef_chemical_shift_list_1'):
+    columns = ('chain_code', 'sequence_code', 'residue_type', 'atom_name', 'value')
+    return OrderedDict([('sf_category', 'nef_chemical_shift_list'),
+                        ('sf_framecode', name),
+                        ('nef_chemical_shift', [OrderedDict(zip(columns, shift))
+                                                for shift in shifts])])
+
+
+FIRST = [('A', '1', 'ALA', 'CA', '52.0'),
+         ('A', '2', 'ALA', 'CA', '54.0'),
+         ('A', '3', 'GLY', 'CA', '45.0'),
+         ('A', '3', 'GLY', 'HA2', '.')]
+SECOND = [('A', '1', 'ALA', 'CA', '56.0'),
+          ('A', '2', 'SER', 'CB', '64.0'),
+          ('A', '3', 'GLY', 'CA', '46.0')]
+
+
+class Test_ShiftStatistics(unittest.TestCase):
+
+    def test_single_list(self):
+        statistics = ShiftStatistics()
+        statistics.add(_shift_list(FIRST))
+
+        table = statistics.table()
+        self.assertEqual(list(table), [('ALA', 'CA'), ('GLY', 'CA')])
+        self.assertEqual(table[('ALA', 'CA')][:2], (2, 53.0))
+        self.assertAlmostEqual(table[('ALA', 'CA')][2], np.sqrt(2.0))
+        self.assertTrue(np.isnan(table[('GLY', 'CA')][2]))
+
+    def test_incremental_matches_all_at_once(self):
+        incremental = ShiftStatistics()
+        incremental.add(_shift_list(FIRST))
+        incremental.add(_shift_list(SECOND))
+        at_once = ShiftStatistics()
+        at_once.add(_shift_list(FIRST + SECOND))
+
+        self.assertEqual(list(incremental.table()), list(at_once.table()))
+        for key, (count, mean, sd) in at_once.table().items():
+            self.assertEqual(incremental.table()[key][0], count)
+            self.assertAlmostEqual(incremental.table()[key][1], mean)
+            np.testing.assert_allclose(incremental.table()[key][2], sd)
+        self.assertAlmostEqual(at_once.table()[('ALA', 'CA')][1], 54.0)
+        self.assertAlmostEqual(at_once.table()[('ALA', 'CA')][2], 2.0)
+
+    def test_merge(self):
+        first = ShiftStatistics()
+        first.add(_shift_list(FIRST))
+        second = ShiftStatistics()
+        second.add(_shift_list(SECOND))
+
+        first.merge(second)
+        first.merge(ShiftStatistics())
+
+        self.assertEqual(first.table()[('ALA', 'CA')][0], 3)
+        self.assertAlmostEqual(first.table()[('GLY', 'CA')][2], np.sqrt(0.5))
+        self.assertEqual(first.table(minimum_count=2).keys(),
+                         OrderedDict.fromkeys([('ALA', 'CA'), ('GLY', 'CA')]).keys())
+
+    def test_large_batch(self):
+        rng = np.random.RandomState(5)
+        values = rng.normal(50.0, 2.0, 100000)
+        residue_types = rng.choice(['ALA', 'GLY', 'SER'], len(values))
+
+        statistics = ShiftStatistics()
+        for start in range(0, len(values), 30000):
+            statistics.add_values(residue_types[start:start + 30000], ['CA'] * 30000,
+                                  values[start:start + 30000])
+
+        for residue_type in ('ALA', 'GLY', 'SER'):
+            selected = values[residue_types == residue_type]
+            count, mean, sd = statistics.table()[(residue_type, 'CA')]
+            self.assertEqual(count, len(selected))
+            self.assertAlmostEqual(mean, selected.mean())
+            self.assertAlmostEqual(sd, selected.std(ddof=1))
+
+    def test_nef(self):
+        nef = NEFreader.Nef.from_file('tests/test_files/CCPN_2l9r_Paris_155.nef')
+        shift_list = nef['nef_chemical_shift_list_bmrb21.str']
+
+        statistics = ShiftStatistics()
+        statistics.add(nef)
+
+        self.assertEqual(list(shift_lists(nef)), [shift_list])
+        self.assertEqual(sum(statistics.count), len(shift_list['nef_chemical_shift']))
+
+
+class Test_outliers(unittest.TestCase):
+
+    def test_reference_table(self):
+        table = reference_table()
+
+        self.assertEqual(table[('ALA', 'CA')], (53.1, 2.0))
+        self.assertNotIn(('PRO', 'H'), table)
+
+    def test_flags_against_reference(self):
+        shift_list = _shift_list([('A', '1', 'ALA', 'CA', '53.0'),
+                                  ('A', '2', 'ALA', 'CA', '70.0'),
+                                  ('A', '3', 'GLY', 'CA', '20.0'),
+                                  ('A', '4', 'XXX', 'CA', '999.0'),
+                                  ('A', '5', 'ALA', 'CA', '.')])
+
+        found = outliers(shift_list)
+
+        self.assertEqual([(o.sequence_code, o.atom_name) for o in found],
+                         [('3', 'CA'), ('2', 'CA')])
+        self.assertAlmostEqual(found[1].z, (70.0 - 53.1) / 2.0)
+        self.assertEqual(found[1].expected, 53.1)
+
+    def test_flags_against_statistics(self):
+        statistics = ShiftStatistics()
+        statistics.add_values(['ALA'] * 20, ['CA'] * 20, np.linspace(50.0, 52.0, 20))
+
+        found = outliers(_shift_list([('A', '1', 'ALA', 'CA', '54.0')]), statistics)
+        self.assertEqual(len(found), 1)
+        self.assertEqual(outliers(_shift_list([('A', '1', 'ALA', 'CA', '54.0')]), statistics,
+                                  minimum_count=21), [])
+
+    def test_paris_has_no_gross_outliers(self):
+        nef = NEFreader.Nef.from_file('tests/test_files/CCPN_2l9r_Paris_155.nef')
+
+        self.assertEqual(outliers(nef, threshold=6.0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
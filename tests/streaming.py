@@ -0,0 +1,128 @@
+from __future__ import absolute_import, print_function, unicode_literals
+__author__ = 'TJ Ragan'
+
+import os
+import shutil
+import tempfile
+import unittest
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+import NEFreader
+from NEFreader.streaming import index_file
+
+
+class Test_iter_loop(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.f_name = 'tests/test_files/CCPN_2l9r_Paris_155.nef'
+        cls.nef = NEFreader.Nef.from_file(cls.f_name)
+        cls.saveframe = [k for k, v in cls.nef.items() if 'nef_peak' in v][-1]
+        cls.rows = cls.nef[cls.saveframe]['nef_peak']
+
+
+    def test_rows_match_parsed_loop(self):
+        rows = [row for batch in NEFreader.iter_loop(self.f_name, self.saveframe, 'nef_peak')
+                for row in batch]
+
+        self.assertEqual(len(rows), len(self.rows))
+        for row, expected in zip(rows, self.rows):
+            self.assertEqual(row._asdict(), dict(expected))
+
+    def test_batch_sizes(self):
+        batches = list(NEFreader.iter_loop(self.f_name, self.saveframe, 'nef_peak',
+                                           batch_size=7))
+
+        self.assertTrue(all(len(batch) == 7 for batch in batches[:-1]))
+        self.assertTrue(0 < len(batches[-1]) <= 7)
+        self.assertEqual(sum(len(batch) for batch in batches), len(self.rows))
+
+    def test_batch_sizes_with_small_feeds(self):
+        with patch('NEFreader.streaming.TOKENS_PER_FEED', 5):
+            batches = list(NEFreader.iter_loop(self.f_name, self.saveframe, 'nef_peak',
+                                               batch_size=7))
+
+        self.assertTrue(all(len(batch) == 7 for batch in batches[:-1]))
+        self.assertEqual(sum(len(batch) for batch in batches), len(self.rows))
+
+    def test_as_columns(self):
+        batch = next(NEFreader.iter_loop(self.f_name, self.saveframe, 'nef_peak', batch_size=3,
+                                         as_columns=True))
+
+        self.assertEqual(list(batch.keys()), list(self.rows[0].keys()))
+        self.assertEqual(batch['peak_id'], [row['peak_id'] for row in self.rows[:3]])
+
+    def test_missing_saveframe(self):
+        with self.assertRaises(KeyError):
+            list(NEFreader.iter_loop(self.f_name, 'no_such_saveframe', 'nef_peak'))
+
+    def test_missing_loop(self):
+        with self.assertRaises(KeyError):
+            list(NEFreader.iter_loop(self.f_name, self.saveframe, 'no_such_loop'))
+
+    def test_saveframe_after_semicolon_value(self):
+        f_name = 'tests/test_files/Commented_Example.nef'
+        nef = NEFreader.Nef.from_file(f_name)
+        rows = [row for batch in NEFreader.iter_loop(f_name, 'nef_chemical_shift_list_1',
+                                                     'nef_chemical_shift')
+                for row in batch]
+
+        self.assertEqual([row._asdict() for row in rows],
+                         [dict(row) for row in nef['nef_chemical_shift_list_1']
+                                                  ['nef_chemical_shift']])
+
+
+class Test_index_file(unittest.TestCase):
+
+    def test_matches_parsed_file(self):
+        for f_name in ('tests/test_files/Commented_Example.nef',
+                       'tests/test_files/CCPN_2l9r_Paris_155.nef'):
+            nef = NEFreader.Nef.from_file(f_name)
+            datablock, saveframes = index_file(f_name)
+
+            self.assertEqual(datablock, nef.datablock)
+            self.assertEqual(list(saveframes), list(nef))
+            for name, saveframe in nef.items():
+                summary = saveframes[name]
+                self.assertEqual(summary.category, saveframe['sf_category'])
+                loops = [(k, v) for k, v in saveframe.items() if isinstance(v, list)]
+                self.assertEqual([(k, len(v)) for k, v in loops],
+                                 [(k, loop.rows) for k, loop in summary.loops.items()])
+                self.assertEqual([tuple(v[0]) for k, v in loops if v],
+                                 [loop.columns for loop in summary.loops.values() if loop.rows])
+
+    def test_quoted_and_semicolon_values(self):
+        text = ('data_test\n'
+                'save_nef_nmr_meta_data\n'
+                '  _nef_nmr_meta_data.sf_category nef_nmr_meta_data\n'
+                '  loop_\n'
+                '    _nef_program_script.program_name\n'
+                '    _nef_program_script.script_name\n'
+                '    CYANA "stop_ save_"\n'
+                '    XPLOR\n'
+                ';\nloop_ _not.a_column\nstop_\n;\n'
+                '    ARIA \'_a\' # comment _x\n'
+                '  stop_\n'
+                'save_\n')
+        directory = tempfile.mkdtemp()
+        try:
+            f_name = os.path.join(directory, 'test.nef')
+            with open(f_name, 'w') as f:
+                f.write(text)
+            datablock, saveframes = index_file(f_name)
+        finally:
+            shutil.rmtree(directory)
+
+        summary = saveframes['nef_nmr_meta_data']
+        self.assertEqual(datablock, 'test')
+        self.assertEqual(summary.category, 'nef_nmr_meta_data')
+        self.assertEqual(summary.line, 2)
+        self.assertEqual(summary.loops['nef_program_script'],
+                         (('program_name', 'script_name'), 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
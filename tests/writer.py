@@ -2,6 +2,7 @@ from __future__ import unicode_literals, print_function, absolute_import, divisi
 
 __author__ = 'TJ Ragan'
 
+import io
 import unittest
 
 from collections import OrderedDict
@@ -39,6 +40,11 @@ class Test_nef_write_functions( unittest.TestCase ):
         self.assertEqual('_nef_nmr_meta_data.sf_category',
                          writer._dataLabelText(self.nef['nef_nmr_meta_data'], 'sf_category'))
 
+    def test_dataLabel_uses_category(self):
+        self.assertEqual('_nef_chemical_shift_list.atom_chem_shift_units',
+                         writer._dataLabelText(self.nef['nef_chemical_shift_list_1'],
+                                               'atom_chem_shift_units'))
+
     def test_dataValue(self):
         self.assertEqual('nef_nmr_meta_data',
                          writer._dataValueText(self.nef['nef_nmr_meta_data'], 'sf_category'))
@@ -125,8 +131,111 @@ class Test_nef_write_functions( unittest.TestCase ):
         nef_text = writer.nefToText(self.populatedNef)
         # TODO: add tests here
 
+    def test_nef_to_text_quotes_every_field(self):
+        sequence = self.populatedNef['nef_molecular_system']['nef_sequence']
+        sequence[0]['name_1'] = 'say"hi"'
+        sequence[0]['name'] = "it's"
+
+        read_back = NEFreader.Nef.from_text(writer.nefToText(self.populatedNef))
+
+        self.assertEqual(read_back['nef_molecular_system']['nef_sequence'], sequence)
+
     # TODO: add tests for multiline comments
     # TODO: add functionality for multilevel quotes
 
+class Test_canonical(unittest.TestCase):
+
+    def setUp(self):
+        self.nef = NEFreader.Nef.from_file('tests/test_files/Commented_Example.nef')
+        self.metadata = {'creation_date': '2016-01-01T00:00:00'}
+
+    def canonical(self, nef):
+        text = io.StringIO()
+        nef.write(text, canonical=True, metadata=self.metadata)
+        return text.getvalue()
+
+
+    def test_order_independent(self):
+        shuffled = NEFreader.Nef.empty()
+        shuffled.datablock = self.nef.datablock
+        for name in reversed(self.nef):
+            saveframe = OrderedDict()
+            for key, value in reversed(self.nef[name].items()):
+                if isinstance(value, list):
+                    value = [OrderedDict(reversed(row.items())) for row in value]
+                saveframe[key] = value
+            shuffled[name] = saveframe
+
+        self.assertEqual(self.canonical(shuffled), self.canonical(self.nef))
+
+    def test_reproducible(self):
+        text = self.canonical(self.nef)
+        read_back = NEFreader.Nef.from_text(text)
+
+        self.assertEqual(self.canonical(read_back), text)
+        self.assertIn('_nef_nmr_meta_data.uuid\tCYANA-2016-01-01T00:00:00-{}\n'
+                      .format(self.nef.content_digest()[:16]), text)
+        for name in self.nef:
+            self.assertEqual(read_back.saveframe_digest(name),
+                             self.nef.saveframe_digest(name, recompute=True))
+
+    def test_chunks(self):
+        self.nef._update_metadata(self.metadata)
+
+        self.assertEqual(''.join(writer.nefTextChunks(self.nef, rowsPerChunk=2, canonical=True)),
+                         writer.nefToText(self.nef, canonical=True))
+
+    def test_ordering(self):
+        text = self.canonical(self.nef)
+
+        self.assertLess(text.index('save_nef_chemical_shift_list_1'),
+                        text.index('save_nef_distance_restraint_list_L1'))
+        self.assertLess(text.index('save_nef_nmr_spectrum_cnoesy1'),
+                        text.index('save_nef_nmr_spectrum_dummy15d'))
+        self.assertIn('  _nef_chemical_shift_list.sf_category\tnef_chemical_shift_list\n'
+                      '  _nef_chemical_shift_list.sf_framecode\tnef_chemical_shift_list_1\n'
+                      '  _nef_chemical_shift_list.atom_chem_shift_units\tppm\n', text)
+        self.assertIn('    _nef_peak.volume_uncertainty\n'
+                      '    _nef_peak.atom_name_1\n'
+                      '    _nef_peak.chain_code_1\n'
+                      '    _nef_peak.position_1\n'
+                      '    _nef_peak.position_uncertainty_1\n', text)
+
+    def test_values(self):
+        self.assertEqual(writer.canonicalText(1.50), '1.5')
+        self.assertEqual(writer.canonicalText(2), '2')
+        self.assertEqual(writer.canonicalText(True), 'true')
+        self.assertEqual(writer.canonicalText(None), '.')
+        self.assertEqual(writer._canonicalValueText('1.50'), '1.50')
+        self.assertEqual(writer._canonicalValueText(''), "''")
+        self.assertEqual(writer._canonicalValueText('a b'), "'a b'")
+        self.assertEqual(writer._canonicalValueText("it's"), '"it\'s"')
+        self.assertEqual(writer._canonicalValueText('stop_'), "'stop_'")
+        self.assertEqual(writer._canonicalValueText('stop_it'), 'stop_it')
+        self.assertEqual(writer._canonicalValueText('a#b'), '\n;a#b\n;\n')
+
+    def test_quoted_values_read_back(self):
+        values = ['', 'a b', "it's", 'say "hi"', '_a', ';a', 'loop_', 'save_a', '$a', 'a\tb',
+                  'x\n']
+        saveframe = self.nef['nef_molecular_system']
+        saveframe['nef_sequence'] = [OrderedDict([('chain_code', 'A'), ('sequence_code', str(i)),
+                                                  ('residue_type', value)])
+                                     for i, value in enumerate(values)]
+        saveframe['note'] = 'a b'
+
+        read_back = NEFreader.Nef.from_text(self.canonical(self.nef))['nef_molecular_system']
+
+        self.assertEqual([row['residue_type'] for row in read_back['nef_sequence']], values)
+        self.assertEqual(read_back['note'], 'a b')
+
+    def test_empty_loops(self):
+        nef = NEFreader.Nef()
+
+        text = self.canonical(nef)
+
+        self.assertNotIn('nef_sequence', text)
+        self.assertIn("_nef_molecular_system.sf_framecode\tnef_molecular_system\n", text)
+
+
 if __name__ == '__main__':
     unittest.main()